@@ -0,0 +1,146 @@
+"""
+游戏行动记录
+只追加的行动日志，按(章节, 轮次)建立索引并实时维护发言计数，
+发言状态查询和增量读取不需要遍历全部历史
+"""
+
+import threading
+
+
+def is_speech(action: dict) -> bool:
+    """是否为计入发言状态的玩家发言（不包括回复）"""
+    return action.get('type') == 'player_action' and action.get('action_type') == 'speak'
+
+
+class ActionLog:
+    """只追加的行动日志，每条记录带有从1开始递增的序号seq"""
+
+    def __init__(self, actions: list = None):
+        """
+        Args:
+            actions: 已有的行动记录（从持久化状态恢复时使用）
+        """
+        self._actions = []
+        self._by_round = {}  # (chapter, cycle) -> 行动序号列表
+        self._speakers = {}  # (chapter, cycle) -> 已发言角色（按发言顺序）
+        self._type_counts = {}  # 记录类型 -> 条数
+        self._lock = threading.Lock()
+        for action in actions or []:
+            self.append(action)
+
+    def append(self, action: dict) -> int:
+        """
+        追加一条行动记录
+
+        Args:
+            action: 行动记录字典，会写入seq字段
+
+        Returns:
+            int: 该记录的序号
+        """
+        with self._lock:
+            seq = len(self._actions) + 1
+            action['seq'] = seq
+            self._actions.append(action)
+
+            key = (action.get('chapter'), action.get('cycle'))
+            self._by_round.setdefault(key, []).append(seq)
+            action_type = action.get('type')
+            self._type_counts[action_type] = self._type_counts.get(action_type, 0) + 1
+            if is_speech(action):
+                self._speakers.setdefault(key, {})[action['character']] = seq
+            return seq
+
+    @property
+    def last_seq(self) -> int:
+        """最新一条记录的序号，没有记录时为0"""
+        return len(self._actions)
+
+    def count(self, *types) -> int:
+        """指定类型的记录条数"""
+        return sum(self._type_counts.get(action_type, 0) for action_type in types)
+
+    def since(self, seq: int, limit: int = None) -> list:
+        """
+        读取序号大于seq的记录（游标读取）
+
+        Args:
+            seq: 游标，返回该序号之后的记录
+            limit: 最多返回的条数
+
+        Returns:
+            list: 行动记录列表
+        """
+        start = max(0, seq)
+        end = start + limit if limit else None
+        return self._actions[start:end]
+
+    def tail(self, limit: int, exclude_types: tuple = ()) -> list:
+        """
+        最近的limit条记录
+
+        Args:
+            limit: 条数
+            exclude_types: 不计入的记录类型（例如状态变更记录）
+        """
+        if limit <= 0:
+            return []
+        if not exclude_types:
+            return self._actions[-limit:]
+
+        recent = []
+        for action in reversed(self._actions):
+            if action.get('type') in exclude_types:
+                continue
+            recent.append(action)
+            if len(recent) >= limit:
+                break
+        recent.reverse()
+        return recent
+
+    def in_round(self, chapter, cycle) -> list:
+        """指定章节和轮次的所有记录"""
+        return [self._actions[seq - 1] for seq in self._by_round.get((chapter, cycle), [])]
+
+    def spoken_players(self, chapter, cycle) -> list:
+        """指定章节和轮次中已发言的角色（按发言顺序）"""
+        return list(self._speakers.get((chapter, cycle), {}))
+
+    def speaking_status(self, chapter, cycle, characters: list) -> dict:
+        """
+        计算指定轮次的发言状态
+
+        Args:
+            chapter: 章节
+            cycle: 轮次
+            characters: 所有角色
+
+        Returns:
+            dict: 已发言/未发言角色及计数
+        """
+        speakers = self._speakers.get((chapter, cycle), {})
+        spoken = [name for name in speakers if name in characters]
+        remaining = [name for name in characters if name not in speakers]
+        total = len(characters)
+        return {
+            'total_players': total,
+            'spoken_count': len(spoken),
+            'remaining_count': len(remaining),
+            'completion_rate': (len(spoken) / total * 100) if total > 0 else 0,
+            'spoken_players': spoken,
+            'remaining_players': remaining,
+            'all_completed': len(remaining) == 0
+        }
+
+    def to_list(self) -> list:
+        """导出全部记录"""
+        return list(self._actions)
+
+    def __len__(self) -> int:
+        return len(self._actions)
+
+    def __iter__(self):
+        return iter(list(self._actions))
+
+    def __getitem__(self, index):
+        return self._actions[index]
@@ -0,0 +1,125 @@
+"""
+AI玩家调用调度
+在共享线程池上执行一批AI调用，结果按提交顺序返回。
+每个调用的超时从它真正开始执行时计算，在线程池中排队的时间单独限制
+"""
+
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class AIQueryCall:
+    """提交到线程池的一次AI调用"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.future = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self._started = threading.Event()
+
+    def run(self, fn, *args, **kwargs):
+        """在工作线程中执行调用，返回(结果, 执行耗时秒数)"""
+        self.started_at = time.time()
+        self._started.set()
+        result = fn(*args, **kwargs)
+        return result, time.time() - self.started_at
+
+    def wait_started(self, timeout: float) -> bool:
+        """等待调用开始执行，超时返回False"""
+        return self._started.wait(max(0, timeout))
+
+
+def submit_ai_query(executor, name: str, fn, *args, **kwargs) -> AIQueryCall:
+    """
+    提交一次AI调用
+
+    Args:
+        executor: 共享线程池
+        name: 调用名称（角色名），用于日志和结果
+        fn: 实际执行的函数
+        *args, **kwargs: 传给fn的参数
+
+    Returns:
+        AIQueryCall: 交给collect_ai_query获取结果
+    """
+    call = AIQueryCall(name)
+    call.future = executor.submit(call.run, fn, *args, **kwargs)
+    return call
+
+
+def collect_ai_query(call: AIQueryCall, timeout: float, queue_timeout: float):
+    """
+    获取一次AI调用的结果
+
+    Args:
+        call: submit_ai_query返回的调用
+        timeout: 调用开始执行后的最长等待时间(秒)
+        queue_timeout: 从提交开始最多等待多久让调用开始执行(秒)
+
+    Returns:
+        tuple: (结果, 耗时秒数, 错误信息)，失败或超时时结果为None
+    """
+    if not call.wait_started(call.submitted_at + queue_timeout - time.time()):
+        if call.future.cancel():
+            print(f"⏰ AI玩家 {call.name} 排队超时 ({queue_timeout}秒)，已取消")
+            return None, time.time() - call.submitted_at, f'排队超时 ({queue_timeout}秒)'
+        # 取消失败说明刚好开始执行，按正常流程等待
+        call.wait_started(1)
+
+    started_at = call.started_at or time.time()
+    try:
+        result, latency = call.future.result(
+            timeout=max(0, started_at + timeout - time.time())
+        )
+        return result, latency, None
+    except FutureTimeoutError:
+        # 已经开始的调用无法中断，只能丢弃结果；它会继续占用一个工作线程直到返回
+        print(f"⏰ AI玩家 {call.name} 发言超时 ({timeout}秒)，结果将被丢弃")
+        return None, time.time() - started_at, f'发言超时 ({timeout}秒)'
+    except Exception as e:
+        print(f"❌ AI玩家 {call.name} 发言失败: {e}")
+        return None, time.time() - started_at, str(e)
+
+
+def run_ai_queries(executor, calls, timeout: float, queue_timeout: float):
+    """
+    并发执行一批AI调用，结果按传入顺序返回
+
+    Args:
+        executor: 共享线程池
+        calls: [(名称, 函数, 参数元组)] 列表，顺序即结果顺序（座位顺序）
+        timeout: 单个调用开始执行后的超时时间(秒)
+        queue_timeout: 单个调用排队的最长时间(秒)
+
+    Returns:
+        list: [(名称, 结果, 耗时秒数, 错误信息)]
+    """
+    pending = [submit_ai_query(executor, name, fn, *args) for name, fn, args in calls]
+    return [(call.name, *collect_ai_query(call, timeout, queue_timeout)) for call in pending]
+
+
+def parse_query_timeout(value, default: float, maximum: float) -> float:
+    """
+    校验客户端传入的超时时间
+
+    Args:
+        value: 请求中的timeout，None表示使用默认值
+        default: 默认超时时间(秒)
+        maximum: 允许的最大超时时间(秒)
+
+    Returns:
+        float: 限制在[1, maximum]范围内的超时时间
+
+    Raises:
+        ValueError: value不是有效数字
+    """
+    if value is None:
+        value = default
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"timeout必须是数字: {value!r}")
+    timeout = float(value)
+    if timeout != timeout or timeout in (float('inf'), float('-inf')):
+        raise ValueError(f"timeout必须是有限数字: {value!r}")
+    return min(max(timeout, 1.0), float(maximum))
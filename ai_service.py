@@ -2,6 +2,7 @@ import openai
 import json
 from typing import List, Dict, Optional
 from config import Config
+from openai_utils import create_openai_client
 
 class AIService:
     """AI聊天服务类"""
@@ -14,7 +15,7 @@ class AIService:
         # 如果提供了用户，使用用户的API配置
         if user and hasattr(user, 'api_key') and user.api_key:
             try:
-                self.client = openai.OpenAI(
+                self.client = create_openai_client(
                     api_key=user.api_key,
                     base_url=user.api_base or Config.API_BASE
                 )
@@ -32,7 +33,7 @@ class AIService:
                 api_key = SystemConfig.get_config('api_key') or Config.API_KEY
                 api_base = SystemConfig.get_config('api_base') or Config.API_BASE
                 
-                self.client = openai.OpenAI(
+                self.client = create_openai_client(
                     api_key=api_key,
                     base_url=api_base
                 )
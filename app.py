@@ -3,6 +3,7 @@ from flask_login import LoginManager, login_user, logout_user, login_required, c
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, EmailField, BooleanField, SubmitField, TextAreaField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError, Optional
+from werkzeug.utils import safe_join
 import os
 import secrets
 from datetime import datetime
@@ -684,6 +685,91 @@ def test_ai_service():
         }
     })
 
+@app.route('/api/ai/pool_stats')
+@login_required
+def ai_pool_stats():
+    """查看共享LLM客户端连接池和DashScope REST会话的连接复用状态"""
+    from openai_utils import get_client_pool_stats
+    from http_utils import get_http_session_stats
+    clients = get_client_pool_stats()
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'clients': clients,
+            'total_clients': len(clients),
+            'live_connections': sum(c['live_connections'] for c in clients),
+            'rest_hosts': get_http_session_stats()
+        }
+    })
+
+@app.route('/api/ai/prompt_cache_stats')
+@login_required
+def ai_prompt_cache_stats():
+    """查看提示词前缀缓存命中情况（缓存/未缓存的提示词token数）"""
+    from openai_utils import get_prompt_cache_stats
+    sources = get_prompt_cache_stats()
+    prompt_tokens = sum(s['prompt_tokens'] for s in sources.values())
+    cached_tokens = sum(s['cached_tokens'] for s in sources.values())
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'sources': sources,
+            'prompt_tokens': prompt_tokens,
+            'cached_tokens': cached_tokens,
+            'uncached_tokens': prompt_tokens - cached_tokens,
+            'hit_rate': cached_tokens / prompt_tokens if prompt_tokens else 0
+        }
+    })
+
+@app.route('/api/ai/rate_limit_stats')
+@login_required
+def ai_rate_limit_stats():
+    """查看对话补全和文生图调用的限流情况（排队、等待时间、429次数）"""
+    from rate_limiter import get_rate_limit_stats
+    return jsonify({
+        'status': 'success',
+        'data': get_rate_limit_stats()
+    })
+
+@app.route('/api/ai/image_poll_stats')
+@login_required
+def ai_image_poll_stats():
+    """查看图片任务轮询情况（查询次数、完成时间分布、排队和生成时间）"""
+    from image_poller import get_image_poll_stats
+    return jsonify({
+        'status': 'success',
+        'data': get_image_poll_stats()
+    })
+
+@app.route('/api/ai/image_cache_stats')
+@login_required
+def ai_image_cache_stats():
+    """查看图片缓存情况（条目数、占用空间、命中率）"""
+    from image_cache import get_image_cache
+    cache = get_image_cache()
+    return jsonify({
+        'status': 'success',
+        'data': cache.stats() if cache else {'enabled': False}
+    })
+
+@app.route('/api/ai/output_stats')
+@login_required
+def ai_output_stats():
+    """查看Agent结构化输出的解析统计（直接解析/修复/不符合结构/失败）"""
+    from structured_output import get_parse_stats
+    sources = get_parse_stats()
+    total = sum(s['total'] for s in sources.values())
+    failures = sum(s['failed'] + s['invalid'] for s in sources.values())
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'sources': sources,
+            'total': total,
+            'repaired': sum(s['repaired'] for s in sources.values()),
+            'failure_rate': failures / total if total else 0
+        }
+    })
+
 @app.route('/api/ai/analyze', methods=['POST'])
 @login_required  
 def analyze_message():
@@ -724,7 +810,19 @@ def js_files(filename):
 
 @app.route('/log/<path:filename>')
 def game_files(filename):
-    """游戏文件路由（包括图片）"""
+    """
+    游戏文件路由（包括图片）
+    
+    图片可加?variant=thumb（缩略图）或?variant=webp请求预先生成的衍生版本；
+    衍生版本尚未生成时返回原图，请求时不做转换
+    """
+    variant = request.args.get('variant')
+    if variant:
+        from image_variants import existing_variant
+        original = safe_join('log', filename)
+        path = existing_variant(original, variant) if original else None
+        if path:
+            return send_from_directory('log', os.path.relpath(path, 'log').replace('\\', '/'))
     return send_from_directory('log', filename)
 
 # 错误处理
@@ -0,0 +1,267 @@
+"""
+聊天历史滚动摘要
+每个游戏会话共享一个摘要器：较早的发言按章节压缩成摘要，只保留最近K条原文，
+超过token阈值时才在后台重新摘要（摘要完成前继续使用原有摘要和原文），
+AI玩家和DM的提示词长度不再随游戏进行线性增长
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from config import Config
+from openai_utils import create_openai_client
+
+_summary_client = None
+_summary_client_lock = threading.Lock()
+
+# 后台摘要线程池（所有会话共享）
+_COMPACT_EXECUTOR = ThreadPoolExecutor(
+    max_workers=Config.CHAT_SUMMARY_WORKERS,
+    thread_name_prefix='chat-summary'
+)
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数（中文约1字1token，其他字符约4个1token）"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if '一' <= ch <= '鿿')
+    return cjk + (len(text) - cjk) // 4
+
+def format_action(action: dict) -> str:
+    """
+    将一条行动记录格式化为聊天历史中的一行
+
+    Returns:
+        str: markdown文本，不计入聊天历史的记录（如状态变更）返回空字符串
+    """
+    action_type = action.get('type')
+    if action_type == 'player_action':
+        text = f"**{action['character']}**: {action['content']}"
+        for target, query in (action.get('queries') or {}).items():
+            text += f"\n**{action['character']}** 询问 **{target}**: {query}"
+        return text
+    if action_type == 'answer':
+        return f"**{action['character']}** 回答 **{action.get('asker', '')}**: {action['content']}"
+    if action_type == 'dm_speak':
+        return f"**游戏主持**: {action['content']}"
+    return ""
+
+def llm_summarize(chapter, previous_summary: str, turns: list, max_tokens: int) -> str:
+    """
+    调用模型把新的发言合并进章节摘要
+
+    Args:
+        chapter: 章节
+        previous_summary: 该章节已有的摘要
+        turns: 需要合并的发言原文
+        max_tokens: 摘要最大长度
+
+    Returns:
+        str: 新的章节摘要
+    """
+    global _summary_client
+    with _summary_client_lock:
+        if _summary_client is None:
+            _summary_client = create_openai_client()
+
+    prompt = f"""请把剧本杀游戏第{chapter}章的交谈记录整理成摘要。
+
+## 已有摘要
+{previous_summary if previous_summary else "（无）"}
+
+## 新增交谈记录
+{chr(10).join(turns)}
+
+## 要求
+- 将新增记录合并进已有摘要，输出完整的新摘要
+- 保留关键事实：谁说了什么、谁询问了谁、时间线、证词矛盾和线索
+- 使用角色的确切姓名，不要编造内容
+- 不超过{max_tokens}字，直接输出摘要正文"""
+
+    completion = _summary_client.chat.completions.create(
+        model=Config.MODEL,
+        temperature=0.3,
+        max_tokens=max_tokens * 2,
+        messages=[{"role": "user", "content": prompt}]
+    )
+    return completion.choices[0].message.content.strip()
+
+class ChatSummarizer:
+    """按章节维护滚动摘要和最近K条原文发言"""
+
+    def __init__(self, keep_turns: int = 10, token_threshold: int = 1500,
+                 summary_max_tokens: int = 400, summarize_fn=None):
+        """
+        Args:
+            keep_turns: 保留原文的最近发言条数
+            token_threshold: 待摘要的较早发言超过该token数时才重新摘要
+            summary_max_tokens: 每章摘要的最大长度
+            summarize_fn: 摘要函数(chapter, previous_summary, turns, max_tokens) -> str，默认调用模型
+        """
+        self.keep_turns = keep_turns
+        self.token_threshold = token_threshold
+        self.summary_max_tokens = summary_max_tokens
+        self.summarize_fn = summarize_fn or llm_summarize
+        self.summaries = {}  # chapter -> 摘要
+        self.turns = []  # [chapter, 原文, token数]
+        self.cursor = 0  # 已同步的行动记录序号
+        self.summarize_count = 0
+        self._pending = None  # 进行中的后台摘要
+        self._generation = 0  # load_state后丢弃进行中的摘要结果
+        self._lock = threading.RLock()
+
+    def add_turn(self, chapter, text: str):
+        """追加一条发言原文，必要时触发摘要"""
+        with self._lock:
+            self._append(chapter, text)
+            self._maybe_compact()
+
+    def sync(self, action_log):
+        """
+        从行动记录增量同步发言（只读取上次同步之后的记录）
+
+        Args:
+            action_log: 会话的ActionLog
+        """
+        with self._lock:
+            for action in action_log.since(self.cursor):
+                text = format_action(action)
+                if text:
+                    self._append(action.get('chapter'), text)
+                self.cursor = action['seq']
+            self._maybe_compact()
+
+    def render(self) -> str:
+        """生成提示词使用的聊天历史：各章摘要 + 最近发言原文"""
+        with self._lock:
+            parts = []
+            if self.summaries:
+                lines = [f"**第{chapter}章**：{summary}" for chapter, summary in self._sorted_summaries()]
+                parts.append("### 前情摘要\n" + "\n".join(lines))
+            if self.turns:
+                parts.append("### 最近发言\n" + "\n".join(text for _, text, _ in self.turns))
+            return "\n\n".join(parts)
+
+    def token_count(self) -> int:
+        """当前渲染结果的估算token数"""
+        with self._lock:
+            return (sum(estimate_tokens(summary) for summary in self.summaries.values())
+                    + sum(tokens for _, _, tokens in self.turns))
+
+    def to_state(self) -> dict:
+        """导出需要持久化的摘要状态"""
+        with self._lock:
+            return {
+                'summaries': [[chapter, summary] for chapter, summary in self.summaries.items()],
+                'turns': [[chapter, text] for chapter, text, _ in self.turns],
+                'cursor': self.cursor,
+                'summarize_count': self.summarize_count
+            }
+
+    def load_state(self, state: dict):
+        """从持久化状态恢复"""
+        with self._lock:
+            state = state or {}
+            self.summaries = {chapter: summary for chapter, summary in state.get('summaries', [])}
+            self.turns = [[chapter, text, estimate_tokens(text)] for chapter, text in state.get('turns', [])]
+            self.cursor = state.get('cursor', 0)
+            self.summarize_count = state.get('summarize_count', 0)
+            self._generation += 1
+        return self
+
+    def wait(self, timeout: float = 120):
+        """
+        等待进行中的后台摘要（包括完成后接着触发的摘要）全部结束
+
+        Args:
+            timeout: 总共最多等待的时间(秒)
+
+        Raises:
+            TimeoutError: 超时后摘要仍未结束
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                future = self._pending
+                if future is not None and future.cancelled():
+                    # 线程池关闭时取消的摘要不会执行，也就不会自己清除
+                    self._pending = future = None
+            if future is None:
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("等待后台聊天摘要超时")
+            try:
+                future.result(remaining)
+            except FutureTimeoutError:
+                raise TimeoutError("等待后台聊天摘要超时")
+            except Exception as e:
+                print(f"⚠️ 后台聊天摘要异常结束: {e}")
+
+    def _append(self, chapter, text: str):
+        self.turns.append([chapter, text, estimate_tokens(text)])
+
+    def _sorted_summaries(self):
+        return sorted(self.summaries.items(), key=lambda item: (item[0] is None, item[0] or 0))
+
+    def _maybe_compact(self) -> bool:
+        """
+        较早发言超过阈值时提交后台摘要（调用方持有锁）
+
+        摘要完成前render继续返回原有摘要和全部原文；完成后把较早发言按章节合并进摘要，
+        只保留最近keep_turns条原文。同一时间每个会话最多一个后台摘要。
+        """
+        if (self._pending is not None and not self._pending.done()) or len(self.turns) <= self.keep_turns:
+            return False
+        older = self.turns[:len(self.turns) - self.keep_turns]
+        if sum(tokens for _, _, tokens in older) < self.token_threshold:
+            return False
+
+        by_chapter = {}
+        for chapter, text, _ in older:
+            by_chapter.setdefault(chapter, []).append(text)
+        previous = {chapter: self.summaries.get(chapter, '') for chapter in by_chapter}
+        self._pending = _COMPACT_EXECUTOR.submit(
+            self._compact, by_chapter, previous, len(older), self._generation
+        )
+        return True
+
+    def _compact(self, by_chapter: dict, previous: dict, count: int, generation: int):
+        """后台生成章节摘要，完成后替换较早的原文"""
+        cleared = False
+        try:
+            summaries = {}
+            for chapter, texts in by_chapter.items():
+                try:
+                    summary = self.summarize_fn(chapter, previous[chapter], texts, self.summary_max_tokens)
+                except Exception as e:
+                    print(f"⚠️ 聊天摘要生成失败，使用截断摘要: {e}")
+                    summary = self._truncate_summary(previous[chapter], texts)
+                summaries[chapter] = summary or previous[chapter]
+
+            with self._lock:
+                self._pending = None
+                cleared = True
+                if generation != self._generation:
+                    return
+                # 摘要期间只会在末尾追加新发言，前count条仍是提交时的较早发言
+                self.summaries.update(summaries)
+                self.turns = self.turns[count:]
+                self.summarize_count += 1
+                print(f"📝 聊天历史已摘要: {count}条发言合并进{len(summaries)}个章节摘要")
+                # 摘要期间新增的发言可能再次超过阈值
+                self._maybe_compact()
+        finally:
+            # 异常退出时也要清除，否则该会话之后不会再摘要，wait也会一直等待
+            if not cleared:
+                with self._lock:
+                    self._pending = None
+
+    def _truncate_summary(self, previous: str, texts: list) -> str:
+        """模型不可用时的回退：每条发言只保留开头，并限制摘要总长度"""
+        lines = [previous] if previous else []
+        lines += [text.split('\n')[0][:60] for text in texts]
+        summary = "\n".join(lines)
+        limit = self.summary_max_tokens * 2
+        return summary[-limit:] if len(summary) > limit else summary
@@ -23,6 +23,27 @@ class Config:
     OPENAI_MAX_TOKENS = int(os.environ.get('AI_MAX_TOKENS', '1000'))
     OPENAI_TEMPERATURE = float(os.environ.get('AI_TEMPERATURE', '0.7'))
     
+    # LLM客户端连接池配置（同一api_key/base_url的所有Agent共享）
+    LLM_POOL_MAX_CONNECTIONS = int(os.environ.get('LLM_POOL_MAX_CONNECTIONS', '20'))  # 最大连接数
+    LLM_POOL_MAX_KEEPALIVE = int(os.environ.get('LLM_POOL_MAX_KEEPALIVE', '10'))  # 最大保活连接数
+    LLM_POOL_KEEPALIVE_EXPIRY = float(os.environ.get('LLM_POOL_KEEPALIVE_EXPIRY', '60'))  # 空闲连接保活时间(秒)
+    LLM_JSON_MODE = os.environ.get('LLM_JSON_MODE', 'True').lower() == 'true'  # 需要JSON输出时使用端点的response_format（不支持时自动关闭）
+    
+    # DashScope REST请求（文生图任务、图片下载）的共享HTTP会话配置
+    HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', '10'))  # 缓存连接池的主机数
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '10'))  # 每个主机保留的连接数
+    HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', '3'))  # 连接失败和GET请求5xx的重试次数
+    HTTP_RETRY_BACKOFF = float(os.environ.get('HTTP_RETRY_BACKOFF', '0.5'))  # 重试的指数退避系数(秒)
+    
+    # 调用限流配置（进程内全局，0表示不限制）
+    CHAT_RATE_LIMIT_RPS = float(os.environ.get('CHAT_RATE_LIMIT_RPS', '5'))  # 对话补全每秒请求数
+    CHAT_MAX_CONCURRENT = int(os.environ.get('CHAT_MAX_CONCURRENT', '8'))  # 对话补全同时进行的请求数
+    CHAT_TOKENS_PER_MINUTE = int(os.environ.get('CHAT_TOKENS_PER_MINUTE', '300000'))  # 对话补全每分钟token数
+    T2I_RATE_LIMIT_RPS = float(os.environ.get('T2I_RATE_LIMIT_RPS', '2'))  # 文生图接口（提交和查询任务）每秒请求数
+    T2I_MAX_CONCURRENT = int(os.environ.get('T2I_MAX_CONCURRENT', '2'))  # 文生图接口同时进行的请求数
+    RATE_LIMIT_WAIT_TIMEOUT = float(os.environ.get('RATE_LIMIT_WAIT_TIMEOUT', '120'))  # 排队等待调用额度的最长时间(秒)
+    RATE_LIMIT_429_BACKOFF = float(os.environ.get('RATE_LIMIT_429_BACKOFF', '2'))  # 收到429且没有Retry-After时的暂停时间(秒)
+    
     # 聊天功能配置
     CHAT_HISTORY_LIMIT = int(os.environ.get('CHAT_HISTORY_LIMIT', '50'))
     MAX_MESSAGE_LENGTH = int(os.environ.get('MAX_MESSAGE_LENGTH', '2000'))
@@ -72,6 +93,64 @@ class Config:
     GAME_CHAPTER_CYCLES = int(os.environ.get('GAME_CHAPTER_CYCLES', '3'))  # 每章节循环次数 - 默认3次
     GAME_DM_SPEAK_DELAY = int(os.environ.get('GAME_DM_SPEAK_DELAY', '2'))  # DM发言延迟(秒) - 默认2秒
     GAME_AI_RESPONSE_DELAY = int(os.environ.get('GAME_AI_RESPONSE_DELAY', '3'))  # AI玩家回应延迟(秒) - 默认3秒
+
+    # AI玩家并发发言配置
+    GAME_AI_PARALLEL = os.environ.get('GAME_AI_PARALLEL', 'True').lower() == 'true'  # 是否并发触发所有AI发言
+    GAME_AI_MAX_WORKERS = int(os.environ.get('GAME_AI_MAX_WORKERS', '6'))  # AI调用线程池大小（进程内共享）
+    GAME_AI_QUERY_TIMEOUT = int(os.environ.get('GAME_AI_QUERY_TIMEOUT', '60'))  # 单个AI调用超时时间(秒)，从调用开始执行时计算；请求参数timeout只能缩短
+    GAME_AI_QUEUE_TIMEOUT = int(os.environ.get('GAME_AI_QUEUE_TIMEOUT', '120'))  # AI调用在线程池中排队等待开始执行的最长时间(秒)
+    GAME_AI_ENSEMBLE = os.environ.get('GAME_AI_ENSEMBLE', 'False').lower() == 'true'  # 是否用一次合并调用生成所有AI的发言
+    GAME_AI_PREFETCH_ANSWERS = os.environ.get('GAME_AI_PREFETCH_ANSWERS', 'True').lower() == 'true'  # 问题记录后立即在后台生成AI回答
+    GAME_AI_SPECULATIVE_WORKERS = int(os.environ.get('GAME_AI_SPECULATIVE_WORKERS', '2'))  # 预先生成（AI回答、下一章开场）的独立线程池大小，不占用实时AI调用的线程
+
+    # DM发言请求合并配置
+    DM_SPEAK_DEDUP_TTL = float(os.environ.get('DM_SPEAK_DEDUP_TTL', '30'))  # 相同DM发言结果的保留时间(秒)，0表示只合并同时进行的请求
+    DM_SPEAK_WAIT_TIMEOUT = float(os.environ.get('DM_SPEAK_WAIT_TIMEOUT', '120'))  # 等待相同请求结果的最长时间(秒)
+
+    # 下一章DM开场预生成配置
+    DM_SPECULATIVE_OPENING = os.environ.get('DM_SPECULATIVE_OPENING', 'False').lower() == 'true'  # 是否在最后一轮讨论时预生成下一章开场
+    DM_SPECULATIVE_MAX_NEW_TURNS = int(os.environ.get('DM_SPECULATIVE_MAX_NEW_TURNS', '3'))  # 预生成后最多新增几条发言仍可使用，超出则重新生成
+
+    # 剧本局部修复配置
+    SCRIPT_REPAIR_MAX_ROUNDS = int(os.environ.get('SCRIPT_REPAIR_MAX_ROUNDS', '2'))  # 剧本缺失部分最多补写几轮，0表示不补写
+    SCRIPT_REPAIR_ON_LOAD = os.environ.get('SCRIPT_REPAIR_ON_LOAD', 'False').lower() == 'true'  # 使用本地剧本创建游戏时，是否先在后台任务中补写缺失部分并写回script.json（加载游戏本身不会修复）
+
+    # 图片生成流水线配置
+    IMAGE_GEN_CONCURRENCY = int(os.environ.get('IMAGE_GEN_CONCURRENCY', '4'))  # 同时进行的图片任务数
+    IMAGE_POLL_MIN_INTERVAL = float(os.environ.get('IMAGE_POLL_MIN_INTERVAL', '1'))  # 任务状态最短查询间隔(秒)
+    IMAGE_POLL_MAX_INTERVAL = float(os.environ.get('IMAGE_POLL_MAX_INTERVAL', '10'))  # 任务状态最长查询间隔(秒)
+    IMAGE_POLL_BACKOFF = float(os.environ.get('IMAGE_POLL_BACKOFF', '1.5'))  # 任务未完成时查询间隔的增长倍数
+    IMAGE_TASK_TIMEOUT = int(os.environ.get('IMAGE_TASK_TIMEOUT', '300'))  # 单个图片任务超时时间(秒)
+    IMAGE_CACHE_ENABLED = os.environ.get('IMAGE_CACHE_ENABLED', 'True').lower() == 'true'  # 相同提示词直接复用生成过的图片
+    IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', 'images/cache')  # 图片缓存目录
+    IMAGE_CACHE_MAX_MB = int(os.environ.get('IMAGE_CACHE_MAX_MB', '500'))  # 图片缓存磁盘预算(MB)，0表示不限制
+    IMAGE_THUMB_SIZE = int(os.environ.get('IMAGE_THUMB_SIZE', '128'))  # 缩略图最长边(像素)
+    IMAGE_WEBP_QUALITY = int(os.environ.get('IMAGE_WEBP_QUALITY', '80'))  # WebP衍生版本的压缩质量
+
+    # 游戏创建后台任务配置
+    GAME_JOB_WORKERS = int(os.environ.get('GAME_JOB_WORKERS', '2'))  # 同时创建的游戏数
+
+    # 游戏会话存储配置（memory: 单进程内存, sqlite: 本机多进程共享, redis: 多机共享）
+    GAME_SESSION_STORE = os.environ.get('GAME_SESSION_STORE', 'memory')
+    GAME_SESSION_DB = os.environ.get('GAME_SESSION_DB', 'game_sessions.db')  # SQLite数据库文件
+    GAME_SESSION_REDIS_URL = os.environ.get('GAME_SESSION_REDIS_URL', 'redis://localhost:6379/0')
+    GAME_SESSION_TTL = int(os.environ.get('GAME_SESSION_TTL', '1800'))  # 会话空闲多久后淘汰(秒)，0表示不淘汰
+    GAME_SESSION_MAX_ACTIVE = int(os.environ.get('GAME_SESSION_MAX_ACTIVE', '50'))  # 本进程最多保留的会话数，0表示不限制
+    GAME_SESSION_SWEEP_INTERVAL = int(os.environ.get('GAME_SESSION_SWEEP_INTERVAL', '60'))  # 淘汰检查间隔(秒)
+    GAME_SESSION_SNAPSHOT_DIR = os.environ.get('GAME_SESSION_SNAPSHOT_DIR', 'log/session_snapshots')  # 淘汰会话的快照目录
+
+    # 聊天历史摘要配置
+    CHAT_SUMMARY_KEEP_TURNS = int(os.environ.get('CHAT_SUMMARY_KEEP_TURNS', '10'))  # 提示词中保留原文的最近发言条数
+    CHAT_SUMMARY_TOKEN_THRESHOLD = int(os.environ.get('CHAT_SUMMARY_TOKEN_THRESHOLD', '1500'))  # 较早发言超过该token数时重新摘要
+    CHAT_SUMMARY_MAX_TOKENS = int(os.environ.get('CHAT_SUMMARY_MAX_TOKENS', '400'))  # 每章摘要的最大长度
+    CHAT_SUMMARY_WORKERS = int(os.environ.get('CHAT_SUMMARY_WORKERS', '2'))  # 后台生成聊天摘要的线程数
+
+    # 游戏事件流配置
+    GAME_EVENT_HEARTBEAT = int(os.environ.get('GAME_EVENT_HEARTBEAT', '15'))  # 无事件时的心跳间隔(秒)，也是跨进程变化的最长感知延迟
+    GAME_EVENT_RETRY_MS = int(os.environ.get('GAME_EVENT_RETRY_MS', '3000'))  # 客户端断线重连间隔(毫秒)
+
+    # 游戏列表配置
+    GAME_LIST_MAX_PAGE_SIZE = int(os.environ.get('GAME_LIST_MAX_PAGE_SIZE', '100'))  # 游戏列表每页最大数量
     
     # 默认剧本路径配置（如果为None或路径无效则使用AI生成）
     DEFAULT_SCRIPT_PATH = os.environ.get('DEFAULT_SCRIPT_PATH', None)  # 例如: 'log/250805151240'
\ No newline at end of file
@@ -5,10 +5,49 @@ import json
 import time
 import requests
 import os
+import re
 from datetime import datetime
 from typing import List
 from openai_utils import create_openai_client
 from agent_logger import log_dm_speak_call
+from structured_output import json_completion, parse_json_output
+from rate_limiter import get_limiter, retry_after_seconds
+from image_poller import get_image_poller
+from http_utils import get_http_session
+
+# 剧本的输出结构（各角色的分章节剧本以角色名为键，不在此声明）
+SCRIPT_SCHEMA = {
+    'type': 'object',
+    'required': ['title', 'characters', 'dm'],
+    'properties': {
+        'title': {'type': 'string'},
+        'theme': {'type': 'string'},
+        'characters': {'type': 'array', 'items': {'type': 'string'}},
+        'dm': {'type': 'array', 'items': {'type': 'string'}},
+        'clues': {'type': 'array', 'items': {'type': 'array'}},
+        'clue_image_prompts': {'type': 'array', 'items': {'type': 'array'}},
+        'character_image_prompts': {'type': 'object', 'additionalProperties': {'type': 'string'}}
+    }
+}
+
+# JSON格式DM发言的输出结构
+DM_SPEECH_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'speech': {'type': 'string'},
+        'tools': {'type': 'array', 'items': {'type': 'object'}}
+    }
+}
+
+# 文生图默认尺寸
+DEFAULT_IMAGE_SIZE = "512*512"
+
+# 工具调用的必需字段（缺少字段的调用多为截断输出，直接忽略）
+TOOL_REQUIRED_FIELDS = {
+    'show_clue': ('chapter', 'clue_index'),
+    'show_character': ('character_name',)
+}
+
 class DMAgent:
     def __init__(self):
         # self.name = name
@@ -33,7 +72,8 @@ class DMAgent:
     def gen_script(self):
         print("start generating script")
         start = time.time()
-        completion = self.client.chat.completions.create(
+        completion = json_completion(
+        self.client,
         model=Config.MODEL,
         temperature=0.7,
         messages=[
@@ -76,44 +116,76 @@ class DMAgent:
         response_content = completion.choices[0].message.content
         print("Raw response preview:", response_content[:200])
         
-        try:
-            # 尝试解析JSON
-            # 如果响应被包在```json代码块中，需要先提取
-            if response_content.strip().startswith("```json"):
-                # 提取JSON内容
-                json_start = response_content.find("{")
-                json_end = response_content.rfind("}") + 1
-                if json_start != -1 and json_end != 0:
-                    json_content = response_content[json_start:json_end]
-                else:
-                    json_content = response_content
-            else:
-                json_content = response_content
-            
-            # 解析JSON
-            script_data = json.loads(json_content)
-            
-            print(f"✅ 剧本生成成功！")
-            return script_data
-            
-        except json.JSONDecodeError as e:
-            print(f"❌ JSON解析失败: {e}")
+        # 解析JSON（不完整的JSON在本地修复，不浪费这次生成）
+        parsed = parse_json_output(response_content, SCRIPT_SCHEMA, 'dm.gen_script')
+        if not isinstance(parsed.data, dict):
+            print(f"❌ JSON解析失败: {parsed.errors}")
             print(f"原始响应内容: {response_content[:200]}...")
-            
-            # 尝试手动修复JSON格式
-            try:
-                # 移除可能的markdown代码块标记
-                cleaned_content = response_content.replace("```json", "").replace("```", "").strip()
-                script_data = json.loads(cleaned_content)
-                
-                print(f"✅ JSON修复成功！")
-                return script_data
-                
-            except Exception as repair_error:
-                print(f"❌ JSON修复也失败: {repair_error}")
-                return None
+            return None
+        
+        script_data = parsed.data
+        missing = [name for name in script_data.get('characters', []) if not isinstance(script_data.get(name), list)]
+        if missing:
+            print(f"⚠️ 剧本缺少角色分章节剧本: {missing}")
+        
+        if parsed.status == 'repaired':
+            print(f"✅ 剧本生成成功（JSON已修复）！")
+        else:
+            print(f"✅ 剧本生成成功！")
+        return script_data
+
+    def gen_script_fragments(self, script: dict, problems: list) -> dict:
+        """
+        只补写剧本中缺失或格式错误的片段
+
+        Args:
+            script: 现有剧本
+            problems: script_validator.find_script_problems的结果
 
-    def gen_image(self, prompt: str, size: str = "512*512"):
+        Returns:
+            dict: 补写的片段 {剧本字段: 内容}，失败返回空字典
+        """
+        # 只提供补写所需的上下文，不发送完整的角色剧本
+        context = {
+            key: script[key] for key in ('title', 'theme', 'characters', 'dm', 'clues')
+            if key in script and key not in [problem['key'] for problem in problems]
+        }
+        requests_text = "\n".join(f"- {problem['reason']}，格式: {problem['request']}" for problem in problems)
+        keys = [problem['key'] for problem in problems]
+
+        print(f"🔧 补写剧本片段: {keys}")
+        start = time.time()
+        try:
+            completion = json_completion(
+                self.client,
+                model=Config.MODEL,
+                temperature=0.7,
+                messages=[
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": f"""以下剧本杀剧本的部分内容缺失或格式错误。
+
+已有剧本内容：
+{json.dumps(context, ensure_ascii=False)}
+
+请只补写下列部分，内容要与已有剧本的人物、情节和线索保持一致：
+{requests_text}
+
+输出一个JSON对象，只包含以上字段（{', '.join(keys)}），不要重复已有的其他内容。"""},
+                ],
+            )
+        except Exception as e:
+            print(f"❌ 剧本片段补写失败: {e}")
+            return {}
+        print(f"script fragments generated in {time.time() - start} seconds")
+
+        parsed = parse_json_output(
+            completion.choices[0].message.content,
+            {'type': 'object', 'required': keys},
+            'dm.gen_script_fragments'
+        )
+        return parsed.data if isinstance(parsed.data, dict) else {}
+
+    def gen_image(self, prompt: str, size: str = DEFAULT_IMAGE_SIZE):
         """
         使用阿里云百炼通义万象2.2生成图片
         
@@ -144,44 +216,119 @@ class DMAgent:
             print(f"⏱️ 图片生成完成，耗时: {end_time - start_time:.2f}秒")
             
             # 第三步：处理结果
-            if result.get('task_status') == 'SUCCEEDED':
-                results = result.get('results', [])
-                if results:
-                    image_info = results[0]
-                    image_url = image_info.get('url')
-                    actual_prompt = image_info.get('actual_prompt', prompt)
-                    
-                    print(f"✅ 图片生成成功!")
-                    print(f"🔗 图片URL: {image_url}")
-                    print(f"📝 实际提示词: {actual_prompt[:100]}...")
-                    
-                    return {
-                        'success': True,
-                        'url': image_url,
-                        'original_prompt': prompt,
-                        'actual_prompt': actual_prompt,
-                        'task_id': task_id,
-                        'generation_time': end_time - start_time
-                    }
-                else:
-                    print("❌ 未找到生成结果")
-                    return None
-            else:
-                # 处理失败情况
-                error_code = result.get('code', 'Unknown')
-                error_message = result.get('message', '未知错误')
-                print(f"❌ 图片生成失败: {error_code} - {error_message}")
-                return {
-                    'success': False,
-                    'error_code': error_code,
-                    'error_message': error_message,
-                    'task_id': task_id
-                }
+            return self.build_image_result(result, prompt, task_id, end_time - start_time)
                 
         except Exception as e:
             print(f"❌ 图片生成异常: {str(e)}")
             return None
     
+    def submit_image_task(self, prompt: str, size: str = DEFAULT_IMAGE_SIZE) -> str:
+        """
+        提交图片生成任务（不等待结果）
+        
+        Args:
+            prompt: 图片生成的提示词
+            size: 图片尺寸，默认"512*512"
+            
+        Returns:
+            str: 任务ID，提交失败返回None
+        """
+        return self._submit_image_task(prompt, size)
+    
+    def _t2i_request(self, method: str, url: str, **kwargs):
+        """
+        经过全局t2i限流器和共享HTTP会话发出文生图接口请求，收到429时暂停限流器
+        
+        Raises:
+            requests.exceptions.Timeout: 排队等待调用额度超时
+        """
+        limiter = get_limiter('t2i')
+        try:
+            limiter.acquire(timeout=Config.RATE_LIMIT_WAIT_TIMEOUT)
+        except TimeoutError as e:
+            raise requests.exceptions.Timeout(str(e))
+        try:
+            response = get_http_session().request(method, url, **kwargs)
+        finally:
+            limiter.release()
+        if response.status_code == 429:
+            limiter.penalize(retry_after_seconds(response.headers))
+        return response
+    
+    def check_image_task(self, task_id: str) -> dict:
+        """
+        查询一次图片任务状态（不等待）
+        
+        Args:
+            task_id: 任务ID
+            
+        Returns:
+            dict: 任务output，包含task_status等字段；请求失败返回None
+        """
+        url = f"https://dashscope.aliyuncs.com/api/v1/tasks/{task_id}"
+        
+        headers = {
+            'Authorization': f'Bearer {Config.API_KEY}'
+        }
+        
+        try:
+            response = self._t2i_request('GET', url, headers=headers, timeout=30)
+            response.raise_for_status()
+            return response.json().get('output', {})
+        except requests.exceptions.RequestException as e:
+            print(f"❌ 轮询请求失败: {str(e)}")
+            return None
+        except json.JSONDecodeError as e:
+            print(f"❌ 响应解析失败: {str(e)}")
+            return None
+    
+    def build_image_result(self, output: dict, prompt: str, task_id: str, generation_time: float) -> dict:
+        """
+        将已结束任务的output转换为图片生成结果
+        
+        Args:
+            output: 任务output（task_status为SUCCEEDED或FAILED）
+            prompt: 原始提示词
+            task_id: 任务ID
+            generation_time: 生成耗时（秒）
+            
+        Returns:
+            dict: 与gen_image返回格式相同的结果字典
+        """
+        if output.get('task_status') == 'SUCCEEDED':
+            results = output.get('results', [])
+            if results:
+                image_info = results[0]
+                image_url = image_info.get('url')
+                actual_prompt = image_info.get('actual_prompt', prompt)
+                
+                print(f"✅ 图片生成成功!")
+                print(f"🔗 图片URL: {image_url}")
+                print(f"📝 实际提示词: {actual_prompt[:100]}...")
+                
+                return {
+                    'success': True,
+                    'url': image_url,
+                    'original_prompt': prompt,
+                    'actual_prompt': actual_prompt,
+                    'task_id': task_id,
+                    'generation_time': generation_time
+                }
+            else:
+                print("❌ 未找到生成结果")
+                return None
+        else:
+            # 处理失败情况
+            error_code = output.get('code', 'Unknown')
+            error_message = output.get('message', '未知错误')
+            print(f"❌ 图片生成失败: {error_code} - {error_message}")
+            return {
+                'success': False,
+                'error_code': error_code,
+                'error_message': error_message,
+                'task_id': task_id
+            }
+    
     def speak(self, chapter: int, script: List[str], chat_history: str = "", 
               is_chapter_end: bool = False, is_game_end: bool = False, 
               is_interject: bool = False, **kwargs) -> dict:
@@ -213,32 +360,11 @@ class DMAgent:
             'kwargs': kwargs
         }
         
+        speak_type = self._get_speak_type(is_chapter_end, is_game_end, is_interject)
+        
         try:
-            # 确定发言类型
-            if is_game_end:
-                speak_type = "game_end"
-            elif is_chapter_end:
-                speak_type = "chapter_end"
-            elif is_interject:
-                speak_type = "interject"
-            else:
-                speak_type = "chapter_start"
-            
-            # 构建剧本数据字典
-            script_data = {
-                'title': kwargs.get('title', '剧本杀游戏'),
-                'characters': kwargs.get('characters', []),
-                'dm': script,
-                'clues': kwargs.get('clues', [])
-            }
-            
-            # 构建系统提示词
-            system_prompt = self._build_speak_system_prompt(speak_type)
-            
-            # 构建用户提示词
-            user_prompt = self._build_speak_user_prompt(
-                speak_type, chapter + 1, len(script), script_data, 
-                chat_history, **kwargs
+            script_data, system_prompt, user_prompt = self._prepare_speak_prompts(
+                speak_type, chapter, script, chat_history, **kwargs
             )
             
             # 生成DM发言
@@ -276,6 +402,177 @@ class DMAgent:
             
             return error_result
     
+    def speak_stream(self, chapter: int, script: List[str], chat_history: str = "", 
+                     is_chapter_end: bool = False, is_game_end: bool = False, 
+                     is_interject: bool = False, **kwargs):
+        """
+        流式生成DM发言，逐段产出事件
+        
+        参数与speak相同。工具调用标记在生成过程中即时解析并执行，
+        不必等待整段发言完成。
+        
+        Yields:
+            dict: 事件字典，格式为 {'event': 事件类型, 'data': 事件数据}
+                - token: {'text': 发言片段}
+                - tool: 工具调用结果（同show_clue/show_character的返回值）
+                - done: 完整结果（同speak的返回值，附带ttft_ms和total_ms）
+        """
+        print(f"🎭 DM正在准备发言(流式)...")
+        
+        input_params = {
+            'chapter': chapter,
+            'script': script,
+            'chat_history': chat_history,
+            'is_chapter_end': is_chapter_end,
+            'is_game_end': is_game_end,
+            'is_interject': is_interject,
+            'stream': True,
+            'kwargs': kwargs
+        }
+        
+        speak_type = self._get_speak_type(is_chapter_end, is_game_end, is_interject)
+        start_time = time.time()
+        first_token_time = None
+        raw_response = ""
+        speech = ""
+        executed_tools = []
+        
+        try:
+            script_data, system_prompt, user_prompt = self._prepare_speak_prompts(
+                speak_type, chapter, script, chat_history, **kwargs
+            )
+            base_path = kwargs.get('base_path', '')
+            
+            stream = self.client.chat.completions.create(
+                model=Config.MODEL,
+                temperature=0.8,
+                stream=True,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ]
+            )
+            
+            parser = DMToolMarkerParser()
+            json_mode = None  # 响应以'{'开头时按JSON整体解析，不再逐段推送
+            
+            # 消费方中途放弃（客户端断开）时也关闭连接，归还限流额度
+            with stream:
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    if first_token_time is None:
+                        first_token_time = time.time()
+                        print(f"⚡ DM首字延迟: {(first_token_time - start_time) * 1000:.0f}ms")
+                    raw_response += delta
+                
+                    if json_mode is None:
+                        stripped = raw_response.lstrip()
+                        if not stripped:
+                            continue
+                        json_mode = stripped.startswith('{')
+                        delta = raw_response
+                    if json_mode:
+                        continue
+                
+                    for segment_type, value in parser.feed(delta):
+                        if segment_type == 'text':
+                            speech += value
+                            yield {'event': 'token', 'data': {'text': value}}
+                        else:
+                            tool_result = self._execute_tool_call(value, script_data, base_path)
+                            executed_tools.append(tool_result)
+                            yield {'event': 'tool', 'data': tool_result}
+            
+            if json_mode:
+                result = self._parse_dm_response(raw_response.strip(), script_data, base_path)
+                if result.get('speech'):
+                    yield {'event': 'token', 'data': {'text': result['speech']}}
+                for tool_result in result.get('tools', []):
+                    yield {'event': 'tool', 'data': tool_result}
+            else:
+                for segment_type, value in parser.flush():
+                    speech += value
+                    yield {'event': 'token', 'data': {'text': value}}
+                result = {
+                    'speech': speech.strip(),
+                    'tools': executed_tools,
+                    'success': True,
+                    'raw_response': raw_response
+                }
+            
+            end_time = time.time()
+            result['ttft_ms'] = int((first_token_time - start_time) * 1000) if first_token_time else None
+            result['total_ms'] = int((end_time - start_time) * 1000)
+            print(f"✅ DM {speak_type} 流式发言生成完成 (首字{result['ttft_ms']}ms, 总计{result['total_ms']}ms)")
+            
+            log_dm_speak_call(input_params, result)
+            yield {'event': 'done', 'data': result}
+            
+        except Exception as e:
+            print(f"❌ DM流式发言生成失败: {e}")
+            error_result = {
+                'speech': speech.strip() or self._get_speak_fallback(speak_type, chapter + 1),
+                'tools': executed_tools,
+                'success': False,
+                'error': str(e),
+                'ttft_ms': int((first_token_time - start_time) * 1000) if first_token_time else None,
+                'total_ms': int((time.time() - start_time) * 1000)
+            }
+            
+            log_dm_speak_call(input_params, None, str(e))
+            yield {'event': 'done', 'data': error_result}
+    
+    def _get_speak_type(self, is_chapter_end: bool, is_game_end: bool, is_interject: bool) -> str:
+        """确定发言类型"""
+        if is_game_end:
+            return "game_end"
+        elif is_chapter_end:
+            return "chapter_end"
+        elif is_interject:
+            return "interject"
+        return "chapter_start"
+    
+    def _prepare_speak_prompts(self, speak_type: str, chapter: int, script: List[str], 
+                               chat_history: str, **kwargs):
+        """构建发言所需的剧本数据和提示词，返回(script_data, system_prompt, user_prompt)"""
+        # 构建剧本数据字典
+        script_data = {
+            'title': kwargs.get('title', '剧本杀游戏'),
+            'characters': kwargs.get('characters', []),
+            'dm': script,
+            'clues': kwargs.get('clues', [])
+        }
+        
+        # 构建系统提示词
+        system_prompt = self._build_speak_system_prompt(speak_type)
+        
+        # 构建用户提示词
+        user_prompt = self._build_speak_user_prompt(
+            speak_type, chapter + 1, len(script), script_data, 
+            chat_history, **kwargs
+        )
+        
+        return script_data, system_prompt, user_prompt
+    
+    def _execute_tool_call(self, tool_call: dict, script_data: dict, base_path: str = "") -> dict:
+        """执行单个工具调用"""
+        if tool_call['type'] == 'show_clue':
+            return self.show_clue(
+                tool_call['chapter'], 
+                tool_call['clue_index'], 
+                script_data, 
+                base_path
+            )
+        return self.show_character(
+            tool_call['character_name'], 
+            script_data, 
+            base_path
+        )
+    
     def _parse_dm_response(self, response: str, script_data: dict, base_path: str = "") -> dict:
         """
         解析DM响应，提取发言内容和工具调用
@@ -289,11 +586,14 @@ class DMAgent:
             dict: 包含发言和工具调用信息
         """
         try:
-            # 尝试解析JSON格式的响应
-            if response.strip().startswith('{') and response.strip().endswith('}'):
-                parsed = json.loads(response)
+            # 尝试解析JSON格式的响应（截断的JSON在本地修复）
+            parsed = None
+            if response.strip().startswith('{'):
+                parsed = parse_json_output(response, DM_SPEECH_SCHEMA, 'dm.speak').data
+            if isinstance(parsed, dict):
                 speech = parsed.get('speech', '')
-                tool_calls = parsed.get('tools', [])
+                tools = parsed.get('tools') if isinstance(parsed.get('tools'), list) else []
+                tool_calls = [call for call in tools if isinstance(call, dict)]
             else:
                 # 如果不是JSON格式，检查是否包含工具调用标记
                 speech = response
@@ -327,21 +627,9 @@ class DMAgent:
             # 执行工具调用
             executed_tools = []
             for tool_call in tool_calls:
-                if tool_call['type'] == 'show_clue':
-                    result = self.show_clue(
-                        tool_call['chapter'], 
-                        tool_call['clue_index'], 
-                        script_data, 
-                        base_path
-                    )
-                    executed_tools.append(result)
-                elif tool_call['type'] == 'show_character':
-                    result = self.show_character(
-                        tool_call['character_name'], 
-                        script_data, 
-                        base_path
-                    )
-                    executed_tools.append(result)
+                required = TOOL_REQUIRED_FIELDS.get(tool_call.get('type'))
+                if required and all(field in tool_call for field in required):
+                    executed_tools.append(self._execute_tool_call(tool_call, script_data, base_path))
             
             return {
                 'speech': speech.strip(),
@@ -716,7 +1004,7 @@ class DMAgent:
         }
         
         try:
-            response = requests.post(url, headers=headers, json=data, timeout=30)
+            response = self._t2i_request('POST', url, headers=headers, json=data, timeout=30)
             response.raise_for_status()
             
             result = response.json()
@@ -735,52 +1023,109 @@ class DMAgent:
             print(f"❌ 响应解析失败: {str(e)}")
             return None
     
-    def _poll_image_result(self, task_id: str, max_wait_time: int = 300, poll_interval: int = 5) -> dict:
-        """轮询获取图片生成结果"""
-        url = f"https://dashscope.aliyuncs.com/api/v1/tasks/{task_id}"
+    def _poll_image_result(self, task_id: str, max_wait_time: int = 300) -> dict:
+        """由共享轮询器等待图片生成结果（查询间隔自适应）"""
+        task = get_image_poller(self.check_image_task).wait(task_id, timeout=max_wait_time)
+        if task['status'] == 'TIMEOUT':
+            print(f"⏰ 等待超时 ({max_wait_time}秒)")
+            return None
         
-        headers = {
-            'Authorization': f'Bearer {Config.API_KEY}'
-        }
+        print(f"🔄 任务状态: {task['status']} (查询{task['polls']}次)")
+        return task['output']
+    
+
+class DMToolMarkerParser:
+    """
+    DM流式发言中的工具标记增量解析器
+    
+    逐段输入模型输出，识别 [SHOW_CLUE:x-y] 和 [SHOW_CHARACTER:name] 标记。
+    可能是标记开头的片段会暂存，直到能确定是否为完整标记。
+    """
+    
+    MARKER_PREFIXES = ('[SHOW_CLUE:', '[SHOW_CHARACTER:')
+    CLUE_PATTERN = re.compile(r'\[SHOW_CLUE:(\d+)-(\d+)\]')
+    CHARACTER_PATTERN = re.compile(r'\[SHOW_CHARACTER:([^\]]+)\]')
+    MAX_MARKER_LENGTH = 64
+    
+    def __init__(self):
+        self._buffer = ""
+    
+    def feed(self, text: str) -> list:
+        """
+        输入一段文本，返回可以确定的片段列表
         
-        start_time = time.time()
+        Returns:
+            list: [('text', 文本)] 或 [('tool', 工具调用字典)] 组成的列表
+        """
+        self._buffer += text
+        segments = []
         
-        while time.time() - start_time < max_wait_time:
-            try:
-                response = requests.get(url, headers=headers, timeout=30)
-                response.raise_for_status()
-                
-                result = response.json()
-                output = result.get('output', {})
-                task_status = output.get('task_status')
-                
-                print(f"🔄 任务状态: {task_status}")
-                
-                if task_status == 'SUCCEEDED':
-                    return output
-                elif task_status == 'FAILED':
-                    return output
-                elif task_status in ['PENDING', 'RUNNING']:
-                    # 继续等待
-                    time.sleep(poll_interval)
-                    continue
-                else:
-                    print(f"⚠️ 未知任务状态: {task_status}")
-                    time.sleep(poll_interval)
-                    continue
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"❌ 轮询请求失败: {str(e)}")
-                time.sleep(poll_interval)
-                continue
-            except json.JSONDecodeError as e:
-                print(f"❌ 响应解析失败: {str(e)}")
-                time.sleep(poll_interval)
+        while self._buffer:
+            start = self._buffer.find('[')
+            if start == -1:
+                self._append_text(segments, self._buffer)
+                self._buffer = ""
+                break
+            if start > 0:
+                self._append_text(segments, self._buffer[:start])
+                self._buffer = self._buffer[start:]
+            
+            end = self._buffer.find(']')
+            if end == -1:
+                # 可能是尚未完整输出的标记，等待后续片段
+                if self._could_be_marker(self._buffer) and len(self._buffer) < self.MAX_MARKER_LENGTH:
+                    break
+                self._append_text(segments, self._buffer[0])
+                self._buffer = self._buffer[1:]
                 continue
+            
+            tool_call = self._match_marker(self._buffer[:end + 1])
+            if tool_call:
+                segments.append(('tool', tool_call))
+                self._buffer = self._buffer[end + 1:]
+            else:
+                self._append_text(segments, self._buffer[0])
+                self._buffer = self._buffer[1:]
         
-        print(f"⏰ 等待超时 ({max_wait_time}秒)")
+        return segments
+    
+    def flush(self) -> list:
+        """输出结束时，返回剩余的暂存文本"""
+        segments = []
+        if self._buffer:
+            segments.append(('text', self._buffer))
+            self._buffer = ""
+        return segments
+    
+    def _could_be_marker(self, text: str) -> bool:
+        """判断文本是否可能是某个工具标记的开头"""
+        return any(text.startswith(prefix) or prefix.startswith(text)
+                   for prefix in self.MARKER_PREFIXES)
+    
+    def _match_marker(self, candidate: str):
+        """将完整的方括号片段解析为工具调用"""
+        match = self.CLUE_PATTERN.fullmatch(candidate)
+        if match:
+            return {
+                'type': 'show_clue',
+                'chapter': int(match.group(1)),
+                'clue_index': int(match.group(2))
+            }
+        match = self.CHARACTER_PATTERN.fullmatch(candidate)
+        if match:
+            return {
+                'type': 'show_character',
+                'character_name': match.group(1)
+            }
         return None
     
+    @staticmethod
+    def _append_text(segments: list, text: str):
+        """追加文本片段，合并相邻文本"""
+        if segments and segments[-1][0] == 'text':
+            segments[-1] = ('text', segments[-1][1] + text)
+        else:
+            segments.append(('text', text))
 
 def test_image_generation():
     """测试图片生成功能"""
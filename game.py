@@ -1,23 +1,36 @@
-from dm_agent import DMAgent    
+from dm_agent import DMAgent, DEFAULT_IMAGE_SIZE
 from player_agent import PlayerAgent
+from config import Config
+from script_validator import find_script_problems, repair_script
+from image_poller import get_image_poller
+from image_cache import get_image_cache
+from http_utils import download_to_file
+from image_variants import generate_variants
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
 import json
 import os
+import threading
 import time
 
 class Game:
-    def __init__(self, script_path=None, generate_images=True):
+    def __init__(self, script_path=None, generate_images=True, progress_callback=None):
         """
         初始化游戏
         
         Args:
             script_path: 游戏目录路径，None则动态生成新游戏
             generate_images: 是否生成角色和线索图片（仅对新游戏有效）
+            progress_callback: 进度回调函数 callback(event, data)，用于后台任务跟踪创建进度
         """
         print("🎮 初始化剧本杀游戏...")
         
+        self.progress_callback = progress_callback
         self.dm_agent = DMAgent()
         self.character_images = {}  # 存储角色图片信息
         self.clue_images = {}       # 存储线索图片信息
+        self.asset_manifest = {'characters': {}, 'clues': {}}  # 图片资源清单（相对游戏目录的路径）
+        self.creation_time = time.strftime("%Y-%m-%d %H:%M:%S")
         
         if script_path:
             # 加载现有游戏
@@ -35,6 +48,11 @@ class Game:
         
         self.chapter = 0
         
+        # 预生成的章节开场: chapter_num -> {'future': Future, 'history_mark': 预生成时的发言数}
+        self.prepared_chapters = {}
+        self._prepare_lock = threading.Lock()
+        self.speculation_stats = {'prepared': 0, 'hits': 0, 'discarded': 0}
+        
         print("🎉 游戏初始化完成!")
         print(f"📂 游戏资源目录: {self.game_dir}")
     
@@ -55,9 +73,11 @@ class Game:
             raise ValueError(f"❌ 剧本文件不存在: {script_file}")
         
         # 加载剧本
+        self._notify_progress('phase', phase='script')
         self.script = self._load_script(script_file)
         if not self.script:
             raise ValueError("❌ 剧本加载失败!")
+        self._notify_script_ready()
         
         print(f"✅ 剧本加载成功: {self.script.get('title', '未命名剧本')}")
         print(f"👥 角色数量: {len(self.script.get('characters', []))}")
@@ -86,8 +106,12 @@ class Game:
         
         # 生成新剧本
         print("🎭 开始生成新剧本...")
+        self._notify_progress('phase', phase='script')
         self.script = self.dm_agent.gen_script()
         
+        # 缺失或格式错误的部分只补写对应片段，不整本重新生成
+        self.script, _ = repair_script(self.script, self.dm_agent)
+        
         if not self.script:
             raise ValueError("❌ 剧本生成失败!")
         
@@ -98,17 +122,49 @@ class Game:
         print(f"✅ 剧本生成成功: {self.script.get('title', '未命名剧本')}")
         print(f"👥 角色数量: {len(self.script.get('characters', []))}")
         print(f"📄 剧本文件: {script_file}")
+        self._notify_script_ready()
         
         # 生成图片
         if generate_images:
-            self._generate_character_images()
-            self._generate_clue_images()
+            self._generate_images()
         
         # 保存游戏信息
         self.save_game_info()
     
+    def _notify_progress(self, event: str, **data):
+        """通知进度回调，回调异常不影响游戏创建"""
+        if not self.progress_callback:
+            return
+        try:
+            self.progress_callback(event, data)
+        except Exception as e:
+            print(f"⚠️ 进度回调失败: {e}")
+    
+    def _notify_script_ready(self):
+        """通知剧本已就绪"""
+        self._notify_progress(
+            'script_ready',
+            title=self.script.get('title', '未命名剧本'),
+            characters=self.script.get('characters', []),
+            game_dir=self.game_dir
+        )
+    
+    def _notify_image_status(self, job: dict, status: str, local_path: str = None):
+        """通知单张图片的状态变化"""
+        self._notify_progress(
+            'image',
+            kind=job['kind'],
+            name=job['name'],
+            filename=job['filename'],
+            status=status,
+            local_path=local_path
+        )
+    
     def _load_existing_images(self):
-        """加载现有图片信息"""
+        """加载现有图片信息（优先使用game_info.json中的资源清单）"""
+        if self._load_asset_manifest():
+            return
+        
         if not os.path.exists(self.imgs_dir):
             print("⚠️ 图片目录不存在")
             return
@@ -177,6 +233,132 @@ class Game:
         print(f"📊 现有图片统计:")
         print(f"   角色图片: {char_count}/{len(characters)} 个")
         print(f"   线索图片: {clue_count}/{total_clues} 个")
+        
+        # 旧版本游戏没有资源清单，扫描一次后写入game_info.json
+        self._rebuild_asset_manifest()
+        self._persist_asset_manifest()
+    
+    def _load_asset_manifest(self) -> bool:
+        """
+        从game_info.json加载资源清单并恢复图片信息
+        
+        Returns:
+            bool: 是否成功加载清单
+        """
+        info = self._read_game_info()
+        manifest = info.get('asset_manifest') if info else None
+        if not manifest:
+            return False
+        
+        self.asset_manifest = {
+            'characters': dict(manifest.get('characters', {})),
+            'clues': {str(ch): list(paths) for ch, paths in manifest.get('clues', {}).items()}
+        }
+        
+        for character in self.script.get('characters', []):
+            rel_path = self.asset_manifest['characters'].get(character)
+            self.character_images[character] = self._manifest_image_result(rel_path)
+        
+        for chapter_idx, chapter_clues in enumerate(self.script.get('clue_image_prompts', [])):
+            chapter_num = chapter_idx + 1
+            paths = self.asset_manifest['clues'].get(str(chapter_num), [])
+            self.clue_images[chapter_num] = []
+            for clue_idx, prompt in enumerate(chapter_clues):
+                rel_path = paths[clue_idx] if clue_idx < len(paths) else None
+                self.clue_images[chapter_num].append({
+                    'name': f"第{chapter_num}章线索{clue_idx + 1}",
+                    'prompt': prompt,
+                    'image_result': self._manifest_image_result(rel_path)
+                })
+        
+        char_count = sum(1 for path in self.asset_manifest['characters'].values() if path)
+        clue_count = sum(1 for paths in self.asset_manifest['clues'].values() for path in paths if path)
+        print(f"📋 从资源清单加载图片: 角色{char_count}个, 线索{clue_count}个")
+        return True
+    
+    def _manifest_image_result(self, rel_path: str):
+        """根据清单路径构造图片信息"""
+        if not rel_path:
+            return None
+        return {
+            'success': True,
+            'local_path': os.path.join(self.game_dir, rel_path),
+            'filename': os.path.basename(rel_path),
+            'loaded_from_disk': True
+        }
+    
+    def _rebuild_asset_manifest(self):
+        """根据已加载的图片信息重建资源清单，缺失的角色图片按旧命名规则匹配一次"""
+        image_exts = ('.png', '.jpg', '.jpeg')
+        image_files = []
+        if os.path.exists(self.imgs_dir):
+            image_files = sorted(f for f in os.listdir(self.imgs_dir) if f.lower().endswith(image_exts))
+        
+        characters = {}
+        for character in self.script.get('characters', []):
+            result = self.character_images.get(character)
+            filename = result.get('filename') if result and result.get('success') else None
+            if not filename:
+                filename = self._match_legacy_character_image(character, image_files)
+            characters[character] = f"imgs/{filename}" if filename else None
+        
+        clues = {}
+        for chapter_num, chapter_clues in self.clue_images.items():
+            clues[str(chapter_num)] = [
+                f"imgs/{clue['image_result']['filename']}"
+                if clue['image_result'] and clue['image_result'].get('success') else None
+                for clue in chapter_clues
+            ]
+        
+        self.asset_manifest = {'characters': characters, 'clues': clues}
+    
+    def _match_legacy_character_image(self, character: str, image_files: list):
+        """按旧版本的命名规则匹配角色图片文件名"""
+        for prefix in (f"{character}.", f"character_{character}.", f"{character}头像.", f"角色_{character}."):
+            for filename in image_files:
+                if filename.startswith(prefix):
+                    return filename
+        
+        # 模糊匹配
+        for filename in image_files:
+            if (character in filename and
+                not any(skip_word in filename.lower() for skip_word in ['线索', 'clue', '证据', '场景'])):
+                return filename
+        return None
+    
+    def _read_game_info(self) -> dict:
+        """读取game_info.json，不存在或损坏时返回None"""
+        info_file = os.path.join(self.game_dir, "game_info.json")
+        if not os.path.exists(info_file):
+            return None
+        try:
+            with open(info_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ 读取游戏信息失败: {e}")
+            return None
+    
+    def _write_game_info(self, game_info: dict):
+        """原子写入game_info.json（先写临时文件再替换）"""
+        info_file = os.path.join(self.game_dir, "game_info.json")
+        tmp_file = f"{info_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(game_info, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp_file, info_file)
+    
+    def _persist_asset_manifest(self):
+        """将资源清单合并写入game_info.json"""
+        try:
+            game_info = self._read_game_info() or {
+                'game_directory': self.game_dir,
+                'script_title': self.script.get('title', '未命名剧本'),
+                'characters': self.script.get('characters', []),
+                'chapters': len(self.script.get('dm', []))
+            }
+            game_info['asset_manifest'] = self.asset_manifest
+            self._write_game_info(game_info)
+        except Exception as e:
+            print(f"⚠️ 保存资源清单失败: {e}")
     
     def _load_script(self, script_path: str) -> dict:
         """从JSON文件加载剧本"""
@@ -189,6 +371,8 @@ class Game:
             for key in required_keys:
                 if key not in script:
                     print(f"⚠️ 剧本缺少必要字段: {key}")
+            for problem in find_script_problems(script):
+                print(f"⚠️ {problem['reason']}")
             
             return script
             
@@ -209,166 +393,237 @@ class Game:
             print(f"❌ 剧本保存失败: {e}")
     
     def _download_image(self, image_url: str, filename: str) -> str:
-        """下载图片到指定位置"""
+        """下载图片到指定位置（流式写入临时文件后原子替换，不会改动图片缓存的硬链接）"""
         try:
-            import requests
-            
-            # 下载图片
-            response = requests.get(image_url, timeout=60)
-            response.raise_for_status()
-            
-            # 保存图片到imgs目录
-            local_path = os.path.join(self.imgs_dir, filename)
-            with open(local_path, 'wb') as f:
-                f.write(response.content)
-            
-            return local_path
-            
+            return download_to_file(image_url, os.path.join(self.imgs_dir, filename), timeout=60)
         except Exception as e:
             print(f"❌ 图片下载失败: {str(e)}")
             return None
     
+    def _generate_images(self):
+        """并发生成所有角色图片和线索图片"""
+        jobs = self._build_character_image_jobs() + self._build_clue_image_jobs()
+        if not jobs:
+            print("⚠️ 剧本中没有找到图片提示词")
+            return
+        self._run_image_pipeline(jobs)
+    
     def _generate_character_images(self):
         """生成角色图片"""
-        character_prompts = self.script.get('character_image_prompts', {})
-        
-        if not character_prompts:
+        jobs = self._build_character_image_jobs()
+        if not jobs:
             print("⚠️ 剧本中没有找到角色图片提示词")
             return
-        
-        print(f"\n🎨 开始生成角色图片...")
-        print(f"📋 需要生成 {len(character_prompts)} 个角色图片")
-        
-        for i, (character, prompt) in enumerate(character_prompts.items(), 1):
-            print(f"\n👤 [{i}/{len(character_prompts)}] 生成角色: {character}")
-            print(f"📝 提示词: {prompt[:50]}...")
-            
-            try:
-                # 生成角色图片
-                result = self.dm_agent.gen_image(prompt)
-                
-                if result and result.get('success'):
-                    # 下载图片到本地
-                    filename = f"{character}.png"
-                    local_path = self._download_image(result['url'], filename)
-                    
-                    if local_path:
-                        # 更新结果信息
-                        result['local_path'] = local_path
-                        result['filename'] = filename
-                        self.character_images[character] = result
-                        print(f"✅ {character} 图片生成成功!")
-                        print(f"📁 保存路径: {local_path}")
-                    else:
-                        print(f"❌ {character} 图片下载失败!")
-                        self.character_images[character] = None
-                else:
-                    print(f"❌ {character} 图片生成失败!")
-                    if result:
-                        print(f"   错误: {result.get('error_message')}")
-                    self.character_images[character] = None
-                
-                # 避免API频率限制
-                if i < len(character_prompts):
-                    print("⏳ 等待3秒避免频率限制...")
-                    time.sleep(3)
-                    
-            except Exception as e:
-                print(f"❌ {character} 图片生成异常: {str(e)}")
-                self.character_images[character] = None
-        
-        success_count = sum(1 for result in self.character_images.values() if result and result.get('success'))
-        print(f"\n📊 角色图片生成完成: {success_count}/{len(character_prompts)} 成功")
+        self._run_image_pipeline(jobs)
     
     def _generate_clue_images(self):
         """生成线索图片"""
-        clue_prompts = self.script.get('clue_image_prompts', [])
-        
-        if not clue_prompts:
+        jobs = self._build_clue_image_jobs()
+        if not jobs:
             print("⚠️ 剧本中没有找到线索图片提示词")
             return
-        
-        print(f"\n🔍 开始生成线索图片...")
-        total_clues = sum(len(chapter_clues) for chapter_clues in clue_prompts)
-        print(f"📋 需要生成 {total_clues} 个线索图片")
-        
-        clue_count = 0
-        
-        for chapter_idx, chapter_clues in enumerate(clue_prompts):
+        self._run_image_pipeline(jobs)
+    
+    def _build_character_image_jobs(self) -> list:
+        """构建角色图片任务列表，并为每个角色预置空结果"""
+        jobs = []
+        for character, prompt in self.script.get('character_image_prompts', {}).items():
+            self.character_images[character] = None
+            self.asset_manifest['characters'][character] = None
+            jobs.append({
+                'kind': 'character',
+                'name': character,
+                'prompt': prompt,
+                'filename': f"{character}.png"
+            })
+        return jobs
+    
+    def _build_clue_image_jobs(self) -> list:
+        """构建线索图片任务列表，并按章节顺序预置线索条目"""
+        jobs = []
+        for chapter_idx, chapter_clues in enumerate(self.script.get('clue_image_prompts', [])):
             chapter_num = chapter_idx + 1
-            print(f"\n📖 第{chapter_num}章线索:")
-            
-            if chapter_num not in self.clue_images:
-                self.clue_images[chapter_num] = []
+            self.clue_images[chapter_num] = []
+            self.asset_manifest['clues'][str(chapter_num)] = [None] * len(chapter_clues)
             
             for clue_idx, prompt in enumerate(chapter_clues):
-                clue_count += 1
-                clue_name = f"第{chapter_num}章线索{clue_idx + 1}"
+                clue_info = {
+                    'name': f"第{chapter_num}章线索{clue_idx + 1}",
+                    'prompt': prompt,
+                    'image_result': None
+                }
+                self.clue_images[chapter_num].append(clue_info)
+                jobs.append({
+                    'kind': 'clue',
+                    'name': clue_info['name'],
+                    'prompt': prompt,
+                    'filename': f"clue-ch{chapter_num}-{clue_idx + 1}.png",
+                    'clue_info': clue_info,
+                    'chapter': chapter_num,
+                    'index': clue_idx
+                })
+        return jobs
+    
+    def _run_image_pipeline(self, jobs: list):
+        """
+        图片生成流水线
+        
+        按并发上限提交任务（提交频率由全局t2i限流器控制），由共享轮询器以自适应间隔查询任务状态，
+        任务完成后立即下载并更新character_images/clue_images。
+        """
+        concurrency = max(1, Config.IMAGE_GEN_CONCURRENCY)
+        print(f"\n🎨 开始生成图片: 共{len(jobs)}张, 并发上限{concurrency}")
+        pipeline_start = time.time()
+        
+        self._notify_progress('phase', phase='images')
+        for job in jobs:
+            self._notify_image_status(job, 'pending')
+        
+        poller = get_image_poller(self.dm_agent.check_image_task)
+        pending = deque(jobs)
+        running = {}  # Future -> job
+        finished = 0
+        
+        while pending or running:
+            # 补充提交任务直到达到并发上限
+            while pending and len(running) < concurrency:
+                job = pending.popleft()
+                if self._use_cached_image(job):
+                    finished += 1
+                    continue
+                print(f"📝 提交: {job['name']} - {job['prompt'][:50]}...")
+                task_id = self.dm_agent.submit_image_task(job['prompt'], DEFAULT_IMAGE_SIZE)
+                if task_id:
+                    running[poller.track(task_id, timeout=Config.IMAGE_TASK_TIMEOUT)] = job
+                    self._notify_image_status(job, 'submitted')
+                else:
+                    finished += 1
+                    self._finish_image_job(job, None)
+            
+            if not running:
+                continue
+            
+            # 等待任意一个任务结束
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                task = future.result()
+                finished += 1
                 
-                print(f"\n🔍 [{clue_count}/{total_clues}] 生成: {clue_name}")
-                print(f"📝 提示词: {prompt[:50]}...")
+                if task['status'] == 'TIMEOUT':
+                    print(f"⏰ {job['name']} 等待超时 ({Config.IMAGE_TASK_TIMEOUT}秒)")
+                    self._finish_image_job(job, None)
+                    continue
                 
-                try:
-                    # 生成线索图片
-                    result = self.dm_agent.gen_image(prompt)
-                    
-                    if result and result.get('success'):
-                        # 下载图片到本地，使用新的命名格式
-                        filename = f"clue-ch{chapter_num}-{clue_idx + 1}.png"
-                        local_path = self._download_image(result['url'], filename)
-                        
-                        if local_path:
-                            # 更新结果信息
-                            result['local_path'] = local_path
-                            result['filename'] = filename
-                            clue_info = {
-                                'name': clue_name,
-                                'prompt': prompt,
-                                'image_result': result
-                            }
-                            self.clue_images[chapter_num].append(clue_info)
-                            print(f"✅ {clue_name} 图片生成成功!")
-                            print(f"📁 保存路径: {local_path}")
-                        else:
-                            print(f"❌ {clue_name} 图片下载失败!")
-                            clue_info = {
-                                'name': clue_name,
-                                'prompt': prompt,
-                                'image_result': None
-                            }
-                            self.clue_images[chapter_num].append(clue_info)
-                    else:
-                        print(f"❌ {clue_name} 图片生成失败!")
-                        if result:
-                            print(f"   错误: {result.get('error_message')}")
-                        clue_info = {
-                            'name': clue_name,
-                            'prompt': prompt,
-                            'image_result': None
-                        }
-                        self.clue_images[chapter_num].append(clue_info)
-                    
-                    # 避免API频率限制
-                    if clue_count < total_clues:
-                        print("⏳ 等待3秒避免频率限制...")
-                        time.sleep(3)
-                        
-                except Exception as e:
-                    print(f"❌ {clue_name} 图片生成异常: {str(e)}")
-                    clue_info = {
-                        'name': clue_name,
-                        'prompt': prompt,
-                        'image_result': None
-                    }
-                    self.clue_images[chapter_num].append(clue_info)
+                timing = f"{task['elapsed']:.1f}秒, 查询{task['polls']}次"
+                if task['queue_time'] is not None and task['run_time'] is not None:
+                    timing += f", 排队{task['queue_time']:.1f}秒, 生成{task['run_time']:.1f}秒"
+                print(f"\n🖼️ [{finished}/{len(jobs)}] {job['name']} 任务结束: {task['status']} ({timing})")
+                result = self.dm_agent.build_image_result(task['output'], job['prompt'], task['task_id'], task['elapsed'])
+                self._finish_image_job(job, result)
+        
+        print(f"\n📊 图片生成完成: 共{len(jobs)}张, 总耗时{time.time() - pipeline_start:.1f}秒")
+        self._print_image_summary()
+    
+    def _use_cached_image(self, job: dict) -> bool:
+        """相同模型、提示词和尺寸生成过图片时直接使用缓存，不提交任务也不下载"""
+        cache = get_image_cache()
+        if cache is None:
+            return False
+        
+        job['cache_key'] = cache.make_key(Config.MODEL_T2I, job['prompt'], DEFAULT_IMAGE_SIZE)
+        local_path = os.path.join(self.imgs_dir, job['filename'])
+        entry = cache.materialize(job['cache_key'], local_path)
+        if entry is None:
+            return False
+        
+        self._finish_image_job(job, {
+            'success': True,
+            'cached': True,
+            'original_prompt': job['prompt'],
+            'actual_prompt': entry.get('actual_prompt') or job['prompt'],
+            'generation_time': 0,
+            'local_path': local_path,
+            'filename': job['filename']
+        })
+        return True
+    
+    def _finish_image_job(self, job: dict, result: dict):
+        """下载已完成任务的图片并更新对应的图片信息"""
+        if result and result.get('cached'):
+            print(f"♻️ {job['name']} 使用缓存图片: {result['local_path']}")
+            self._generate_image_variants(result)
+        elif result and result.get('success'):
+            local_path = self._download_image(result['url'], job['filename'])
+            if local_path:
+                result['local_path'] = local_path
+                result['filename'] = job['filename']
+                print(f"✅ {job['name']} 图片生成成功!")
+                print(f"📁 保存路径: {local_path}")
+                self._store_cached_image(job, result)
+                self._generate_image_variants(result)
+            else:
+                print(f"❌ {job['name']} 图片下载失败!")
+                result = None
+        else:
+            print(f"❌ {job['name']} 图片生成失败!")
+            if result:
+                print(f"   错误: {result.get('error_message')}")
+            result = None
         
-        # 统计成功数量
-        success_count = 0
+        if job['kind'] == 'character':
+            self.character_images[job['name']] = result
+        else:
+            job['clue_info']['image_result'] = result
+        
+        # 图片落盘后立即更新资源清单
+        if result:
+            rel_path = f"imgs/{job['filename']}"
+            if job['kind'] == 'character':
+                self.asset_manifest['characters'][job['name']] = rel_path
+            else:
+                self.asset_manifest['clues'][str(job['chapter'])][job['index']] = rel_path
+            self._persist_asset_manifest()
+        
+        if result:
+            self._notify_image_status(job, 'done', result['local_path'])
+        else:
+            self._notify_image_status(job, 'failed')
+    
+    def _generate_image_variants(self, result: dict):
+        """图片落盘后预先生成缩略图和WebP版本，记录相对游戏目录的路径"""
+        variants = generate_variants(result['local_path'])
+        if variants:
+            result['variants'] = {
+                variant: os.path.relpath(path, self.game_dir).replace('\\', '/')
+                for variant, path in variants.items()
+            }
+    
+    def _store_cached_image(self, job: dict, result: dict):
+        """把新下载的图片加入图片缓存"""
+        cache = get_image_cache()
+        if cache is None or not job.get('cache_key'):
+            return
+        cache.put(job['cache_key'], result['local_path'], {
+            'model': Config.MODEL_T2I,
+            'size': DEFAULT_IMAGE_SIZE,
+            'prompt': job['prompt'],
+            'actual_prompt': result.get('actual_prompt')
+        })
+    
+    def _print_image_summary(self):
+        """输出图片生成统计"""
+        character_success = sum(1 for result in self.character_images.values() if result and result.get('success'))
+        clue_success = 0
+        clue_total = 0
         for chapter_clues in self.clue_images.values():
-            success_count += sum(1 for clue in chapter_clues 
-                               if clue['image_result'] and clue['image_result'].get('success'))
+            clue_total += len(chapter_clues)
+            clue_success += sum(1 for clue in chapter_clues 
+                                if clue['image_result'] and clue['image_result'].get('success'))
         
-        print(f"\n📊 线索图片生成完成: {success_count}/{total_clues} 成功")
+        print(f"   角色图片: {character_success}/{len(self.character_images)} 成功")
+        print(f"   线索图片: {clue_success}/{clue_total} 成功")
+    
     
     def get_character_image(self, character: str) -> dict:
         """获取角色图片信息"""
@@ -386,6 +641,20 @@ class Game:
         """获取所有线索图片信息"""
         return self.clue_images
     
+    def get_character_image_path(self, character: str) -> str:
+        """从资源清单获取角色图片路径，没有图片返回None"""
+        rel_path = self.asset_manifest['characters'].get(character)
+        if not rel_path:
+            return None
+        return f"{self.game_dir}/{rel_path}".replace('\\', '/')
+    
+    def get_clue_image_paths(self, chapter: int) -> list:
+        """从资源清单获取指定章节的线索图片路径列表（未生成的为None）"""
+        return [
+            f"{self.game_dir}/{rel_path}".replace('\\', '/') if rel_path else None
+            for rel_path in self.asset_manifest['clues'].get(str(chapter), [])
+        ]
+    
     def save_game_info(self):
         """保存游戏信息到游戏目录"""
         info_file = os.path.join(self.game_dir, "game_info.json")
@@ -429,12 +698,12 @@ class Game:
                 'character_images': self.character_images,
                 'clue_images': self.clue_images
             },
-            'creation_time': time.strftime("%Y-%m-%d %H:%M:%S")
+            'asset_manifest': self.asset_manifest,
+            'creation_time': self.creation_time
         }
         
         try:
-            with open(info_file, 'w', encoding='utf-8') as f:
-                json.dump(game_info, f, ensure_ascii=False, indent=2, default=str)
+            self._write_game_info(game_info)
             print(f"💾 游戏信息已保存到: {info_file}")
             
             # 显示统计信息
@@ -457,24 +726,111 @@ class Game:
         """获取总章节数"""
         return len(self.script.get('dm', []))
     
-    def start_chapter(self, chapter_num: int, chat_history: str = "") -> dict:
-        """开始新章节，返回DM开场发言"""
+    def start_chapter(self, chapter_num: int, chat_history: str = "", history_mark: int = None) -> dict:
+        """
+        开始新章节，返回DM开场发言
+        
+        Args:
+            chapter_num: 章节号（从1开始）
+            chat_history: 聊天历史
+            history_mark: 当前的发言数，用于判断预生成的开场是否仍然可用
+        """
         dm_script = self.script.get('dm', [])
         
         print(f"📖 开始第{chapter_num}章 (共{len(dm_script)}章)")
         self.chapter = chapter_num
         
-        dm_result = self.dm_agent.speak(
+        prepared = self._take_prepared_chapter(chapter_num, history_mark)
+        if prepared:
+            return prepared
+        
+        return self._generate_chapter_opening(chapter_num, chat_history)
+    
+    def _generate_chapter_opening(self, chapter_num: int, chat_history: str) -> dict:
+        """调用DM生成章节开场发言"""
+        return self.dm_agent.speak(
             chapter=chapter_num - 1,  # speak方法从0开始计数
-            script=dm_script,
+            script=self.script.get('dm', []),
             chat_history=chat_history,
             title=self.script.get('title', '剧本杀游戏'),
             characters=self.script.get('characters', []),
             clues=self.script.get('clues', []),
             base_path=self.game_dir
         )
+    
+    def prepare_chapter(self, chapter_num: int, chat_history: str, history_mark: int, executor) -> bool:
+        """
+        在后台预生成章节开场发言（在上一章最后一轮讨论时调用）
         
-        return dm_result
+        已有预生成结果且之后新增的发言不超过DM_SPECULATIVE_MAX_NEW_TURNS时不重复生成；
+        上一次预生成仍在进行时也不重复提交，过时的预生成被取消后才重新提交。
+        
+        Args:
+            chapter_num: 要预生成的章节号（从1开始）
+            chat_history: 当前的聊天历史
+            history_mark: 当前的发言数
+            executor: 执行后台生成的线程池
+            
+        Returns:
+            bool: 是否提交了新的预生成
+        """
+        if chapter_num > self.get_total_chapters():
+            return False
+        
+        with self._prepare_lock:
+            prepared = self.prepared_chapters.get(chapter_num)
+            if prepared:
+                if history_mark - prepared['history_mark'] <= Config.DM_SPECULATIVE_MAX_NEW_TURNS:
+                    return False
+                future = prepared['future']
+                if future.running():
+                    # 正在生成，等它结束后再决定是否重新生成，避免每隔几条发言就发起一次完整的DM调用
+                    return False
+                future.cancel()
+                self.speculation_stats['discarded'] += 1
+            
+            print(f"🔮 预生成第{chapter_num}章开场 (当前发言数: {history_mark})")
+            self.prepared_chapters[chapter_num] = {
+                'future': executor.submit(self._generate_chapter_opening, chapter_num, chat_history),
+                'history_mark': history_mark
+            }
+            self.speculation_stats['prepared'] += 1
+            return True
+    
+    def _take_prepared_chapter(self, chapter_num: int, history_mark: int):
+        """取出预生成的章节开场，聊天历史变化过大或生成失败时返回None"""
+        with self._prepare_lock:
+            prepared = self.prepared_chapters.pop(chapter_num, None)
+        if not prepared:
+            return None
+        
+        new_turns = None if history_mark is None else history_mark - prepared['history_mark']
+        if new_turns is None or new_turns > Config.DM_SPECULATIVE_MAX_NEW_TURNS:
+            print(f"🔮 第{chapter_num}章预生成开场已过时 (新增发言: {new_turns})，重新生成")
+            prepared['future'].cancel()
+            self.speculation_stats['discarded'] += 1
+            return None
+        
+        if prepared['future'].cancel():
+            # 还在排队没有开始生成，等待它不比重新生成快
+            print(f"🔮 第{chapter_num}章预生成开场尚未开始，重新生成")
+            self.speculation_stats['discarded'] += 1
+            return None
+        
+        try:
+            # 仍在生成时等待它完成，比重新生成更快
+            dm_result = prepared['future'].result(timeout=Config.DM_SPEAK_WAIT_TIMEOUT)
+        except Exception as e:
+            print(f"⚠️ 第{chapter_num}章预生成开场失败: {e}")
+            dm_result = None
+        
+        if not dm_result or not dm_result.get('success', False):
+            self.speculation_stats['discarded'] += 1
+            return None
+        
+        print(f"⚡ 使用预生成的第{chapter_num}章开场 (新增发言: {new_turns})")
+        self.speculation_stats['hits'] += 1
+        return {**dm_result, 'speculative': True}
     
     def end_chapter(self, chapter_num: int, chat_history: str) -> dict:
         """结束当前章节，返回DM总结发言"""
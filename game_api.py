@@ -3,18 +3,33 @@
 与test_ai_game_simulation.py中的游戏流程对接
 """
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 import os
 import json
 import time
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import traceback
 
+from config import Config
+from game_jobs import GameJobManager
+from game_events import SessionEventHub
+from single_flight import SingleFlight
+from game_catalog import GameCatalog
+from action_log import ActionLog
+from chat_summarizer import ChatSummarizer
+from session_store import (
+    create_session_store, estimate_size, merge_session_states,
+    SessionRegistry, PlayerSessionMap, SessionConflictError
+)
+from script_validator import repair_script_file
+from ai_dispatch import submit_ai_query, collect_ai_query, run_ai_queries, parse_query_timeout
+
 # 导入游戏相关模块
 try:
     from game import Game
-    from player_agent import PlayerAgent
+    from player_agent import PlayerAgent, PlayerEnsemble
     from dm_agent import DMAgent
 except ImportError as e:
     print(f"导入游戏模块失败: {e}")
@@ -23,9 +38,131 @@ except ImportError as e:
 # 创建蓝图
 game_bp = Blueprint('game', __name__, url_prefix='/api/game')
 
-# 全局游戏会话存储
-ACTIVE_GAMES = {}
-PLAYER_SESSIONS = {}
+# AI玩家调用线程池（进程内共享，限制同时进行的LLM调用数量）
+AI_QUERY_EXECUTOR = ThreadPoolExecutor(
+    max_workers=Config.GAME_AI_MAX_WORKERS,
+    thread_name_prefix='ai-query'
+)
+
+# 预先生成线程池（预取AI回答、预生成下一章开场），避免投机任务排在实时调用前面
+SPECULATIVE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=Config.GAME_AI_SPECULATIVE_WORKERS,
+    thread_name_prefix='ai-speculative'
+)
+
+# 游戏创建后台任务（剧本和图片生成在后台线程中执行）
+GAME_JOBS = GameJobManager(max_workers=Config.GAME_JOB_WORKERS)
+
+# 会话事件通知（/stream事件流使用）
+EVENT_HUB = SessionEventHub()
+
+# DM发言请求合并（多个客户端同时请求同一段DM发言时只生成一次）
+DM_SPEAK_FLIGHTS = SingleFlight(ttl=Config.DM_SPEAK_DEDUP_TTL)
+
+# 游戏目录索引（/list接口使用）
+GAME_CATALOG = GameCatalog('log')
+
+def _character_image_path(session, char_name):
+    """从内存中的任务状态或游戏实例获取角色图片路径"""
+    local_path = None
+    job = GAME_JOBS.get(session.session_id)
+    if job:
+        local_path = job.character_image(char_name)
+    if not local_path and session.game_instance:
+        local_path = session.game_instance.get_character_image_path(char_name)
+    return local_path.replace('\\', '/') if local_path else None
+
+def _new_chat_summary():
+    """创建会话共享的聊天摘要器"""
+    return ChatSummarizer(
+        keep_turns=Config.CHAT_SUMMARY_KEEP_TURNS,
+        token_threshold=Config.CHAT_SUMMARY_TOKEN_THRESHOLD,
+        summary_max_tokens=Config.CHAT_SUMMARY_MAX_TOKENS
+    )
+
+def _build_chat_context(session):
+    """构建AI玩家和DM使用的聊天历史（章节摘要 + 最近发言原文）"""
+    session.chat_summary.sync(session.action_history)
+    return session.chat_summary.render()
+
+def _chat_turn_count(session):
+    """玩家发言和回答的总条数（判断预生成的章节开场是否过时）"""
+    return session.action_history.count('player_action', 'answer')
+
+def _maybe_prepare_next_chapter(session):
+    """最后一轮讨论中在后台预生成下一章的DM开场（DM_SPECULATIVE_OPENING开启时）"""
+    game = session.game_instance
+    if not Config.DM_SPECULATIVE_OPENING or not game:
+        return
+    if session.current_chapter < 1 or session.current_cycle < Config.GAME_CHAPTER_CYCLES:
+        return
+    try:
+        game.prepare_chapter(
+            session.current_chapter + 1,
+            _build_chat_context(session),
+            _chat_turn_count(session),
+            SPECULATIVE_EXECUTOR
+        )
+    except Exception as e:
+        print(f"⚠️ 预生成下一章开场失败: {e}")
+
+def _generate_ai_answer(session, character_name, question, asker, chapter):
+    """让AI角色回答问题，返回回答内容"""
+    game = session.game_instance
+    ai_player = session.ai_players.get(character_name)
+    if ai_player is None:
+        ai_player = session.ai_players.setdefault(character_name, PlayerAgent(character_name))
+    
+    # 获取角色剧本（只到当前章节）
+    available_scripts = game.script.get(character_name, [])[:chapter]
+    return ai_player.response(
+        scripts=available_scripts,
+        chat_history=_build_chat_context(session),
+        query=question,
+        query_player=asker
+    )
+
+def _prefetch_ai_answers(session, asker, queries, chapter):
+    """
+    问题记录后立即在后台生成AI角色的回答
+    
+    /ai_answer被调用时直接取用已完成或正在生成的结果，客户端的回答延迟期间LLM已在工作。
+    """
+    game = session.game_instance
+    if not Config.GAME_AI_PREFETCH_ANSWERS or not game or not queries:
+        return
+    
+    human_characters = set(session.players.values())
+    ai_characters = set(game.script.get('characters', [])) - human_characters
+    
+    # 丢弃之前章节中未被取用的回答
+    for key in [key for key in session.pending_answers if key[3] != chapter]:
+        session.pending_answers.pop(key, None)
+    
+    for target, question in queries.items():
+        if target not in ai_characters or target == asker:
+            continue
+        key = (target, asker, question, chapter)
+        if key in session.pending_answers:
+            continue
+        print(f"🔮 预先生成 {target} 对 {asker} 的回答")
+        session.pending_answers[key] = SPECULATIVE_EXECUTOR.submit(
+            _generate_ai_answer, session, target, question, asker, chapter
+        )
+
+def _take_prefetched_answer(session, character_name, question, asker, chapter):
+    """取出预先生成的回答，没有或生成失败时返回None"""
+    future = session.pending_answers.pop((character_name, asker, question, chapter), None)
+    if future is None:
+        return None
+    if future.cancel():
+        # 还在排队，没有开始生成：直接实时生成，不等待前面的预先生成任务
+        return None
+    try:
+        return future.result(timeout=Config.GAME_AI_QUERY_TIMEOUT)
+    except Exception as e:
+        print(f"⚠️ 预先生成的回答不可用，重新生成: {e}")
+        return None
 
 class GameSession:
     """游戏会话管理"""
@@ -40,6 +177,11 @@ class GameSession:
         self.chat_history = ""
         self.game_instance = None
         self.ai_players = {}  # character_name -> PlayerAgent
+        self.pending_answers = {}  # (回答者, 提问者, 问题, 章节) -> 预先生成回答的Future（不持久化）
+        self.action_history = ActionLog()  # 行动记录（按章节/轮次索引）
+        self.chat_summary = _new_chat_summary()  # 提示词使用的滚动摘要（所有AI共享）
+        self.current_cycle = 1
+        self.version = 0  # 持久化版本号，用于多进程间同步
         
         # 进度跟踪
         self.script_ready = False
@@ -71,22 +213,168 @@ class GameSession:
         if self.game_instance:
             return self.game_instance.get_total_chapters()
         return 0
+    
+    def to_state(self):
+        """导出需要持久化的会话状态（不包含游戏实例和AI代理）"""
+        return {
+            'version': self.version,
+            'session_id': self.session_id,
+            'game_path': self.game_path,
+            'created_at': self.created_at.isoformat(),
+            'players': [[user_id, character] for user_id, character in self.players.items()],
+            'current_chapter': self.current_chapter,
+            'current_cycle': self.current_cycle,
+            'game_state': self.game_state,
+            'chat_history': self.chat_history,
+            'action_history': self.action_history.to_list(),
+            'chat_summary': self.chat_summary.to_state(),
+            'script_ready': self.script_ready,
+            'images_ready': self.images_ready,
+            'game_ready': self.game_ready
+        }
+    
+    def apply_state(self, state):
+        """
+        用持久化状态刷新会话
+        
+        游戏实例在游戏目录可用时从磁盘重新加载，AI代理由各接口按需创建。
+        """
+        self.version = state.get('version', 0)
+        self.game_path = state.get('game_path')
+        self.created_at = datetime.fromisoformat(state['created_at'])
+        self.players = {user_id: character for user_id, character in state.get('players', [])}
+        self.current_chapter = state.get('current_chapter', 0)
+        self.current_cycle = state.get('current_cycle', 1)
+        self.game_state = state.get('game_state', 'waiting')
+        self.chat_history = state.get('chat_history', '')
+        self.action_history = ActionLog(state.get('action_history', []))
+        self.chat_summary.load_state(state.get('chat_summary'))
+        self.script_ready = state.get('script_ready', False)
+        self.images_ready = state.get('images_ready', False)
+        self.game_ready = state.get('game_ready', False)
+        
+        if self.game_instance is None and self.game_ready and self.game_path:
+            print(f"♻️ 从存储恢复游戏会话: {self.session_id}")
+            self.game_instance = Game(script_path=self.game_path, generate_images=False)
+        return self
+    
+    def memory_usage(self):
+        """
+        估算会话占用的内存
+        
+        Returns:
+            dict: 各部分的字节数及总计（共享的OpenAI客户端不计入）
+        """
+        usage = {
+            'chat_history': estimate_size(self.chat_history),
+            'action_history': estimate_size(self.action_history.to_list()),
+            'chat_summary': estimate_size(self.chat_summary.to_state()),
+            'script': 0,
+            'images': 0,
+            'agents': 0
+        }
+        if self.game_instance:
+            game = self.game_instance
+            usage['script'] = estimate_size(game.script)
+            usage['images'] = estimate_size(game.character_images) + estimate_size(game.clue_images)
+            agents = list(game.player_agents) + [game.dm_agent]
+        else:
+            agents = []
+        agents += list(self.ai_players.values())
+        if getattr(self, 'dm_agent', None):
+            agents.append(self.dm_agent)
+        usage['agents'] = sum(
+            estimate_size({k: v for k, v in vars(agent).items() if k != 'client'})
+            for agent in agents
+        )
+        usage['total'] = sum(usage.values())
+        return usage
+
+def _restore_session(state, session=None):
+    """从持久化状态恢复会话，session不为空时原地刷新（在会话表的锁外调用）"""
+    if session is None:
+        session = GameSession(state['session_id'])
+    return session.apply_state(state)
+
+def _record_state_change(session, event, **details):
+    """将会话状态变更写入行动记录（供/events增量同步使用）"""
+    session.action_history.append({
+        'type': 'state',
+        'event': event,
+        'game_state': session.game_state,
+        'chapter': session.current_chapter,
+        'cycle': session.current_cycle,
+        'timestamp': datetime.now().isoformat(),
+        **details
+    })
+
+def _save_session(session):
+    """
+    将会话状态写入存储
+    
+    与其他进程的修改冲突时由会话表合并后重试；仍无法保存时抛出SessionConflictError，
+    接口返回409让客户端刷新后重新提交。其他存储错误不影响当前请求。
+    """
+    try:
+        ACTIVE_GAMES.save(session)
+    except SessionConflictError as e:
+        print(f"⚠️ {e}，本次修改未保存")
+        raise
+    except Exception as e:
+        print(f"⚠️ 保存游戏会话失败: {session.session_id} - {e}")
+    EVENT_HUB.notify(session.session_id)
+
+def _conflict_response(error):
+    """会话保存冲突时的响应（本次修改未保存，客户端刷新后重新提交）"""
+    return jsonify({
+        'status': 'error',
+        'message': f'{error}，请刷新后重试',
+        'conflict': True
+    }), 409
+
+# 全局游戏会话存储（本地缓存 + 可配置的持久化后端）
+SESSION_STORE = create_session_store(
+    Config.GAME_SESSION_STORE,
+    db_path=Config.GAME_SESSION_DB,
+    redis_url=Config.GAME_SESSION_REDIS_URL
+)
+ACTIVE_GAMES = SessionRegistry(SESSION_STORE, _restore_session, merge_session_states)
+PLAYER_SESSIONS = PlayerSessionMap(SESSION_STORE)
+
+def _release_session_resources(session_id):
+    """会话结束或被淘汰后清理事件通知和创建任务记录"""
+    EVENT_HUB.discard(session_id)
+    GAME_JOBS.remove(session_id)
+
+# 空闲会话淘汰（仍在创建中的会话不淘汰）
+ACTIVE_GAMES.configure_eviction(
+    ttl=Config.GAME_SESSION_TTL,
+    max_sessions=Config.GAME_SESSION_MAX_ACTIVE,
+    snapshot_dir=Config.GAME_SESSION_SNAPSHOT_DIR,
+    can_evict=lambda session: session.game_state != 'generating',
+    on_evict=_release_session_resources
+)
+ACTIVE_GAMES.start_sweeper(Config.GAME_SESSION_SWEEP_INTERVAL)
 
 @game_bp.route('/new', methods=['POST'])
 @login_required
 def create_new_game():
-    """创建新游戏"""
+    """
+    创建新游戏
+    
+    游戏在后台任务中创建，接口立即返回会话ID，前端通过/progress查询进度。
+    请求中传入async=false时等待创建完成后再返回（兼容旧版前端）。
+    """
     try:
         data = request.get_json() or {}
         generate_images = data.get('generate_images', True)  # 默认生成图片
-        wait_for_completion = data.get('wait_for_completion', True)
+        run_async = data.get('async', True)
         
         print(f"🎮 用户 {current_user.nickname} 请求创建新游戏")
         print(f"🖼️ 生成图片: {generate_images}")
-        print(f"⏳ 等待完成: {wait_for_completion}")
+        print(f"⏳ 后台创建: {run_async}")
         
         # 检查是否配置了默认剧本路径
-        from config import Config
         default_script_path = Config.DEFAULT_SCRIPT_PATH
         
         # 如果配置了默认剧本路径且路径存在，使用本地剧本；否则生成新剧本
@@ -97,94 +385,96 @@ def create_new_game():
         else:
             print("🎭 生成新剧本 (无本地剧本配置或路径不存在)")
         
-        # 创建游戏实例
-        game = Game(script_path=script_path, generate_images=generate_images)
-        
-        # 生成会话ID
+        # 生成会话ID并立即登记会话
         session_id = f"game_{int(time.time())}_{current_user.id}"
-        
-        # 创建游戏会话
-        session = GameSession(session_id, game.game_dir)
-        session.game_instance = game
-        session.game_state = 'character_select'
-        
-        # 保存到全局会话
+        session = GameSession(session_id)
+        session.game_state = 'generating'
         ACTIVE_GAMES[session_id] = session
+        _save_session(session)
         
-        # 获取角色列表
-        characters = game.script.get('characters', [])
-        character_list = []
-        
-        for char_name in characters:
-            # 检查是否有角色图片 - 改进的匹配逻辑
-            char_image = None
-            if generate_images and hasattr(game, 'imgs_dir') and os.path.exists(game.imgs_dir):
-                import glob
-                
-                # 多种匹配模式
-                image_patterns = [
-                    os.path.join(game.imgs_dir, f"{char_name}.*"),
-                    os.path.join(game.imgs_dir, f"character_{char_name}.*"),
-                    os.path.join(game.imgs_dir, f"{char_name}头像.*"),
-                    os.path.join(game.imgs_dir, f"角色_{char_name}.*")
-                ]
-                
-                for pattern in image_patterns:
-                    image_files = glob.glob(pattern)
-                    # 过滤出图片文件
-                    image_files = [f for f in image_files if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-                    if image_files:
-                        char_image = os.path.relpath(image_files[0], '.').replace('\\', '/')
-                        break
-                
-                # 如果还没找到，尝试模糊匹配
-                if not char_image:
-                    for img_file in os.listdir(game.imgs_dir):
-                        if (char_name in img_file and 
-                            img_file.lower().endswith(('.png', '.jpg', '.jpeg')) and
-                            not any(skip_word in img_file.lower() for skip_word in ['线索', 'clue', '证据', '场景'])):
-                            char_image = os.path.relpath(
-                                os.path.join(game.imgs_dir, img_file), '.'
-                            ).replace('\\', '/')
-                            break
+        def build_game(progress_callback):
+            def report_progress(event, data):
+                progress_callback(event, data)
+                EVENT_HUB.notify(session_id)
             
-            character_list.append({
-                'name': char_name,
-                'description': f"一个神秘的角色：{char_name}，等待你来揭开面纱...",
-                'image': char_image
-            })
-        
-        print(f"✅ 新游戏创建成功: {session_id}")
-        print(f"📂 游戏目录: {game.game_dir}")
-        print(f"👥 角色数量: {len(character_list)}")
+            if script_path and Config.SCRIPT_REPAIR_ON_LOAD:
+                # 在后台任务中补写本地剧本缺失的部分，Game加载时不调用模型
+                repair_script_file(os.path.join(script_path, 'script.json'), DMAgent())
+            
+            return Game(
+                script_path=script_path,
+                generate_images=generate_images,
+                progress_callback=report_progress
+            )
         
-        # 设置游戏状态
-        if generate_images and wait_for_completion:
-            session.game_state = 'generating'
-            session.script_ready = True
-            session.images_ready = generate_images and os.path.exists(game.imgs_dir) and len(os.listdir(game.imgs_dir)) > 0
-            session.game_ready = session.images_ready or not generate_images
-        else:
-            session.game_state = 'ready'
+        def on_complete(job):
+            game = job.game
+            # 游戏实例交给会话持有，任务只保留进度（会话淘汰后不再被任务引用）
+            job.game = None
+            session.game_instance = game
+            session.game_path = game.game_dir
             session.script_ready = True
             session.images_ready = True
             session.game_ready = True
+            session.game_state = 'character_select'
+            _record_state_change(session, 'game_ready')
+            try:
+                _save_session(session)
+            except SessionConflictError:
+                pass  # 下次读取时刷新为存储中的状态
+            print(f"✅ 新游戏创建成功: {session_id}")
+            print(f"📂 游戏目录: {game.game_dir}")
+        
+        def on_failure(job):
+            # 持久化失败状态，会话不再停留在generating（否则无法淘汰，重启后也显示为生成中）
+            session.game_state = 'failed'
+            _record_state_change(session, 'game_failed', error=job.error)
+            try:
+                _save_session(session)
+            except SessionConflictError:
+                pass
+        
+        job = GAME_JOBS.submit(
+            session_id, build_game,
+            on_complete=on_complete,
+            on_failure=on_failure
+        )
+        
+        if not run_async:
+            job.future.result()
+            if job.failed:
+                ACTIVE_GAMES.pop(session_id, None)
+                raise Exception(job.error)
+        
+        response_data = {
+            'game_session': session_id,
+            'story_title': job.title,
+            'story_subtitle': '一个充满谜团的故事即将开始...',
+            'characters': [],
+            'total_chapters': 0,
+            'game_path': job.game_dir,
+            'async': run_async,
+            'generate_images': generate_images,
+            'job': job.to_dict()
+        }
+        
+        if job.done:
+            game = session.game_instance
+            response_data['characters'] = [{
+                'name': char_name,
+                'description': f"一个神秘的角色：{char_name}，等待你来揭开面纱...",
+                'image': _character_image_path(session, char_name)
+            } for char_name in game.script.get('characters', [])]
+            response_data['total_chapters'] = game.get_total_chapters()
         
         return jsonify({
             'status': 'success',
-            'message': '新游戏创建成功',
-            'data': {
-                'game_session': session_id,
-                'story_title': game.script.get('title', '未命名剧本'),
-                'story_subtitle': '一个充满谜团的故事即将开始...',
-                'characters': character_list,
-                'total_chapters': game.get_total_chapters(),
-                'game_path': game.game_dir,
-                'wait_for_completion': wait_for_completion,
-                'generate_images': generate_images
-            }
+            'message': '新游戏创建成功' if job.done else '新游戏创建中',
+            'data': response_data
         })
         
+    except SessionConflictError as e:
+        return _conflict_response(e)
     except Exception as e:
         print(f"❌ 创建新游戏失败: {e}")
         traceback.print_exc()
@@ -196,43 +486,26 @@ def create_new_game():
 @game_bp.route('/list', methods=['GET'])
 @login_required
 def list_games():
-    """获取可用游戏列表"""
+    """
+    获取可用游戏列表
+    
+    查询参数:
+        q: 按标题或角色名过滤
+        page: 页码（从1开始）
+        page_size: 每页数量，不传则返回全部
+    """
     try:
-        games = []
-        log_dir = 'log'
-        
-        if os.path.exists(log_dir):
-            for item in os.listdir(log_dir):
-                item_path = os.path.join(log_dir, item)
-                if os.path.isdir(item_path):
-                    # 检查是否是有效的游戏目录
-                    script_file = os.path.join(item_path, 'script.json')
-                    if os.path.exists(script_file):
-                        try:
-                            with open(script_file, 'r', encoding='utf-8') as f:
-                                script = json.load(f)
-                            
-                            games.append({
-                                'path': item_path,
-                                'title': script.get('title', '未命名剧本'),
-                                'characters': script.get('characters', []),
-                                'chapters': len(script.get('chapters', [])),
-                                'created_at': datetime.fromtimestamp(
-                                    os.path.getctime(item_path)
-                                ).isoformat()
-                            })
-                        except Exception as e:
-                            print(f"解析游戏 {item_path} 失败: {e}")
-                            continue
-        
-        # 按创建时间倒序排列
-        games.sort(key=lambda x: x['created_at'], reverse=True)
+        keyword = request.args.get('q', '').strip() or None
+        page = request.args.get('page', 1, type=int)
+        page_size = request.args.get('page_size', type=int)
+        if page_size is not None:
+            page_size = max(1, min(page_size, Config.GAME_LIST_MAX_PAGE_SIZE))
+        
+        result = GAME_CATALOG.query(keyword=keyword, page=page, page_size=page_size)
         
         return jsonify({
             'status': 'success',
-            'data': {
-                'games': games
-            }
+            'data': result
         })
         
     except Exception as e:
@@ -268,46 +541,22 @@ def load_existing_game():
         session = GameSession(session_id, game_path)
         session.game_instance = game
         session.game_state = 'character_select'
+        session.script_ready = True
+        session.images_ready = True
+        session.game_ready = True
+        _record_state_change(session, 'game_loaded')
         
         # 保存到全局会话
         ACTIVE_GAMES[session_id] = session
+        _save_session(session)
         
         # 获取角色列表（包含图片）
         characters = game.script.get('characters', [])
         character_list = []
         
         for char_name in characters:
-            # 检查是否有角色图片 - 改进的匹配逻辑
-            char_image = None
-            if hasattr(game, 'imgs_dir') and os.path.exists(game.imgs_dir):
-                import glob
-                
-                # 多种匹配模式
-                image_patterns = [
-                    os.path.join(game.imgs_dir, f"{char_name}.*"),
-                    os.path.join(game.imgs_dir, f"character_{char_name}.*"),
-                    os.path.join(game.imgs_dir, f"{char_name}头像.*"),
-                    os.path.join(game.imgs_dir, f"角色_{char_name}.*")
-                ]
-                
-                for pattern in image_patterns:
-                    image_files = glob.glob(pattern)
-                    # 过滤出图片文件
-                    image_files = [f for f in image_files if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-                    if image_files:
-                        char_image = os.path.relpath(image_files[0], '.').replace('\\', '/')
-                        break
-                
-                # 如果还没找到，尝试模糊匹配
-                if not char_image:
-                    for img_file in os.listdir(game.imgs_dir):
-                        if (char_name in img_file and 
-                            img_file.lower().endswith(('.png', '.jpg', '.jpeg')) and
-                            not any(skip_word in img_file.lower() for skip_word in ['线索', 'clue', '证据', '场景'])):
-                            char_image = os.path.relpath(
-                                os.path.join(game.imgs_dir, img_file), '.'
-                            ).replace('\\', '/')
-                            break
+            # 从资源清单获取角色图片
+            char_image = game.get_character_image_path(char_name)
             
             character_list.append({
                 'name': char_name,
@@ -329,6 +578,8 @@ def load_existing_game():
             }
         })
         
+    except SessionConflictError as e:
+        return _conflict_response(e)
     except Exception as e:
         print(f"❌ 加载游戏失败: {e}")
         traceback.print_exc()
@@ -364,6 +615,7 @@ def join_game():
         # 添加玩家到游戏
         session.add_player(current_user.id, character_name)
         session.game_state = 'playing'
+        _record_state_change(session, 'player_joined', character=character_name)
         
         # 为角色创建AI代理（用于与DM交互）
         try:
@@ -373,6 +625,7 @@ def join_game():
         
         # 记录玩家会话
         PLAYER_SESSIONS[current_user.id] = session_id
+        _save_session(session)
         
         print(f"✅ 用户 {current_user.nickname} 加入游戏 {session_id}，角色: {character_name}")
         
@@ -386,6 +639,8 @@ def join_game():
             }
         })
         
+    except SessionConflictError as e:
+        return _conflict_response(e)
     except Exception as e:
         print(f"❌ 加入游戏失败: {e}")
         return jsonify({
@@ -421,7 +676,7 @@ def get_game_status(session_id):
 @game_bp.route('/progress/<session_id>', methods=['GET'])
 @login_required
 def get_game_progress(session_id):
-    """获取游戏生成进度"""
+    """获取游戏生成进度（读取内存中的任务状态，不扫描目录）"""
     try:
         if session_id not in ACTIVE_GAMES:
             return jsonify({
@@ -430,68 +685,10 @@ def get_game_progress(session_id):
             }), 404
         
         session = ACTIVE_GAMES[session_id]
-        game = session.game_instance
-        
-        # 检查实际文件状态
-        if game and os.path.exists(game.imgs_dir):
-            image_files = [f for f in os.listdir(game.imgs_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif'))]
-            session.images_ready = len(image_files) > 0
-            
-            # 如果图片已准备好，标记游戏为就绪
-            if session.images_ready and session.script_ready:
-                session.game_ready = True
-                session.game_state = 'ready'
-        
-        # 获取角色列表（包含图片）
-        characters = []
-        if game and session.script_ready:
-            for char_name in game.script.get('characters', []):
-                char_image = None
-                if session.images_ready and hasattr(game, 'imgs_dir') and os.path.exists(game.imgs_dir):
-                    import glob
-                    
-                    # 多种匹配模式
-                    image_patterns = [
-                        os.path.join(game.imgs_dir, f"{char_name}.*"),
-                        os.path.join(game.imgs_dir, f"character_{char_name}.*"),
-                        os.path.join(game.imgs_dir, f"{char_name}头像.*"),
-                        os.path.join(game.imgs_dir, f"角色_{char_name}.*")
-                    ]
-                    
-                    for pattern in image_patterns:
-                        image_files = glob.glob(pattern)
-                        # 过滤出图片文件
-                        image_files = [f for f in image_files if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-                        if image_files:
-                            char_image = os.path.relpath(image_files[0], '.').replace('\\', '/')
-                            break
-                    
-                    # 如果还没找到，尝试模糊匹配
-                    if not char_image:
-                        for img_file in os.listdir(game.imgs_dir):
-                            if (char_name in img_file and 
-                                img_file.lower().endswith(('.png', '.jpg', '.jpeg')) and
-                                not any(skip_word in img_file.lower() for skip_word in ['线索', 'clue', '证据', '场景'])):
-                                char_image = os.path.relpath(
-                                    os.path.join(game.imgs_dir, img_file), '.'
-                                ).replace('\\', '/')
-                                break
-                
-                characters.append({
-                    'name': char_name,
-                    'description': f"角色：{char_name}",
-                    'image': char_image
-                })
         
         return jsonify({
             'status': 'success',
-            'data': {
-                'script_ready': session.script_ready,
-                'images_ready': session.images_ready,
-                'game_ready': session.game_ready,
-                'game_state': session.game_state,
-                'characters': characters
-            }
+            'data': _build_progress_data(session)
         })
         
     except Exception as e:
@@ -501,6 +698,46 @@ def get_game_progress(session_id):
             'message': f'获取游戏进度失败: {str(e)}'
         }), 500
 
+def _build_progress_data(session):
+    """构建游戏生成进度数据（/progress接口和事件流共用）"""
+    game = session.game_instance
+    job = GAME_JOBS.get(session.session_id)
+    
+    if job and not job.done:
+        script_ready = job.script_ready
+        images_ready = job.images_ready
+        game_ready = False
+        game_state = 'failed' if job.failed else session.game_state
+        character_names = job.characters
+        story_title = job.title
+    else:
+        script_ready = session.script_ready
+        images_ready = session.images_ready
+        game_ready = session.game_ready
+        game_state = session.game_state
+        character_names = game.script.get('characters', []) if game else []
+        story_title = game.script.get('title', '未命名剧本') if game else None
+    
+    # 获取角色列表（包含已生成的图片）
+    characters = []
+    if script_ready:
+        for char_name in character_names:
+            characters.append({
+                'name': char_name,
+                'description': f"角色：{char_name}",
+                'image': _character_image_path(session, char_name)
+            })
+    
+    return {
+        'script_ready': script_ready,
+        'images_ready': images_ready,
+        'game_ready': game_ready,
+        'game_state': game_state,
+        'story_title': story_title,
+        'characters': characters,
+        'job': job.to_dict() if job else None
+    }
+
 @game_bp.route('/script/<session_id>/<character_name>', methods=['GET'])
 @login_required
 def get_character_script(session_id, character_name):
@@ -568,7 +805,7 @@ def get_game_images(session_id):
         session = ACTIVE_GAMES[session_id]
         game = session.game_instance
         
-        if not game or not os.path.exists(game.imgs_dir):
+        if not game:
             return jsonify({
                 'status': 'success',
                 'data': {
@@ -577,21 +814,19 @@ def get_game_images(session_id):
                 }
             })
         
-        # 获取角色图片
+        # 从资源清单获取角色图片
         character_images = {}
         for char_name in game.script.get('characters', []):
-            import glob
-            image_pattern = os.path.join(game.imgs_dir, f"character_{char_name}.*")
-            image_files = glob.glob(image_pattern)
-            if image_files:
-                character_images[char_name] = os.path.relpath(image_files[0], '.').replace('\\', '/')
+            char_image = game.get_character_image_path(char_name)
+            if char_image:
+                character_images[char_name] = char_image
         
-        # 获取线索图片
+        # 从资源清单获取线索图片
         clue_images = {}
-        clue_pattern = os.path.join(game.imgs_dir, "clue_*")
-        clue_files = glob.glob(clue_pattern)
-        for i, clue_file in enumerate(clue_files):
-            clue_images[f'clue_{i+1}'] = os.path.relpath(clue_file, '.').replace('\\', '/')
+        for chapter in range(1, game.get_total_chapters() + 1):
+            for clue_path in game.get_clue_image_paths(chapter):
+                if clue_path:
+                    clue_images[f'clue_{len(clue_images) + 1}'] = clue_path
         
         return jsonify({
             'status': 'success',
@@ -633,37 +868,8 @@ def get_all_characters(session_id):
         character_names = game.script.get('characters', [])
         
         for char_name in character_names:
-            # 检查是否有角色图片 - 改进的匹配逻辑
-            char_image = None
-            if hasattr(game, 'imgs_dir') and os.path.exists(game.imgs_dir):
-                import glob
-                
-                # 多种匹配模式
-                image_patterns = [
-                    os.path.join(game.imgs_dir, f"{char_name}.*"),
-                    os.path.join(game.imgs_dir, f"character_{char_name}.*"),
-                    os.path.join(game.imgs_dir, f"{char_name}头像.*"),
-                    os.path.join(game.imgs_dir, f"角色_{char_name}.*")
-                ]
-                
-                for pattern in image_patterns:
-                    image_files = glob.glob(pattern)
-                    # 过滤出图片文件
-                    image_files = [f for f in image_files if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-                    if image_files:
-                        char_image = os.path.relpath(image_files[0], '.').replace('\\', '/')
-                        break
-                
-                # 如果还没找到，尝试模糊匹配
-                if not char_image:
-                    for img_file in os.listdir(game.imgs_dir):
-                        if (char_name in img_file and 
-                            img_file.lower().endswith(('.png', '.jpg', '.jpeg')) and
-                            not any(skip_word in img_file.lower() for skip_word in ['线索', 'clue', '证据', '场景'])):
-                            char_image = os.path.relpath(
-                                os.path.join(game.imgs_dir, img_file), '.'
-                            ).replace('\\', '/')
-                            break
+            # 从资源清单获取角色图片
+            char_image = game.get_character_image_path(char_name)
             
             # 检查角色是否被玩家选择
             player_id = None
@@ -731,7 +937,11 @@ def start_chapter():
         print(f"📖 开始第{chapter_num}章，玩家: {character_name}")
         
         # 调用DM开始章节
-        dm_result = game.start_chapter(chapter_num, session.chat_history)
+        dm_result = game.start_chapter(
+            chapter_num,
+            _build_chat_context(session),
+            history_mark=_chat_turn_count(session)
+        )
         
         # 获取角色剧本
         character_script = None
@@ -741,6 +951,9 @@ def start_chapter():
                 character_script = character_chapters[chapter_num - 1]
         
         session.current_chapter = chapter_num
+        session.current_cycle = 1
+        _record_state_change(session, 'chapter_started')
+        _save_session(session)
         
         return jsonify({
             'status': 'success',
@@ -748,10 +961,13 @@ def start_chapter():
                 'chapter_num': chapter_num,
                 'dm_speech': dm_result.get('speech') if dm_result else None,
                 'dm_tools': dm_result.get('tools', []) if dm_result else [],
+                'speculative': bool(dm_result and dm_result.get('speculative')),
                 'character_script': character_script
             }
         })
         
+    except SessionConflictError as e:
+        return _conflict_response(e)
     except Exception as e:
         print(f"❌ 开始章节失败: {e}")
         traceback.print_exc()
@@ -786,13 +1002,15 @@ def send_game_message():
         timestamp = datetime.now().strftime('%H:%M:%S')
         
         if message_type == 'ask' and target_player:
-            session.chat_history += f"\n\n### {character_name} ({timestamp})\n询问 @{target_player}: {message}\n"
+            turn = f"询问 @{target_player}: {message}"
         elif message_type == 'whisper' and target_player:
-            session.chat_history += f"\n\n### {character_name} ({timestamp})\n私聊 @{target_player}: {message}\n"
+            turn = f"私聊 @{target_player}: {message}"
         elif message_type == 'action':
-            session.chat_history += f"\n\n### {character_name} ({timestamp})\n*{message}*\n"
+            turn = f"*{message}*"
         else:
-            session.chat_history += f"\n\n### {character_name} ({timestamp})\n{message}\n"
+            turn = message
+        session.chat_history += f"\n\n### {character_name} ({timestamp})\n{turn}\n"
+        session.chat_summary.add_turn(chapter, f"**{character_name}**: {turn}")
         
         responses = []
         dm_response = None
@@ -810,7 +1028,7 @@ def send_game_message():
                         if chapter <= len(target_character_chapters):
                             target_scripts = [target_character_chapters[chapter - 1]]
                     
-                    ai_response = agent.response(target_scripts, session.chat_history, message, character_name)
+                    ai_response = agent.response(target_scripts, _build_chat_context(session), message, character_name)
                     
                     if ai_response:
                         responses.append({
@@ -821,6 +1039,7 @@ def send_game_message():
                         
                         # 更新聊天历史
                         session.chat_history += f"\n\n### {target_player} ({timestamp})\n回应 @{character_name}: {ai_response}\n"
+                        session.chat_summary.add_turn(chapter, f"**{target_player}**: 回应 @{character_name}: {ai_response}")
                         
                 except Exception as e:
                     print(f"AI角色回应失败: {e}")
@@ -834,6 +1053,8 @@ def send_game_message():
             except Exception as e:
                 print(f"DM回应失败: {e}")
         
+        _save_session(session)
+        
         return jsonify({
             'status': 'success',
             'data': {
@@ -843,6 +1064,8 @@ def send_game_message():
             }
         })
         
+    except SessionConflictError as e:
+        return _conflict_response(e)
     except Exception as e:
         print(f"❌ 发送游戏消息失败: {e}")
         traceback.print_exc()
@@ -868,13 +1091,14 @@ def end_game(session_id):
         # 调用游戏结束逻辑
         if game:
             final_result = game.end_game(
-                session.chat_history, 
+                _build_chat_context(session), 
                 "游戏结束", 
                 "感谢所有玩家的参与！"
             )
         
         # 清理会话
         del ACTIVE_GAMES[session_id]
+        _release_session_resources(session_id)
         
         # 清理玩家会话记录
         for user_id in session.players.keys():
@@ -931,10 +1155,10 @@ def handle_player_action():
         }
         
         # 更新聊天历史
-        if hasattr(session, 'action_history'):
-            session.action_history.append(action_log)
-        else:
-            session.action_history = [action_log]
+        session.action_history.append(action_log)
+        _save_session(session)
+        _prefetch_ai_answers(session, character_name, queries, chapter)
+        _maybe_prepare_next_chapter(session)
         
         action_emoji = "💬" if action_type == "speak" else "💭"
         print(f"🎮 玩家 {character_name} 在第{chapter}章第{cycle}轮{action_type}")
@@ -946,11 +1170,13 @@ def handle_player_action():
             'status': 'success',
             'message': '玩家行动记录成功',
             'data': {
-                'action_id': len(session.action_history) if hasattr(session, 'action_history') else 1,
+                'action_id': len(session.action_history),
                 'queries_count': len(queries)
             }
         })
         
+    except SessionConflictError as e:
+        return _conflict_response(e)
     except Exception as e:
         print(f"❌ 处理玩家行动失败: {e}")
         traceback.print_exc()
@@ -986,35 +1212,11 @@ def handle_ai_answer():
                 'message': '游戏实例不存在'
             }), 400
         
-        # 获取AI玩家实例
-        if not hasattr(session, 'ai_players'):
-            session.ai_players = {}
-        if character_name not in session.ai_players:
-            from player_agent import PlayerAgent
-            session.ai_players[character_name] = PlayerAgent(character_name)
-        
-        ai_player = session.ai_players[character_name]
-        
-        # 构建聊天历史
-        chat_history = ""
-        if hasattr(session, 'action_history'):
-            for action in session.action_history[-10:]:  # 最近10条记录
-                if action['type'] == 'player_action':
-                    chat_history += f"**{action['character']}**: {action['content']}\n"
-                    for target, query in action.get('queries', {}).items():
-                        chat_history += f"**{action['character']}** 询问 **{target}**: {query}\n"
-        
-        # 获取角色剧本（只到当前章节）
-        character_script = game.script.get(character_name, [])
-        available_scripts = character_script[:chapter]
-        
-        # 调用AI回答
-        answer = ai_player.response(
-            scripts=available_scripts,
-            chat_history=chat_history,
-            query=question,
-            query_player=asker
-        )
+        # 优先使用问题记录时预先生成的回答，否则现在生成
+        answer = _take_prefetched_answer(session, character_name, question, asker, chapter)
+        prefetched = answer is not None
+        if not prefetched:
+            answer = _generate_ai_answer(session, character_name, question, asker, chapter)
         
         # 记录AI回复到历史
         answer_log = {
@@ -1030,12 +1232,11 @@ def handle_ai_answer():
             'is_ai': True
         }
         
-        if hasattr(session, 'action_history'):
-            session.action_history.append(answer_log)
-        else:
-            session.action_history = [answer_log]
+        session.action_history.append(answer_log)
+        _save_session(session)
+        _maybe_prepare_next_chapter(session)
         
-        print(f"🤖 AI玩家 {character_name} 回答了 {asker} 的问题")
+        print(f"🤖 AI玩家 {character_name} 回答了 {asker} 的问题{' (预先生成)' if prefetched else ''}")
         print(f"❓ 问题: {question}")
         print(f"💬 回答: {answer}")
         
@@ -1046,10 +1247,13 @@ def handle_ai_answer():
                 'character_name': character_name,
                 'answer': answer,
                 'question': question,
-                'asker': asker
+                'asker': asker,
+                'prefetched': prefetched
             }
         })
         
+    except SessionConflictError as e:
+        return _conflict_response(e)
     except Exception as e:
         print(f"❌ AI回答生成失败: {e}")
         traceback.print_exc()
@@ -1093,13 +1297,7 @@ def handle_ai_speak():
         ai_player = session.ai_players[character_name]
         
         # 构建聊天历史
-        chat_history = ""
-        if hasattr(session, 'action_history'):
-            for action in session.action_history[-10:]:  # 最近10条记录
-                if action['type'] == 'player_action':
-                    chat_history += f"**{action['character']}**: {action['content']}\n"
-                    for target, query in action.get('queries', {}).items():
-                        chat_history += f"**{action['character']}** 询问 **{target}**: {query}\n"
+        chat_history = _build_chat_context(session)
         
         # 获取角色剧本（只到当前章节）
         character_script = game.script.get(character_name, [])
@@ -1124,10 +1322,10 @@ def handle_ai_speak():
         }
         
         # 更新聊天历史
-        if hasattr(session, 'action_history'):
-            session.action_history.append(action_log)
-        else:
-            session.action_history = [action_log]
+        session.action_history.append(action_log)
+        _save_session(session)
+        _prefetch_ai_answers(session, character_name, speak_result.get('query', {}), chapter)
+        _maybe_prepare_next_chapter(session)
         
         print(f"🤖 AI玩家 {character_name} 发言完成")
         print(f"💬 发言内容: {speak_result.get('content', '[保持沉默]')}")
@@ -1145,6 +1343,8 @@ def handle_ai_speak():
             }
         })
         
+    except SessionConflictError as e:
+        return _conflict_response(e)
     except Exception as e:
         print(f"❌ AI发言生成失败: {e}")
         traceback.print_exc()
@@ -1156,11 +1356,28 @@ def handle_ai_speak():
 @game_bp.route('/trigger_all_ai_speak', methods=['POST'])
 @login_required
 def trigger_all_ai_speak():
-    """触发所有AI玩家发言"""
+    """触发所有AI玩家发言
+    
+    默认并发调用所有AI玩家（可通过请求参数parallel或配置GAME_AI_PARALLEL关闭），
+    结果始终按角色座位顺序写入action_history。请求参数ensemble或配置GAME_AI_ENSEMBLE
+    开启时，所有AI玩家的发言由一次合并调用生成。
+    """
     try:
         data = request.get_json()
         session_id = data.get('game_session')
         chapter = data.get('chapter', 1)
+        parallel = data.get('parallel', Config.GAME_AI_PARALLEL)
+        ensemble = data.get('ensemble', Config.GAME_AI_ENSEMBLE)
+        try:
+            # 客户端只能缩短超时，不能超过配置值
+            timeout = parse_query_timeout(data.get('timeout'), Config.GAME_AI_QUERY_TIMEOUT,
+                                          Config.GAME_AI_QUERY_TIMEOUT)
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        queue_timeout = Config.GAME_AI_QUEUE_TIMEOUT
         
         if session_id not in ACTIVE_GAMES:
             return jsonify({
@@ -1177,87 +1394,93 @@ def trigger_all_ai_speak():
                 'message': '游戏实例不存在'
             }), 400
         
-        ai_actions = []
+        # 按座位顺序收集AI角色（没有被人类玩家选择的角色）
+        human_characters = set(session.players.values())
+        ai_characters = [name for name in game.script.get('characters', [])
+                         if name not in human_characters]
         
-        # 获取所有AI角色
-        for character_name in game.script.get('characters', []):
-            # 检查是否是AI角色（没有被人类玩家选择）
-            is_ai = True
-            for uid, selected_char in session.players.items():
-                if selected_char == character_name:
-                    is_ai = False
-                    break
+        # 获取AI玩家实例（在提交任务前创建，避免并发修改ai_players）
+        if not hasattr(session, 'ai_players'):
+            session.ai_players = {}
+        for character_name in ai_characters:
+            if character_name not in session.ai_players:
+                session.ai_players[character_name] = PlayerAgent(character_name)
+        
+        current_cycle = getattr(session, 'current_cycle', 1)
+        cycle_start = time.time()
+        
+        def query_args(character_name, chat_history):
+            # 获取角色剧本（只到当前章节）
+            available_scripts = game.script.get(character_name, [])[:chapter]
+            return session.ai_players[character_name].query, (available_scripts, chat_history)
+        
+        results = []
+        if not ai_characters:
+            # 所有角色都由人类玩家选择，不调用模型
+            pass
+        elif ensemble:
+            # 合并模式：一次调用生成所有AI的发言，共享规则和聊天历史
+            ensemble_agent = PlayerEnsemble([session.ai_players[name] for name in ai_characters])
+            scripts_by_player = {name: game.script.get(name, [])[:chapter] for name in ai_characters}
+            call = submit_ai_query(AI_QUERY_EXECUTOR, '合并发言', ensemble_agent.query,
+                                   scripts_by_player, _build_chat_context(session))
+            batch, latency, error = collect_ai_query(call, timeout, queue_timeout)
+            for character_name in ai_characters:
+                speak_result = batch.get(character_name) if batch else None
+                results.append((character_name, speak_result, latency, error))
+        elif parallel:
+            # 并发模式：所有AI基于同一份聊天历史同时发言，结果按座位顺序返回
+            chat_history = _build_chat_context(session)
+            calls = [(name, *query_args(name, chat_history)) for name in ai_characters]
+            results = run_ai_queries(AI_QUERY_EXECUTOR, calls, timeout, queue_timeout)
+        else:
+            # 顺序模式：每个AI都能看到前一个AI的发言
+            for character_name in ai_characters:
+                fn, args = query_args(character_name, _build_chat_context(session))
+                call = submit_ai_query(AI_QUERY_EXECUTOR, character_name, fn, *args)
+                result = (character_name, *collect_ai_query(call, timeout, queue_timeout))
+                results.append(result)
+                if result[1] is not None:
+                    _record_ai_speak_action(session, character_name, result[1], chapter, current_cycle)
+        
+        ai_actions = []
+        for character_name, speak_result, latency, error in results:
+            latency_ms = int(latency * 1000)
+            if speak_result is None:
+                ai_actions.append({
+                    'character_name': character_name,
+                    'content': f"[{character_name}思考中...]",
+                    'queries': {},
+                    'success': False,
+                    'error': error,
+                    'latency_ms': latency_ms
+                })
+                continue
             
-            if is_ai:
-                # 获取AI玩家实例
-                if not hasattr(session, 'ai_players'):
-                    session.ai_players = {}
-                if character_name not in session.ai_players:
-                    from player_agent import PlayerAgent
-                    session.ai_players[character_name] = PlayerAgent(character_name)
-                
-                ai_player = session.ai_players[character_name]
-                
-                # 构建聊天历史
-                chat_history = ""
-                if hasattr(session, 'action_history'):
-                    for action in session.action_history[-10:]:  # 最近10条记录
-                        if action['type'] == 'player_action':
-                            chat_history += f"**{action['character']}**: {action['content']}\n"
-                            for target, query in action.get('queries', {}).items():
-                                chat_history += f"**{action['character']}** 询问 **{target}**: {query}\n"
-                
-                # 获取角色剧本（只到当前章节）
-                character_script = game.script.get(character_name, [])
-                available_scripts = character_script[:chapter]
-                
-                try:
-                    # 调用AI发言
-                    speak_result = ai_player.query(
-                        scripts=available_scripts,
-                        chat_history=chat_history
-                    )
-                    
-                    # 记录AI玩家行动
-                    action_log = {
-                        'type': 'player_action',
-                        'character': character_name,
-                        'content': speak_result.get('content', '[保持沉默]'),
-                        'queries': speak_result.get('query', {}),
-                        'chapter': chapter,
-                        'cycle': getattr(session, 'current_cycle', 1),
-                        'action_type': 'speak',  # AI发言标记为speak
-                        'timestamp': datetime.now().isoformat(),
-                        'is_ai': True
-                    }
-                    
-                    # 更新聊天历史
-                    if hasattr(session, 'action_history'):
-                        session.action_history.append(action_log)
-                    else:
-                        session.action_history = [action_log]
-                    
-                    ai_actions.append({
-                        'character_name': character_name,
-                        'content': speak_result.get('content', '[保持沉默]'),
-                        'queries': speak_result.get('query', {}),
-                        'success': True
-                    })
-                    
-                    print(f"🤖 AI玩家 {character_name} 发言完成")
-                    print(f"💬 发言内容: {speak_result.get('content', '[保持沉默]')}")
-                    if speak_result.get('query'):
-                        print(f"❓ 询问: {speak_result.get('query')}")
-                    
-                except Exception as e:
-                    print(f"❌ AI玩家 {character_name} 发言失败: {e}")
-                    ai_actions.append({
-                        'character_name': character_name,
-                        'content': f"[{character_name}思考中...]",
-                        'queries': {},
-                        'success': False,
-                        'error': str(e)
-                    })
+            # 并发和合并模式下按座位顺序统一写入历史
+            if parallel or ensemble:
+                _record_ai_speak_action(session, character_name, speak_result, chapter, current_cycle)
+            
+            ai_actions.append({
+                'character_name': character_name,
+                'content': speak_result.get('content', '[保持沉默]'),
+                'queries': speak_result.get('query', {}),
+                'success': True,
+                'latency_ms': latency_ms
+            })
+            
+            print(f"🤖 AI玩家 {character_name} 发言完成 ({latency_ms}ms)")
+            print(f"💬 发言内容: {speak_result.get('content', '[保持沉默]')}")
+            if speak_result.get('query'):
+                print(f"❓ 询问: {speak_result.get('query')}")
+        
+        _save_session(session)
+        for ai_action in ai_actions:
+            _prefetch_ai_answers(session, ai_action['character_name'], ai_action['queries'], chapter)
+        _maybe_prepare_next_chapter(session)
+        
+        wall_time_ms = int((time.time() - cycle_start) * 1000)
+        print(f"⏱️ AI发言轮次完成: {len(ai_actions)}个角色, {'合并' if ensemble else ('并发' if parallel else '顺序')}模式, 总耗时{wall_time_ms}ms")
         
         return jsonify({
             'status': 'success',
@@ -1265,10 +1488,16 @@ def trigger_all_ai_speak():
             'data': {
                 'ai_actions': ai_actions,
                 'total_ai': len(ai_actions),
-                'successful': len([a for a in ai_actions if a['success']])
+                'successful': len([a for a in ai_actions if a['success']]),
+                'parallel': bool(parallel),
+                'ensemble': bool(ensemble),
+                'wall_time_ms': wall_time_ms,
+                'latencies': {a['character_name']: a['latency_ms'] for a in ai_actions}
             }
         })
         
+    except SessionConflictError as e:
+        return _conflict_response(e)
     except Exception as e:
         print(f"❌ 触发AI发言失败: {e}")
         traceback.print_exc()
@@ -1277,6 +1506,22 @@ def trigger_all_ai_speak():
             'message': f'触发AI发言失败: {str(e)}'
         }), 500
 
+def _record_ai_speak_action(session, character_name, speak_result, chapter, cycle):
+    """将AI玩家的发言记录到行动历史"""
+    action_log = {
+        'type': 'player_action',
+        'character': character_name,
+        'content': speak_result.get('content', '[保持沉默]'),
+        'queries': speak_result.get('query', {}),
+        'chapter': chapter,
+        'cycle': cycle,
+        'action_type': 'speak',  # AI发言标记为speak
+        'timestamp': datetime.now().isoformat(),
+        'is_ai': True
+    }
+    
+    session.action_history.append(action_log)
+
 @game_bp.route('/clues/<session_id>/<int:chapter>', methods=['GET'])
 @login_required
 def get_chapter_clues(session_id, chapter):
@@ -1356,44 +1601,16 @@ def get_speaking_status(session_id):
                 'message': '游戏实例不存在'
             }), 400
         
-        # 获取当前循环的发言状态
-        current_cycle = getattr(session, 'current_cycle', 1)
-        current_chapter = getattr(session, 'current_chapter', 1)
-        spoken_players = set()
-        
-        print(f"🔍 检查发言状态: 第{current_chapter}章 第{current_cycle}轮")
-        
-        if hasattr(session, 'action_history'):
-            for action in session.action_history:
-                if (action['type'] == 'player_action' and 
-                    action.get('cycle') == current_cycle and
-                    action.get('chapter') == current_chapter and
-                    action.get('action_type') == 'speak'):  # 只计算发言，不包括回复
-                    spoken_players.add(action['character'])
-                    print(f"✅ 已发言: {action['character']} (第{action.get('cycle')}轮)")
-        
-        # 获取所有角色
-        all_characters = set(game.script.get('characters', []))
-        
-        # 计算尚未发言的角色
-        remaining_players = all_characters - spoken_players
-        
-        # 计算完成度
-        total_players = len(all_characters)
-        spoken_count = len(spoken_players)
-        completion_rate = (spoken_count / total_players * 100) if total_players > 0 else 0
+        # 从行动记录的轮次索引获取当前循环的发言状态（只计算发言，不包括回复）
+        speaking_status = session.action_history.speaking_status(
+            session.current_chapter,
+            session.current_cycle,
+            game.script.get('characters', [])
+        )
         
         return jsonify({
             'status': 'success',
-            'data': {
-                'total_players': total_players,
-                'spoken_count': spoken_count,
-                'remaining_count': len(remaining_players),
-                'completion_rate': completion_rate,
-                'spoken_players': list(spoken_players),
-                'remaining_players': list(remaining_players),
-                'all_completed': len(remaining_players) == 0
-            }
+            'data': speaking_status
         })
         
     except Exception as e:
@@ -1410,13 +1627,6 @@ def handle_dm_speak():
     try:
         data = request.get_json()
         session_id = data.get('game_session')
-        chapter = data.get('chapter', 1)
-        speak_type = data.get('speak_type', 'chapter_start')
-        chat_history = data.get('chat_history', '')
-        
-        # 获取可选参数
-        killer = data.get('killer', '凶手身份待确认')
-        truth_info = data.get('truth_info', '最终真相待揭示')
         
         if session_id not in ACTIVE_GAMES:
             return jsonify({
@@ -1433,68 +1643,26 @@ def handle_dm_speak():
                 'message': '游戏实例不存在'
             }), 400
         
-        # 获取DM实例
-        if not hasattr(session, 'dm_agent'):
-            from dm_agent import DMAgent
-            session.dm_agent = DMAgent()
-        
-        dm = session.dm_agent
-        
-        # 准备参数
-        dm_script = game.script.get('dm', [])
-        characters = list(game.script.get('characters', []))
-        clues = game.script.get('clues', [])
-        title = game.script.get('title', '剧本杀游戏')
-        
-        # 调用DM speak方法
-        speak_kwargs = {
-            'title': title,
-            'characters': characters,
-            'clues': clues,
-            'base_path': game.base_path if hasattr(game, 'base_path') else '',
-            'chat_history': chat_history
-        }
+        def generate_speech():
+            dm, chapter, speak_type, speak_kwargs = _prepare_dm_speak(session, game, data)
+            dm_result = dm.speak(**speak_kwargs)
+            if dm_result.get('success', False):
+                _record_dm_speech(session, speak_type, chapter, dm_result)
+            return dm_result
         
-        # 根据speak_type添加特定参数
-        if speak_type == 'game_end':
-            speak_kwargs['is_game_end'] = True
-            speak_kwargs['killer'] = killer
-            speak_kwargs['truth_info'] = truth_info
-        elif speak_type == 'chapter_end':
-            speak_kwargs['is_chapter_end'] = True
-        elif speak_type == 'interject':
-            speak_kwargs['is_interject'] = True
-            speak_kwargs['trigger_reason'] = data.get('trigger_reason', '游戏进程需要')
-            speak_kwargs['guidance'] = data.get('guidance', '')
-        
-        # 生成DM发言
-        dm_result = dm.speak(
-            chapter=chapter - 1,  # DM speak 方法使用0开始的章节
-            script=dm_script,
-            **speak_kwargs
+        # 生成DM发言（相同的并发请求共享同一次生成，只记录一条发言）
+        chapter = data.get('chapter', 1)
+        speak_type = data.get('speak_type', 'chapter_start')
+        dm_result, shared = DM_SPEAK_FLIGHTS.do(
+            _dm_speak_key(session_id, data),
+            generate_speech,
+            keep_if=lambda result: result.get('success', False),
+            timeout=Config.DM_SPEAK_WAIT_TIMEOUT
         )
+        if shared:
+            print(f"🔁 DM {speak_type} 发言请求已合并: {session_id} 第{chapter}章")
         
         if dm_result.get('success', False):
-            # 记录DM发言到历史
-            dm_action = {
-                'type': 'dm_speak',
-                'speak_type': speak_type,
-                'content': dm_result['speech'],
-                'chapter': chapter,
-                'timestamp': datetime.now().isoformat(),
-                'tools': dm_result.get('tools', [])
-            }
-            
-            if hasattr(session, 'action_history'):
-                session.action_history.append(dm_action)
-            else:
-                session.action_history = [dm_action]
-            
-            print(f"🎭 DM {speak_type} 发言生成完成")
-            print(f"💬 发言内容: {dm_result['speech'][:100]}...")
-            if dm_result.get('tools'):
-                print(f"🔧 使用工具: {len(dm_result['tools'])}个")
-            
             return jsonify({
                 'status': 'success',
                 'message': 'DM发言生成成功',
@@ -1502,7 +1670,8 @@ def handle_dm_speak():
                     'speech': dm_result['speech'],
                     'tools': dm_result.get('tools', []),
                     'speak_type': speak_type,
-                    'chapter': chapter
+                    'chapter': chapter,
+                    'shared': shared
                 }
             })
         else:
@@ -1514,6 +1683,8 @@ def handle_dm_speak():
                 }
             }), 500
         
+    except SessionConflictError as e:
+        return _conflict_response(e)
     except Exception as e:
         print(f"❌ DM发言处理失败: {e}")
         traceback.print_exc()
@@ -1522,6 +1693,385 @@ def handle_dm_speak():
             'message': f'DM发言处理失败: {str(e)}'
         }), 500
 
+@game_bp.route('/dm_speak/stream', methods=['GET', 'POST'])
+@login_required
+def handle_dm_speak_stream():
+    """流式DM发言（Server-Sent Events）
+    
+    参数与/dm_speak相同（GET时通过查询参数传入），依次推送事件：
+    token（发言片段）、tool（工具调用结果）、done（完整结果）。
+    """
+    try:
+        data = request.get_json(silent=True) if request.method == 'POST' else None
+        if data is None:
+            data = request.args.to_dict()
+            if 'chapter' in data:
+                data['chapter'] = int(data['chapter'])
+        session_id = data.get('game_session')
+        
+        if session_id not in ACTIVE_GAMES:
+            return jsonify({
+                'status': 'error',
+                'message': '游戏会话不存在'
+            }), 404
+        
+        session = ACTIVE_GAMES[session_id]
+        game = session.game_instance
+        
+        if not game:
+            return jsonify({
+                'status': 'error',
+                'message': '游戏实例不存在'
+            }), 400
+        
+        dm, chapter, speak_type, speak_kwargs = _prepare_dm_speak(session, game, data)
+        flight_key = _dm_speak_key(session_id, data)
+        
+        def done_data(dm_result, shared):
+            return {
+                'success': dm_result.get('success', False),
+                'speech': dm_result.get('speech', ''),
+                'tools': dm_result.get('tools', []),
+                'speak_type': speak_type,
+                'chapter': chapter,
+                'ttft_ms': dm_result.get('ttft_ms'),
+                'total_ms': dm_result.get('total_ms'),
+                'error': dm_result.get('error'),
+                'shared': shared
+            }
+        
+        def generate():
+            call, leader = DM_SPEAK_FLIGHTS.begin(flight_key)
+            
+            # 相同的请求正在生成或刚生成完，等待并一次性推送完整结果
+            if not leader:
+                print(f"🔁 DM {speak_type} 流式发言请求已合并: {session_id} 第{chapter}章")
+                try:
+                    dm_result = call.wait(Config.DM_SPEAK_WAIT_TIMEOUT)
+                except Exception as e:
+                    dm_result = {'success': False, 'error': str(e)}
+                if dm_result.get('speech'):
+                    yield _format_sse('token', {'text': dm_result['speech']})
+                for tool_result in dm_result.get('tools', []):
+                    yield _format_sse('tool', tool_result)
+                yield _format_sse('done', done_data(dm_result, True))
+                return
+            
+            dm_result = None
+            try:
+                for event in dm.speak_stream(**speak_kwargs):
+                    if event['event'] == 'done':
+                        dm_result = event['data']
+                        if dm_result.get('success', False):
+                            try:
+                                _record_dm_speech(session, speak_type, chapter, dm_result)
+                            except SessionConflictError as e:
+                                dm_result = {**dm_result, 'success': False, 'error': str(e), 'conflict': True}
+                        DM_SPEAK_FLIGHTS.finish(flight_key, call, dm_result,
+                                                keep=dm_result.get('success', False))
+                        event['data'] = done_data(dm_result, False)
+                    yield _format_sse(event['event'], event['data'])
+            finally:
+                # 客户端中途断开时也要唤醒等待者
+                if dm_result is None:
+                    DM_SPEAK_FLIGHTS.finish(flight_key, call, error=RuntimeError('DM流式发言被中断'))
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            }
+        )
+        
+    except Exception as e:
+        print(f"❌ DM流式发言处理失败: {e}")
+        traceback.print_exc()
+        return jsonify({
+            'status': 'error',
+            'message': f'DM流式发言处理失败: {str(e)}'
+        }), 500
+
+def _dm_speak_key(session_id, data):
+    """DM发言请求的合并key：(会话, 章节, 发言类型)，插话还区分触发原因"""
+    speak_type = data.get('speak_type', 'chapter_start')
+    trigger_reason = data.get('trigger_reason', '') if speak_type == 'interject' else ''
+    return (session_id, data.get('chapter', 1), speak_type, trigger_reason)
+
+def _prepare_dm_speak(session, game, data):
+    """解析DM发言请求参数，返回(dm, chapter, speak_type, speak_kwargs)"""
+    chapter = data.get('chapter', 1)
+    speak_type = data.get('speak_type', 'chapter_start')
+    
+    # 获取DM实例
+    if not hasattr(session, 'dm_agent'):
+        session.dm_agent = DMAgent()
+    
+    # 准备参数
+    speak_kwargs = {
+        'chapter': chapter - 1,  # DM speak 方法使用0开始的章节
+        'script': game.script.get('dm', []),
+        'title': game.script.get('title', '剧本杀游戏'),
+        'characters': list(game.script.get('characters', [])),
+        'clues': game.script.get('clues', []),
+        'base_path': game.base_path if hasattr(game, 'base_path') else '',
+        'chat_history': _build_chat_context(session) or data.get('chat_history', '')
+    }
+    
+    # 根据speak_type添加特定参数
+    if speak_type == 'game_end':
+        speak_kwargs['is_game_end'] = True
+        speak_kwargs['killer'] = data.get('killer', '凶手身份待确认')
+        speak_kwargs['truth_info'] = data.get('truth_info', '最终真相待揭示')
+    elif speak_type == 'chapter_end':
+        speak_kwargs['is_chapter_end'] = True
+    elif speak_type == 'interject':
+        speak_kwargs['is_interject'] = True
+        speak_kwargs['trigger_reason'] = data.get('trigger_reason', '游戏进程需要')
+        speak_kwargs['guidance'] = data.get('guidance', '')
+    
+    return session.dm_agent, chapter, speak_type, speak_kwargs
+
+def _record_dm_speech(session, speak_type, chapter, dm_result):
+    """记录DM发言到行动历史"""
+    dm_action = {
+        'type': 'dm_speak',
+        'speak_type': speak_type,
+        'content': dm_result['speech'],
+        'chapter': chapter,
+        'timestamp': datetime.now().isoformat(),
+        'tools': dm_result.get('tools', [])
+    }
+    
+    session.action_history.append(dm_action)
+    _save_session(session)
+    
+    print(f"🎭 DM {speak_type} 发言生成完成")
+    print(f"💬 发言内容: {dm_result['speech'][:100]}...")
+    if dm_result.get('tools'):
+        print(f"🔧 使用工具: {len(dm_result['tools'])}个")
+
+def _format_sse(event, data, event_id=None):
+    """格式化一条Server-Sent Events消息"""
+    message = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n" + message
+    return message
+
+def _compact_action(action):
+    """去掉行动记录中的空字段，减小推送/同步的数据量"""
+    return {key: value for key, value in action.items() if value not in (None, '', [], {})}
+
+@game_bp.route('/events/<session_id>', methods=['GET'])
+@login_required
+def get_game_events(session_id):
+    """
+    增量获取游戏事件
+    
+    返回序号大于since的行动记录（玩家行动、AI回答、DM发言和状态变更），
+    没有新事件时配合ETag返回304。
+    
+    查询参数:
+        since: 客户端已同步到的序号，默认0
+        limit: 最多返回的事件数，默认200
+    """
+    try:
+        if session_id not in ACTIVE_GAMES:
+            return jsonify({
+                'status': 'error',
+                'message': '游戏会话不存在'
+            }), 404
+        
+        session = ACTIVE_GAMES[session_id]
+        since = max(0, request.args.get('since', 0, type=int))
+        limit = max(1, min(request.args.get('limit', 200, type=int), 200))
+        
+        last_seq = session.action_history.last_seq
+        # 客户端游标超过当前序号（会话已重建），从头同步
+        reset = since > last_seq
+        if reset:
+            since = 0
+        
+        etag = f"{session_id}-{since}-{last_seq}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        
+        events = [_compact_action(action) for action in session.action_history.since(since, limit)]
+        cursor = events[-1]['seq'] if events else max(since, 0)
+        
+        response = jsonify({
+            'status': 'success',
+            'data': {
+                'events': events,
+                'cursor': cursor,
+                'has_more': cursor < last_seq,
+                'reset': reset,
+                'state': {
+                    'game_state': session.game_state,
+                    'chapter': session.current_chapter,
+                    'cycle': session.current_cycle
+                }
+            }
+        })
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+        
+    except Exception as e:
+        print(f"❌ 获取游戏事件失败: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'获取游戏事件失败: {str(e)}'
+        }), 500
+
+@game_bp.route('/stream/<session_id>', methods=['GET'])
+@login_required
+def stream_game_events(session_id):
+    """
+    游戏会话事件流（Server-Sent Events）
+    
+    推送事件:
+        progress: 游戏生成进度（与/progress返回的数据相同）
+        action: 新的行动记录（玩家行动、AI回答、DM发言、状态变更），id为行动序号
+        speaking_status: 当前轮次发言状态变化
+        end: 会话已结束
+    
+    查询参数since或Last-Event-ID请求头指定已同步到的行动序号。
+    """
+    if session_id not in ACTIVE_GAMES:
+        return jsonify({
+            'status': 'error',
+            'message': '游戏会话不存在'
+        }), 404
+    
+    since = request.headers.get('Last-Event-ID') or request.args.get('since', 0)
+    try:
+        since = max(0, int(since))
+    except (TypeError, ValueError):
+        since = 0
+    
+    def generate():
+        cursor = since
+        last_progress = None
+        last_speaking_status = None
+        progress_done = False
+        
+        yield f"retry: {Config.GAME_EVENT_RETRY_MS}\n\n"
+        
+        while True:
+            version = EVENT_HUB.version(session_id)
+            # 只读查询：打开的事件流不刷新会话的访问时间，会话被淘汰后结束推送而不是重新恢复
+            session = ACTIVE_GAMES.peek(session_id)
+            if session is None:
+                yield _format_sse('end', {'reason': 'session_closed'})
+                return
+            
+            # 生成进度（只在后台创建任务存在且未完成推送时）
+            if not progress_done and GAME_JOBS.get(session_id):
+                progress = _build_progress_data(session)
+                if progress != last_progress:
+                    last_progress = progress
+                    yield _format_sse('progress', progress)
+                progress_done = progress['game_ready'] or progress['game_state'] == 'failed'
+            
+            # 新的行动记录
+            if cursor > session.action_history.last_seq:
+                cursor = 0
+            for action in session.action_history.since(cursor):
+                cursor = action['seq']
+                yield _format_sse('action', _compact_action(action), event_id=cursor)
+            
+            # 当前轮次发言状态
+            if session.game_instance:
+                speaking_status = session.action_history.speaking_status(
+                    session.current_chapter,
+                    session.current_cycle,
+                    session.game_instance.script.get('characters', [])
+                )
+                speaking_status.update(chapter=session.current_chapter, cycle=session.current_cycle)
+                if speaking_status != last_speaking_status:
+                    last_speaking_status = speaking_status
+                    yield _format_sse('speaking_status', speaking_status)
+            
+            if not EVENT_HUB.wait(session_id, version, Config.GAME_EVENT_HEARTBEAT):
+                yield ": ping\n\n"
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@game_bp.route('/admin/sessions', methods=['GET'])
+@login_required
+def admin_list_sessions():
+    """查看本进程中的游戏会话：估算内存和最近活动时间"""
+    try:
+        now = time.time()
+        sessions = []
+        for session in ACTIVE_GAMES.local_sessions():
+            last_activity = ACTIVE_GAMES.last_activity(session.session_id)
+            usage = session.memory_usage()
+            sessions.append({
+                'session_id': session.session_id,
+                'game_state': session.game_state,
+                'players': len(session.players),
+                'current_chapter': session.current_chapter,
+                'actions': len(session.action_history),
+                'memory_bytes': usage['total'],
+                'memory_breakdown': usage,
+                'last_activity': datetime.fromtimestamp(last_activity).isoformat() if last_activity else None,
+                'idle_seconds': int(now - last_activity) if last_activity else None
+            })
+        
+        sessions.sort(key=lambda s: s['memory_bytes'], reverse=True)
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'sessions': sessions,
+                'total_sessions': len(sessions),
+                'total_memory_bytes': sum(s['memory_bytes'] for s in sessions),
+                'snapshots': len(ACTIVE_GAMES.snapshot_ids()),
+                'evicted': ACTIVE_GAMES.evicted_count,
+                'restored': ACTIVE_GAMES.restored_count,
+                'store_backend': SESSION_STORE.name,
+                'dm_speak_flights': DM_SPEAK_FLIGHTS.stats(),
+                'ttl': ACTIVE_GAMES.ttl,
+                'max_sessions': ACTIVE_GAMES.max_sessions
+            }
+        })
+        
+    except Exception as e:
+        print(f"❌ 获取会话列表失败: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'获取会话列表失败: {str(e)}'
+        }), 500
+
+@game_bp.route('/admin/sessions/evict', methods=['POST'])
+@login_required
+def admin_evict_sessions():
+    """立即执行一次会话淘汰"""
+    try:
+        evicted = ACTIVE_GAMES.evict()
+        return jsonify({
+            'status': 'success',
+            'message': f'已淘汰{len(evicted)}个会话',
+            'data': {
+                'evicted': evicted
+            }
+        })
+        
+    except Exception as e:
+        print(f"❌ 淘汰会话失败: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'淘汰会话失败: {str(e)}'
+        }), 500
+
 # 错误处理
 @game_bp.errorhandler(404)
 def not_found(error):
@@ -1550,8 +2100,12 @@ def sync_cycle():
         session = ACTIVE_GAMES[session_id]
         
         # 更新后端的轮次信息
-        session.current_chapter = chapter
-        session.current_cycle = cycle
+        if (session.current_chapter, session.current_cycle) != (chapter, cycle):
+            session.current_chapter = chapter
+            session.current_cycle = cycle
+            _record_state_change(session, 'cycle_changed')
+            _save_session(session)
+            _maybe_prepare_next_chapter(session)
         
         print(f"🔄 轮次同步: 第{chapter}章 第{cycle}轮")
         
@@ -1564,6 +2118,8 @@ def sync_cycle():
             }
         })
         
+    except SessionConflictError as e:
+        return _conflict_response(e)
     except Exception as e:
         print(f"❌ 轮次同步失败: {e}")
         traceback.print_exc()
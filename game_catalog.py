@@ -0,0 +1,157 @@
+"""
+游戏目录索引
+缓存每个游戏的标题、角色、章节数和创建时间，按script.json的mtime判断是否需要重新解析，
+使游戏列表接口不必每次打开所有剧本文件
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+
+class GameCatalog:
+    """游戏目录索引（持久化到log/catalog.json）"""
+
+    def __init__(self, log_dir: str = 'log', index_file: str = None):
+        """
+        初始化目录索引
+
+        Args:
+            log_dir: 游戏目录的根目录
+            index_file: 索引文件路径，默认为log_dir下的catalog.json
+        """
+        self.log_dir = log_dir
+        self.index_file = index_file or os.path.join(log_dir, 'catalog.json')
+        self._entries = None  # 目录名 -> 索引条目
+        self._lock = threading.Lock()
+
+    def _load_index(self) -> dict:
+        """从索引文件加载条目"""
+        if not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get('games', {})
+        except Exception as e:
+            print(f"⚠️ 读取游戏索引失败，将重建索引: {e}")
+            return {}
+
+    def _save_index(self):
+        """原子写入索引文件"""
+        try:
+            os.makedirs(os.path.dirname(self.index_file) or '.', exist_ok=True)
+            tmp_file = f"{self.index_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'games': self._entries}, f, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+        except Exception as e:
+            print(f"⚠️ 保存游戏索引失败: {e}")
+
+    def _build_entry(self, item_path: str, script_file: str, mtime: float) -> dict:
+        """解析剧本文件并生成索引条目"""
+        with open(script_file, 'r', encoding='utf-8') as f:
+            script = json.load(f)
+
+        return {
+            'path': item_path,
+            'title': script.get('title', '未命名剧本'),
+            'characters': script.get('characters', []),
+            'chapters': len(script.get('dm', [])),
+            'created_at': datetime.fromtimestamp(os.path.getctime(item_path)).isoformat(),
+            'mtime': mtime
+        }
+
+    def refresh(self) -> list:
+        """
+        同步索引与磁盘状态
+
+        只对新增或mtime发生变化的剧本重新解析，已删除的游戏从索引中移除。
+
+        Returns:
+            list: 所有索引条目
+        """
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load_index()
+
+            if not os.path.exists(self.log_dir):
+                return []
+
+            changed = False
+            seen = set()
+            for item in os.listdir(self.log_dir):
+                item_path = os.path.join(self.log_dir, item)
+                script_file = os.path.join(item_path, 'script.json')
+                try:
+                    mtime = os.path.getmtime(script_file)
+                except OSError:
+                    continue
+
+                seen.add(item)
+                entry = self._entries.get(item)
+                if entry and entry.get('mtime') == mtime:
+                    continue
+
+                try:
+                    self._entries[item] = self._build_entry(item_path, script_file, mtime)
+                    changed = True
+                except Exception as e:
+                    print(f"解析游戏 {item_path} 失败: {e}")
+                    if self._entries.pop(item, None) is not None:
+                        changed = True
+
+            for item in list(self._entries):
+                if item not in seen:
+                    del self._entries[item]
+                    changed = True
+
+            if changed:
+                self._save_index()
+
+            return list(self._entries.values())
+
+    def query(self, keyword: str = None, page: int = 1, page_size: int = None) -> dict:
+        """
+        查询游戏列表
+
+        Args:
+            keyword: 按标题或角色名过滤（不区分大小写）
+            page: 页码，从1开始
+            page_size: 每页数量，None表示不分页
+
+        Returns:
+            dict: 包含games、total、page、page_size、pages
+        """
+        games = self.refresh()
+
+        if keyword:
+            keyword = keyword.lower()
+            games = [
+                game for game in games
+                if keyword in game['title'].lower()
+                or any(keyword in character.lower() for character in game['characters'])
+            ]
+
+        # 按创建时间倒序排列
+        games.sort(key=lambda x: x['created_at'], reverse=True)
+
+        total = len(games)
+        if page_size:
+            page = max(1, page)
+            pages = (total + page_size - 1) // page_size
+            games = games[(page - 1) * page_size:page * page_size]
+        else:
+            page = 1
+            pages = 1 if total else 0
+
+        return {
+            'games': [
+                {key: value for key, value in game.items() if key != 'mtime'}
+                for game in games
+            ],
+            'total': total,
+            'page': page,
+            'page_size': page_size,
+            'pages': pages
+        }
@@ -0,0 +1,49 @@
+"""
+游戏会话事件通知
+会话状态变化时唤醒等待该会话的事件流（SSE），替代前端的定时轮询
+"""
+
+import threading
+
+
+class SessionEventHub:
+    """按会话维护变更版本号，事件流等待版本号变化后再推送"""
+
+    def __init__(self):
+        self._versions = {}  # session_id -> 变更版本号
+        self._cond = threading.Condition()
+
+    def notify(self, session_id: str):
+        """通知会话发生了变化"""
+        with self._cond:
+            self._versions[session_id] = self._versions.get(session_id, 0) + 1
+            self._cond.notify_all()
+
+    def version(self, session_id: str) -> int:
+        """当前变更版本号"""
+        with self._cond:
+            return self._versions.get(session_id, 0)
+
+    def wait(self, session_id: str, version: int, timeout: float) -> bool:
+        """
+        等待会话版本号发生变化
+
+        Args:
+            session_id: 会话ID
+            version: 调用方已处理的版本号
+            timeout: 最长等待时间(秒)
+
+        Returns:
+            bool: 是否有新变化（False表示超时）
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._versions.get(session_id, 0) != version,
+                timeout=timeout
+            )
+
+    def discard(self, session_id: str):
+        """会话结束后唤醒并清理等待者"""
+        with self._cond:
+            self._versions.pop(session_id, None)
+            self._cond.notify_all()
@@ -0,0 +1,193 @@
+"""
+游戏创建后台任务
+将剧本生成和图片生成放到后台线程执行，并在内存中记录结构化的进度状态
+"""
+
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class GameCreationJob:
+    """单个游戏创建任务的进度状态"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.phase = 'queued'  # queued, script, images, done, failed
+        self.script_status = 'pending'  # pending, running, done, failed
+        self.title = None
+        self.characters = []
+        self.game_dir = None
+        self.images = {}  # filename -> {'kind', 'name', 'status', 'local_path'}
+        self.error = None
+        self.game = None
+        self.future = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self._lock = threading.Lock()
+
+    def on_progress(self, event: str, data: dict):
+        """
+        接收Game的进度回调
+
+        Args:
+            event: 事件类型 phase / script_ready / image
+            data: 事件数据
+        """
+        with self._lock:
+            if event == 'phase':
+                self.phase = data['phase']
+                if data['phase'] == 'script':
+                    self.script_status = 'running'
+            elif event == 'script_ready':
+                self.script_status = 'done'
+                self.title = data.get('title')
+                self.characters = list(data.get('characters', []))
+                self.game_dir = data.get('game_dir')
+            elif event == 'image':
+                entry = self.images.setdefault(data['filename'], {
+                    'kind': data.get('kind'),
+                    'name': data.get('name'),
+                    'status': 'pending',
+                    'local_path': None
+                })
+                entry['status'] = data['status']
+                if data.get('local_path'):
+                    entry['local_path'] = data['local_path']
+            self.updated_at = time.time()
+
+    def finish(self, game):
+        """标记任务完成"""
+        with self._lock:
+            self.game = game
+            self.phase = 'done'
+            self.updated_at = time.time()
+
+    def fail(self, error: str):
+        """标记任务失败"""
+        with self._lock:
+            if self.script_status != 'done':
+                self.script_status = 'failed'
+            self.phase = 'failed'
+            self.error = error
+            self.updated_at = time.time()
+
+    @property
+    def script_ready(self) -> bool:
+        return self.script_status == 'done'
+
+    @property
+    def images_ready(self) -> bool:
+        """所有图片任务都已结束（成功或失败）"""
+        if self.phase == 'done':
+            return True
+        if self.phase != 'images':
+            return False
+        return all(entry['status'] in ('done', 'failed') for entry in self.images.values())
+
+    @property
+    def done(self) -> bool:
+        return self.phase == 'done'
+
+    @property
+    def failed(self) -> bool:
+        return self.phase == 'failed'
+
+    def character_image(self, character: str):
+        """获取已生成的角色图片路径"""
+        with self._lock:
+            for entry in self.images.values():
+                if entry['kind'] == 'character' and entry['name'] == character and entry['status'] == 'done':
+                    return entry['local_path']
+        return None
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        with self._lock:
+            image_counts = {'pending': 0, 'submitted': 0, 'done': 0, 'failed': 0}
+            for entry in self.images.values():
+                image_counts[entry['status']] = image_counts.get(entry['status'], 0) + 1
+
+            return {
+                'job_id': self.job_id,
+                'phase': self.phase,
+                'script': {
+                    'status': self.script_status,
+                    'title': self.title,
+                    'characters': self.characters
+                },
+                'images': {
+                    'total': len(self.images),
+                    'counts': image_counts,
+                    'items': {
+                        filename: {
+                            'kind': entry['kind'],
+                            'name': entry['name'],
+                            'status': entry['status']
+                        }
+                        for filename, entry in self.images.items()
+                    }
+                },
+                'error': self.error,
+                'created_at': self.created_at,
+                'updated_at': self.updated_at,
+                'elapsed': round(self.updated_at - self.created_at, 1)
+            }
+
+
+class GameJobManager:
+    """游戏创建任务管理器，在后台线程池中执行任务"""
+
+    def __init__(self, max_workers: int = 2):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='game-job'
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_id: str, factory, on_complete=None, on_failure=None) -> GameCreationJob:
+        """
+        提交游戏创建任务
+
+        Args:
+            job_id: 任务ID（通常与游戏会话ID相同）
+            factory: 创建游戏的函数，接收进度回调作为参数，返回Game实例
+            on_complete: 任务成功后的回调，接收任务对象
+            on_failure: 任务失败后的回调，接收任务对象
+
+        Returns:
+            GameCreationJob: 任务对象
+        """
+        job = GameCreationJob(job_id)
+
+        def run():
+            try:
+                game = factory(job.on_progress)
+                job.finish(game)
+                if on_complete:
+                    on_complete(job)
+                print(f"✅ 游戏创建任务完成: {job_id}")
+            except Exception as e:
+                print(f"❌ 游戏创建任务失败: {job_id} - {e}")
+                traceback.print_exc()
+                job.fail(str(e))
+                if on_failure:
+                    on_failure(job)
+            return job
+
+        with self._lock:
+            self._jobs[job_id] = job
+        job.future = self._executor.submit(run)
+        return job
+
+    def get(self, job_id: str):
+        """获取任务对象，不存在返回None"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def remove(self, job_id: str):
+        """移除任务记录"""
+        with self._lock:
+            self._jobs.pop(job_id, None)
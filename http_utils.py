@@ -0,0 +1,116 @@
+"""
+DashScope REST请求的共享HTTP会话
+所有文生图任务的提交、查询和图片下载共用一个带连接池和重试的requests.Session，
+图片按块流式写入临时文件后原子重命名
+"""
+
+import os
+import tempfile
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import Config
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+# 下载图片时每次写入的块大小
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def get_http_session() -> requests.Session:
+    """
+    获取进程内共享的HTTP会话
+
+    连接保活复用；连接失败和GET请求的5xx响应按指数退避自动重试
+    （POST只在连接建立失败时重试，避免重复提交任务；429由限流器处理）。
+    """
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            retry = Retry(
+                total=Config.HTTP_MAX_RETRIES,
+                backoff_factor=Config.HTTP_RETRY_BACKOFF,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=frozenset({'GET', 'HEAD'}),
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(
+                pool_connections=Config.HTTP_POOL_CONNECTIONS,
+                pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+                max_retries=retry
+            )
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _SESSION = session
+        return _SESSION
+
+
+def download_to_file(url: str, dest_path: str, timeout: float = 60) -> str:
+    """
+    流式下载文件：按块写入同目录的临时文件，完成后原子重命名
+
+    目标文件已存在时直接替换（不会修改与其共享inode的硬链接，如图片缓存）。
+
+    Args:
+        url: 下载地址
+        dest_path: 目标路径
+        timeout: 连接和读取超时(秒)
+
+    Returns:
+        str: 目标路径
+
+    Raises:
+        requests.exceptions.RequestException: 下载失败
+    """
+    directory = os.path.dirname(dest_path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.download-', suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            with get_http_session().get(url, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return dest_path
+
+
+def get_http_session_stats() -> list:
+    """
+    按主机统计连接复用情况
+
+    Returns:
+        list: 每个主机一项，包含请求数、新建连接数、复用次数和空闲连接数
+    """
+    with _SESSION_LOCK:
+        session = _SESSION
+    if session is None:
+        return []
+
+    stats = []
+    adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+    for adapter in adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            # 连接队列中未建立的位置是None
+            idle = [conn for conn in list(pool.pool.queue) if conn is not None] if pool.pool is not None else []
+            stats.append({
+                'host': f"{pool.scheme}://{pool.host}:{pool.port}",
+                'requests': pool.num_requests,
+                'new_connections': pool.num_connections,
+                'reused': max(0, pool.num_requests - pool.num_connections),
+                'idle_connections': len(idle),
+                'max_connections': pool.pool.maxsize if pool.pool is not None else 0
+            })
+    return stats
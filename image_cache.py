@@ -0,0 +1,193 @@
+"""
+按内容寻址的图片缓存
+以(模型, 提示词, 尺寸)的哈希为键保存生成过的图片，相同提示词再次生成时直接硬链接（或复制）
+到游戏的imgs/目录，不再提交文生图任务和下载；超过磁盘预算时按最近使用时间淘汰
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from config import Config
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+class ImageCache:
+    """图片缓存，索引保存在缓存目录的index.json"""
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 磁盘预算(字节)，0表示不限制
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+        self._stats = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+
+    @staticmethod
+    def make_key(model: str, prompt: str, size: str) -> str:
+        """计算(模型, 提示词, 尺寸)的缓存键"""
+        payload = json.dumps([model, prompt.strip(), size], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        """
+        查找缓存条目
+
+        Returns:
+            dict: 条目信息（含缓存文件路径path），未命中返回None
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            path = os.path.join(self.cache_dir, entry['file']) if entry else None
+            if entry and not os.path.exists(path):
+                # 缓存文件被手动删除
+                del self._index[key]
+                self._save_index()
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            entry['last_used'] = time.time()
+            entry['hits'] = entry.get('hits', 0) + 1
+            self._stats['hits'] += 1
+            self._save_index()
+            return dict(entry, path=path)
+
+    def materialize(self, key: str, dest_path: str):
+        """
+        把缓存的图片放到目标路径（优先硬链接，跨文件系统时复制）
+
+        Returns:
+            dict: 条目信息，未命中或放置失败返回None
+        """
+        entry = self.get(key)
+        if entry is None:
+            return None
+        try:
+            _link_or_copy(entry['path'], dest_path)
+        except OSError as e:
+            print(f"⚠️ 缓存图片放置失败: {e}")
+            return None
+        return entry
+
+    def put(self, key: str, src_path: str, meta: dict = None):
+        """
+        把已下载的图片加入缓存
+
+        Args:
+            key: 缓存键
+            src_path: 已下载的图片
+            meta: 附加信息（模型、提示词、实际提示词等），命中时原样返回
+        """
+        ext = os.path.splitext(src_path)[1] or '.png'
+        rel_path = os.path.join(key[:2], key + ext)
+        path = os.path.join(self.cache_dir, rel_path)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _link_or_copy(src_path, path)
+        except OSError as e:
+            print(f"⚠️ 图片加入缓存失败: {e}")
+            return
+
+        now = time.time()
+        with self._lock:
+            self._index[key] = dict(
+                meta or {},
+                file=rel_path,
+                bytes=os.path.getsize(path),
+                created_at=now,
+                last_used=now,
+                hits=0
+            )
+            self._stats['stored'] += 1
+            self._evict()
+            self._save_index()
+
+    def stats(self) -> dict:
+        """缓存统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._index)
+            stats['bytes'] = sum(entry['bytes'] for entry in self._index.values())
+        stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0
+        return stats
+
+    def _evict(self):
+        """超过磁盘预算时删除最久未使用的图片（调用方持有锁）"""
+        if not self.max_bytes:
+            return
+        total = sum(entry['bytes'] for entry in self._index.values())
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]['last_used']):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, entry['file']))
+            except OSError:
+                pass
+            total -= entry['bytes']
+            del self._index[key]
+            self._stats['evicted'] += 1
+
+    def _load_index(self) -> dict:
+        index_file = os.path.join(self.cache_dir, self.INDEX_FILE)
+        if not os.path.exists(index_file):
+            return {}
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ 图片缓存索引损坏，重新建立: {e}")
+            return {}
+
+    def _save_index(self):
+        """原子写入索引（调用方持有锁）"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        index_file = os.path.join(self.cache_dir, self.INDEX_FILE)
+        tmp_file = index_file + '.tmp'
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f, ensure_ascii=False)
+            os.replace(tmp_file, index_file)
+        except OSError as e:
+            print(f"⚠️ 保存图片缓存索引失败: {e}")
+
+
+def get_image_cache():
+    """
+    获取进程内共享的图片缓存
+
+    Returns:
+        ImageCache: 缓存实例，未启用时返回None
+    """
+    global _CACHE
+    if not Config.IMAGE_CACHE_ENABLED:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ImageCache(Config.IMAGE_CACHE_DIR, Config.IMAGE_CACHE_MAX_MB * 1024 * 1024)
+        return _CACHE
+
+
+def _link_or_copy(src: str, dest: str):
+    """硬链接文件，失败时复制；目标已存在时覆盖"""
+    if os.path.exists(dest):
+        if os.path.samefile(src, dest):
+            return
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
@@ -0,0 +1,224 @@
+"""
+文生图任务共享轮询器
+进程内所有未完成的图片任务由一个后台线程统一查询：刚提交时按历史完成时间安排首次查询，
+之后查询间隔指数增长；任务结束后记录排队时间和生成时间，用于下次的首次查询时间
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+
+from config import Config
+
+_POLLER = None
+_POLLER_LOCK = threading.Lock()
+
+TERMINAL_STATUSES = ('SUCCEEDED', 'FAILED')
+
+
+class ImageTaskPoller:
+    """统一查询所有未完成的图片任务"""
+
+    def __init__(self, check_fn, min_interval: float = 1.0, max_interval: float = 10.0,
+                 backoff: float = 1.5, history_size: int = 50):
+        """
+        Args:
+            check_fn: 查询一次任务状态的函数 check_fn(task_id) -> output字典，失败返回None
+            min_interval: 最短查询间隔(秒)
+            max_interval: 最长查询间隔(秒)
+            backoff: 每次查询未完成后间隔的增长倍数
+            history_size: 用于估计完成时间的最近任务数
+        """
+        self.check_fn = check_fn
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+
+        self._tasks = {}  # task_id -> 任务状态
+        self._cond = threading.Condition()
+        self._thread = None
+        self._durations = deque(maxlen=history_size)  # 最近成功任务的完成耗时
+        self._recent = deque(maxlen=history_size)  # 最近结束任务的耗时记录
+        self._stats = {'tracked': 0, 'completed': 0, 'timeouts': 0, 'polls': 0}
+
+    def track(self, task_id: str, submitted_at: float = None, timeout: float = None) -> Future:
+        """
+        开始跟踪一个已提交的任务
+
+        Args:
+            task_id: 任务ID
+            submitted_at: 提交时间，默认为现在
+            timeout: 最长等待时间(秒)，默认Config.IMAGE_TASK_TIMEOUT
+
+        Returns:
+            Future: 任务结束（成功、失败或超时）时得到结果字典
+                    {'task_id', 'status', 'output', 'elapsed', 'queue_time', 'run_time', 'polls'}
+        """
+        submitted_at = submitted_at or time.time()
+        future = Future()
+        with self._cond:
+            self._tasks[task_id] = {
+                'task_id': task_id,
+                'future': future,
+                'submitted_at': submitted_at,
+                'deadline': submitted_at + (timeout if timeout is not None else Config.IMAGE_TASK_TIMEOUT),
+                'next_poll_at': submitted_at + self._first_delay(),
+                'interval': self.min_interval,
+                'polls': 0
+            }
+            self._stats['tracked'] += 1
+            self._ensure_thread()
+            self._cond.notify_all()
+        return future
+
+    def wait(self, task_id: str, timeout: float = None) -> dict:
+        """跟踪任务并阻塞等待结果"""
+        return self.track(task_id, timeout=timeout).result()
+
+    def stats(self) -> dict:
+        """轮询统计：未完成任务数、平均查询次数、完成时间分布和最近任务的排队/生成时间"""
+        with self._cond:
+            stats = dict(self._stats)
+            durations = sorted(self._durations)
+            recent = list(self._recent)
+            stats['outstanding'] = len(self._tasks)
+            stats['next_first_delay'] = self._first_delay()
+
+        finished = stats['completed'] + stats['timeouts']
+        stats['polls_per_task'] = stats['polls'] / finished if finished else 0
+        stats['completion_p50'] = _percentile(durations, 0.5)
+        stats['completion_p90'] = _percentile(durations, 0.9)
+        queue_times = [r['queue_time'] for r in recent if r['queue_time'] is not None]
+        run_times = [r['run_time'] for r in recent if r['run_time'] is not None]
+        stats['avg_queue_time'] = sum(queue_times) / len(queue_times) if queue_times else None
+        stats['avg_run_time'] = sum(run_times) / len(run_times) if run_times else None
+        stats['recent'] = recent
+        return stats
+
+    def _first_delay(self) -> float:
+        """首次查询时间：取最近任务完成时间的低分位，没有历史时用最短间隔"""
+        if not self._durations:
+            return self.min_interval
+        estimate = _percentile(sorted(self._durations), 0.2)
+        return min(self.max_interval, max(self.min_interval, estimate))
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='image-task-poller', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._tasks:
+                    self._cond.wait()
+                now = time.time()
+                due = [task for task in self._tasks.values() if task['next_poll_at'] <= now]
+                if not due:
+                    next_at = min(task['next_poll_at'] for task in self._tasks.values())
+                    self._cond.wait(next_at - now)
+                    continue
+            for task in due:
+                self._poll(task)
+
+    def _poll(self, task: dict):
+        """查询一个任务，结束时完成Future，否则安排下一次查询"""
+        try:
+            output = self.check_fn(task['task_id'])
+        except Exception as e:
+            print(f"⚠️ 查询图片任务失败 {task['task_id']}: {e}")
+            output = None
+        now = time.time()
+        status = output.get('task_status') if output else None
+
+        with self._cond:
+            task['polls'] += 1
+            self._stats['polls'] += 1
+            if status in TERMINAL_STATUSES:
+                self._complete(task, status, output, now)
+            elif now >= task['deadline']:
+                self._stats['timeouts'] += 1
+                self._complete(task, 'TIMEOUT', output, now)
+            else:
+                # 首次查询之后按最短间隔再查一次，此后间隔逐次增长
+                if task['polls'] > 1:
+                    task['interval'] = min(self.max_interval, task['interval'] * self.backoff)
+                task['next_poll_at'] = min(now + task['interval'], task['deadline'])
+
+    def _complete(self, task: dict, status: str, output, now: float):
+        """记录耗时并完成Future（调用方持有锁）"""
+        del self._tasks[task['task_id']]
+        queue_time, run_time = _task_timings(output)
+        elapsed = now - task['submitted_at']
+        record = {
+            'task_id': task['task_id'],
+            'status': status,
+            'elapsed': elapsed,
+            'queue_time': queue_time,
+            'run_time': run_time,
+            'polls': task['polls']
+        }
+        if status != 'TIMEOUT':
+            self._stats['completed'] += 1
+        if status == 'SUCCEEDED':
+            # 服务端给出时间时用服务端的完成耗时，不受查询间隔影响
+            self._durations.append(queue_time + run_time if queue_time is not None and run_time is not None else elapsed)
+        self._recent.append(record)
+        task['future'].set_result(dict(record, output=output))
+
+
+def get_image_poller(check_fn) -> ImageTaskPoller:
+    """
+    获取进程内共享的图片任务轮询器
+
+    Args:
+        check_fn: 首次创建时使用的查询函数（如DMAgent.check_image_task）
+    """
+    global _POLLER
+    with _POLLER_LOCK:
+        if _POLLER is None:
+            _POLLER = ImageTaskPoller(
+                check_fn,
+                min_interval=Config.IMAGE_POLL_MIN_INTERVAL,
+                max_interval=Config.IMAGE_POLL_MAX_INTERVAL,
+                backoff=Config.IMAGE_POLL_BACKOFF
+            )
+        return _POLLER
+
+
+def get_image_poll_stats() -> dict:
+    """获取共享轮询器的统计，尚未创建时返回空字典"""
+    return _POLLER.stats() if _POLLER is not None else {}
+
+
+def _task_timings(output) -> tuple:
+    """从任务output读取排队时间和生成时间(秒)，缺少时间字段时为None"""
+    if not output:
+        return None, None
+    submit_time = _parse_task_time(output.get('submit_time'))
+    scheduled_time = _parse_task_time(output.get('scheduled_time'))
+    end_time = _parse_task_time(output.get('end_time'))
+    queue_time = (scheduled_time - submit_time).total_seconds() if submit_time and scheduled_time else None
+    run_time = (end_time - scheduled_time).total_seconds() if scheduled_time and end_time else None
+    return queue_time, run_time
+
+
+def _parse_task_time(value):
+    """解析DashScope的时间字段，如 2025-01-08 16:03:59.840"""
+    if not value:
+        return None
+    for fmt in ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _percentile(values: list, fraction: float):
+    """已排序列表的分位数，空列表返回None"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
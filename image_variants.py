@@ -0,0 +1,96 @@
+"""
+图片衍生版本
+图片落盘时预先生成缩略图和WebP版本，保存在图片所在目录的variants/下，
+game_files按?variant=参数直接返回已有的文件，请求时不做任何转换
+"""
+
+import os
+import tempfile
+
+from config import Config
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# 衍生版本: 名称 -> 最长边像素（None表示保持原尺寸）
+VARIANTS = {
+    'thumb': Config.IMAGE_THUMB_SIZE,
+    'webp': None
+}
+
+VARIANTS_DIR = 'variants'
+
+_warned = False
+
+
+def variant_path(image_path: str, variant: str) -> str:
+    """衍生版本的文件路径，如 imgs/张三.png -> imgs/variants/张三.thumb.webp"""
+    directory, filename = os.path.split(image_path)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, VARIANTS_DIR, f"{stem}.{variant}.webp")
+
+
+def generate_variants(image_path: str) -> dict:
+    """
+    生成图片的所有衍生版本
+
+    Args:
+        image_path: 原图路径
+
+    Returns:
+        dict: 版本名称 -> 文件路径；未安装Pillow或原图无法读取时返回空字典
+    """
+    global _warned
+    if not PIL_AVAILABLE:
+        if not _warned:
+            print("⚠️ 未安装Pillow，跳过缩略图和WebP生成: pip install Pillow")
+            _warned = True
+        return {}
+
+    variants = {}
+    try:
+        with Image.open(image_path) as source:
+            source.load()
+            for variant, max_size in VARIANTS.items():
+                image = source.copy()
+                if max_size:
+                    image.thumbnail((max_size, max_size))
+                path = variant_path(image_path, variant)
+                _save_atomic(image, path)
+                variants[variant] = path
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 生成图片衍生版本失败 {image_path}: {e}")
+    return variants
+
+
+def existing_variant(image_path: str, variant: str):
+    """
+    返回已生成的衍生版本路径
+
+    Returns:
+        str: 文件存在时返回路径，未知版本或尚未生成时返回None
+    """
+    if variant not in VARIANTS:
+        return None
+    path = variant_path(image_path, variant)
+    return path if os.path.isfile(path) else None
+
+
+def _save_atomic(image, path: str):
+    """写入同目录临时文件后原子替换（不会改动与图片缓存共享的硬链接）"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.variant-', suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            image.save(f, format='WEBP', quality=Config.IMAGE_WEBP_QUALITY)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -1,16 +1,30 @@
 #!/usr/bin/env python3
 """
 OpenAI客户端工具函数
-提供安全的OpenAI客户端初始化方法
+提供安全的OpenAI客户端初始化方法，以及进程内共享的客户端注册表
 """
 
 from openai import OpenAI
 from config import Config
+from rate_limiter import get_limiter, retry_after_seconds
+import json
 import os
+import threading
+import time
+import weakref
+
+import httpx
+
+# 进程内共享的客户端注册表: (api_key, base_url) -> 客户端条目
+_CLIENT_REGISTRY = {}
+_CLIENT_REGISTRY_LOCK = threading.Lock()
 
 def create_openai_client(base_url=None, api_key=None):
     """
-    安全地创建OpenAI客户端
+    获取OpenAI客户端（从共享注册表复用）
+    
+    相同(api_key, base_url)的调用方共享同一个客户端及其HTTP连接池，
+    避免每个Agent都重新建立TLS连接。
     
     Args:
         base_url: API基础URL，如果为None则使用Config.API_BASE
@@ -25,6 +39,159 @@ def create_openai_client(base_url=None, api_key=None):
     if api_key is None:
         api_key = Config.API_KEY
     
+    key = (api_key, base_url)
+    with _CLIENT_REGISTRY_LOCK:
+        entry = _CLIENT_REGISTRY.get(key)
+        if entry is None:
+            entry = _create_registry_entry(base_url, api_key)
+            _CLIENT_REGISTRY[key] = entry
+        else:
+            entry['reuses'] += 1
+        return entry['client']
+
+def _create_registry_entry(base_url, api_key):
+    """创建带连接池的客户端条目"""
+    entry = {
+        'base_url': base_url,
+        'api_key': api_key,
+        'created_at': time.time(),
+        'reuses': 0,
+        'requests': 0
+    }
+    
+    def count_request(request):
+        entry['requests'] += 1
+    
+    transport = httpx.HTTPTransport(
+        limits=httpx.Limits(
+            max_connections=Config.LLM_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.LLM_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=Config.LLM_POOL_KEEPALIVE_EXPIRY
+        )
+    )
+    http_client = httpx.Client(
+        transport=RateLimitedTransport(transport, get_limiter('chat')),
+        event_hooks={'request': [count_request]}
+    )
+    entry['http_client'] = http_client
+    entry['client'] = _build_openai_client(base_url, api_key, http_client)
+    return entry
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """
+    经过全局chat限流器发出请求的httpx传输层
+    
+    请求发出前按预计token数排队，响应读取完毕（流式响应关闭）后归还并发额度，
+    非流式响应按usage中的实际token数补扣或退还差额。
+    """
+    
+    def __init__(self, transport: httpx.BaseTransport, limiter):
+        self.transport = transport
+        self.limiter = limiter
+    
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        body = _request_json(request)
+        tokens = _estimate_request_tokens(body)
+        try:
+            self.limiter.acquire(tokens, timeout=Config.RATE_LIMIT_WAIT_TIMEOUT)
+        except TimeoutError as e:
+            raise httpx.PoolTimeout(str(e), request=request)
+        
+        try:
+            response = self.transport.handle_request(request)
+        except BaseException:
+            self.limiter.release(tokens)
+            raise
+        
+        if response.status_code == 429:
+            self.limiter.penalize(retry_after_seconds(response.headers))
+        track_usage = not body.get('stream')
+        if response.is_closed:
+            # 传输层已读取完毕的响应直接归还
+            self.limiter.release(tokens, _usage_tokens(response.content) if track_usage else None)
+        else:
+            response.stream = _ReleasingStream(response.stream, self.limiter, tokens, track_usage)
+        return response
+    
+    def close(self):
+        self.transport.close()
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """响应关闭时归还限流额度；调用方未关闭就丢弃响应时，在回收时归还"""
+    
+    # 非流式响应最多缓存这么多字节用于读取usage
+    MAX_TRACKED_BYTES = 1024 * 1024
+    
+    def __init__(self, stream, limiter, tokens: int, track_usage: bool):
+        self.stream = stream
+        self.limiter = limiter
+        self.tokens = tokens
+        self.chunks = [] if track_usage else None
+        self.size = 0
+        # 回收时的兜底归还，不能引用self
+        self._finalizer = weakref.finalize(self, limiter.release, tokens)
+    
+    def __iter__(self):
+        for chunk in self.stream:
+            if self.chunks is not None:
+                self.size += len(chunk)
+                if self.size <= self.MAX_TRACKED_BYTES:
+                    self.chunks.append(chunk)
+                else:
+                    self.chunks = None
+            yield chunk
+    
+    @property
+    def released(self) -> bool:
+        return not self._finalizer.alive
+    
+    def close(self):
+        # detach保证关闭和回收只归还一次
+        if self._finalizer.detach():
+            self.limiter.release(self.tokens, _usage_tokens(b''.join(self.chunks)) if self.chunks else None)
+        self.stream.close()
+
+def _usage_tokens(content: bytes):
+    """从非流式响应的usage读取实际token数"""
+    try:
+        usage = json.loads(content).get('usage') or {}
+    except (ValueError, AttributeError):
+        return None
+    return usage.get('total_tokens')
+
+def _request_json(request: httpx.Request) -> dict:
+    """读取请求的JSON请求体，不是JSON时返回空字典"""
+    try:
+        body = json.loads(request.content or b'{}')
+    except (ValueError, httpx.RequestNotRead):
+        return {}
+    return body if isinstance(body, dict) else {}
+
+def _estimate_request_tokens(body: dict) -> int:
+    """预计一次对话请求消耗的token数（提示词估算加上max_tokens）"""
+    from chat_summarizer import estimate_tokens
+    
+    tokens = 0
+    for message in body.get('messages') or []:
+        content = message.get('content') if isinstance(message, dict) else None
+        if isinstance(content, list):
+            content = ''.join(part.get('text', '') for part in content if isinstance(part, dict))
+        tokens += estimate_tokens(content if isinstance(content, str) else '')
+    max_tokens = body.get('max_tokens')
+    return tokens + (max_tokens if isinstance(max_tokens, int) else 0)
+
+def _build_openai_client(base_url, api_key, http_client=None):
+    """
+    安全地创建OpenAI客户端
+    
+    Args:
+        base_url: API基础URL
+        api_key: API密钥
+        http_client: 共享的httpx客户端（连接池）
+        
+    Returns:
+        OpenAI: 配置好的OpenAI客户端实例
+    """
     # 尝试不同的初始化方式
     client = None
     errors = []
@@ -33,7 +200,8 @@ def create_openai_client(base_url=None, api_key=None):
     try:
         client = OpenAI(
             base_url=base_url,
-            api_key=api_key
+            api_key=api_key,
+            http_client=http_client
         )
         print(f"✅ OpenAI客户端初始化成功 (使用base_url: {base_url})")
         return client
@@ -43,7 +211,7 @@ def create_openai_client(base_url=None, api_key=None):
     
     # 方式2: 只使用api_key
     try:
-        client = OpenAI(api_key=api_key)
+        client = OpenAI(api_key=api_key, http_client=http_client)
         print(f"✅ OpenAI客户端初始化成功 (仅使用api_key)")
         return client
     except Exception as e:
@@ -56,7 +224,7 @@ def create_openai_client(base_url=None, api_key=None):
         original_key = os.environ.get('OPENAI_API_KEY')
         os.environ['OPENAI_API_KEY'] = api_key
         
-        client = OpenAI()
+        client = OpenAI(http_client=http_client)
         print(f"✅ OpenAI客户端初始化成功 (使用环境变量)")
         
         # 恢复原始环境变量
@@ -81,6 +249,100 @@ def create_openai_client(base_url=None, api_key=None):
     print(f"❌ {error_msg}")
     raise Exception(error_msg)
 
+def get_client_pool_stats():
+    """
+    获取共享客户端注册表的连接统计
+    
+    Returns:
+        list: 每个(api_key, base_url)对应一项，包含复用次数、请求数和连接数
+    """
+    stats = []
+    with _CLIENT_REGISTRY_LOCK:
+        entries = list(_CLIENT_REGISTRY.values())
+    
+    for entry in entries:
+        # httpx未公开连接池信息，这里读取底层httpcore连接池
+        connections = []
+        transport = getattr(entry['http_client'], '_transport', None)
+        transport = getattr(transport, 'transport', transport)
+        pool = getattr(transport, '_pool', None)
+        if pool is not None:
+            connections = list(getattr(pool, 'connections', []))
+        idle = sum(1 for conn in connections if conn.is_idle())
+        
+        api_key = entry['api_key'] or ''
+        stats.append({
+            'base_url': entry['base_url'],
+            'api_key': f"{api_key[:6]}***" if api_key else '',
+            'created_at': entry['created_at'],
+            'reuses': entry['reuses'],
+            'requests': entry['requests'],
+            'live_connections': len(connections),
+            'idle_connections': idle,
+            'active_connections': len(connections) - idle,
+            'max_connections': Config.LLM_POOL_MAX_CONNECTIONS,
+            'max_keepalive_connections': Config.LLM_POOL_MAX_KEEPALIVE
+        })
+    return stats
+
+# 提示词缓存统计: 调用来源 -> 累计token数
+_PROMPT_CACHE_STATS = {}
+_PROMPT_CACHE_LOCK = threading.Lock()
+
+def record_prompt_usage(source, usage):
+    """
+    记录一次调用的提示词token用量（区分命中服务端前缀缓存的部分）
+    
+    Args:
+        source: 调用来源，如"player.query"
+        usage: completion.usage，可能为空或不包含缓存信息
+        
+    Returns:
+        dict: 本次调用的prompt_tokens、cached_tokens和completion_tokens
+    """
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+    details = getattr(usage, 'prompt_tokens_details', None)
+    if isinstance(details, dict):
+        cached_tokens = details.get('cached_tokens', 0) or 0
+    else:
+        cached_tokens = getattr(details, 'cached_tokens', 0) or 0
+    
+    with _PROMPT_CACHE_LOCK:
+        stats = _PROMPT_CACHE_STATS.setdefault(
+            source, {'calls': 0, 'prompt_tokens': 0, 'cached_tokens': 0, 'completion_tokens': 0}
+        )
+        stats['calls'] += 1
+        stats['prompt_tokens'] += prompt_tokens
+        stats['cached_tokens'] += cached_tokens
+        stats['completion_tokens'] += completion_tokens
+    return {'prompt_tokens': prompt_tokens, 'cached_tokens': cached_tokens, 'completion_tokens': completion_tokens}
+
+def get_prompt_cache_stats():
+    """
+    获取各调用来源的提示词缓存命中统计
+    
+    Returns:
+        dict: 调用来源 -> 调用次数、总/缓存/未缓存token数和命中率
+    """
+    with _PROMPT_CACHE_LOCK:
+        snapshot = {source: dict(stats) for source, stats in _PROMPT_CACHE_STATS.items()}
+    for stats in snapshot.values():
+        stats['uncached_tokens'] = stats['prompt_tokens'] - stats['cached_tokens']
+        stats['hit_rate'] = stats['cached_tokens'] / stats['prompt_tokens'] if stats['prompt_tokens'] else 0
+    return snapshot
+
+def close_all_clients():
+    """关闭注册表中所有客户端的连接池"""
+    with _CLIENT_REGISTRY_LOCK:
+        entries = list(_CLIENT_REGISTRY.values())
+        _CLIENT_REGISTRY.clear()
+    for entry in entries:
+        try:
+            entry['http_client'].close()
+        except Exception as e:
+            print(f"⚠️ 关闭OpenAI客户端连接池失败: {e}")
+
 def test_openai_client(client):
     """
     测试OpenAI客户端是否可以正常工作
@@ -1,8 +1,21 @@
 from openai import OpenAI
 from config import Config
 from typing import List
-from openai_utils import create_openai_client
+import json
+from openai_utils import create_openai_client, record_prompt_usage
 from agent_logger import log_player_query_call, log_player_response_call
+from structured_output import json_completion, parse_json_output
+
+# 主动发言的输出结构
+PLAYER_QUERY_SCHEMA = {
+    'type': 'object',
+    'required': ['content'],
+    'properties': {
+        'content': {'type': 'string'},
+        'query': {'type': 'object', 'additionalProperties': {'type': 'string'}}
+    }
+}
+
 class PlayerAgent:
     def __init__(self, name):
         self.name = name
@@ -27,10 +40,36 @@ class PlayerAgent:
         - 询问时必须使用剧本中明确提到的角色的确切姓名
         """
         self.client = create_openai_client()
+        # 提示词缓存统计（服务端前缀缓存命中的token数）
+        self.prompt_cache_stats = {'calls': 0, 'prompt_tokens': 0, 'cached_tokens': 0}
     
     def _get_system_prompt(self):
         """获取格式化后的系统提示词"""
         return self.base_sys_prompt.format(player_name=self.name)
+    
+    def _build_messages(self, current_script: str, task_prompt: str) -> list:
+        """
+        构建消息列表
+        
+        前缀（系统提示词、剧本、可询问角色）在同一章节内逐字不变，变化的交谈历史
+        只出现在最后一条消息末尾，以便命中服务端的提示词前缀缓存。
+        """
+        return [
+            {"role": "system", "content": self._get_system_prompt()},
+            {"role": "user", "content": self._build_context_prompt(current_script)},
+            {"role": "user", "content": task_prompt}
+        ]
+    
+    def _record_usage(self, method: str, completion):
+        """记录本次调用的缓存/未缓存提示词token数"""
+        usage = record_prompt_usage(f"player.{method}", getattr(completion, 'usage', None))
+        self.prompt_cache_stats['calls'] += 1
+        self.prompt_cache_stats['prompt_tokens'] += usage['prompt_tokens']
+        self.prompt_cache_stats['cached_tokens'] += usage['cached_tokens']
+        if usage['prompt_tokens']:
+            print(f"🧮 {self.name}.{method} 提示词token: {usage['prompt_tokens']}，"
+                  f"缓存命中 {usage['cached_tokens']}，未缓存 {usage['prompt_tokens'] - usage['cached_tokens']}")
+    
     def query(self, scripts: List[str], chat_history: str) -> dict:
         '''
         主动发言方法
@@ -52,55 +91,21 @@ class PlayerAgent:
             # 分析当前状况和决策
             user_prompt = self._build_user_prompt(current_script, chat_history)
             
-            # 调用AI生成回复
-            completion = self.client.chat.completions.create(
+            # 调用AI生成回复（端点支持时使用JSON输出模式）
+            completion = json_completion(
+                self.client,
                 model=Config.MODEL,
                 temperature=0.8,  # 稍高的温度让角色更有个性
-                messages=[
-                    {"role": "system", "content": self._get_system_prompt()},
-                    {"role": "user", "content": user_prompt}
-                ]
+                messages=self._build_messages(current_script, user_prompt)
             )
+            self._record_usage('query', completion)
             
             response = completion.choices[0].message.content.strip()
             
-            # 尝试解析JSON响应
-            try:
-                import json
-                # 如果响应被包在```json代码块中，需要先提取
-                if response.startswith("```json"):
-                    json_start = response.find("{")
-                    json_end = response.rfind("}") + 1
-                    if json_start != -1 and json_end != 0:
-                        response = response[json_start:json_end]
-                elif response.startswith("```"):
-                    # 移除可能的其他代码块标记
-                    response = response.replace("```", "").strip()
-                
-                # 解析JSON
-                response_data = json.loads(response)
-                
-                # 验证JSON格式
-                if not isinstance(response_data, dict):
-                    raise ValueError("响应不是有效的JSON对象")
-                
-                # 确保包含必要字段
-                if 'content' not in response_data:
-                    response_data['content'] = "**[保持沉默]**"
-                if 'query' not in response_data:
-                    response_data['query'] = {}
-                
-                # 验证query字段格式
-                if not isinstance(response_data['query'], dict):
-                    response_data['query'] = {}
-                
-                # 记录成功结果到日志
-                log_player_query_call(self.name, input_params, response_data)
-                
-                return response_data
-                
-            except (json.JSONDecodeError, ValueError) as e:
-                print(f"⚠️ {self.name}的JSON解析失败: {e}")
+            # 解析JSON响应（不完整的JSON在本地修复）
+            parsed = parse_json_output(response, PLAYER_QUERY_SCHEMA, 'player.query')
+            if not isinstance(parsed.data, dict):
+                print(f"⚠️ {self.name}的JSON解析失败: {parsed.errors}")
                 # 返回默认格式
                 fallback_result = {
                     "content": response if response else "**[保持沉默]**",
@@ -108,10 +113,22 @@ class PlayerAgent:
                 }
                 
                 # 记录解析失败到日志
-                log_player_query_call(self.name, input_params, fallback_result, f"JSON解析失败: {e}")
+                log_player_query_call(self.name, input_params, fallback_result, f"JSON解析失败: {parsed.errors}")
                 
                 return fallback_result
             
+            # 结构不完整时补齐字段
+            response_data = parsed.data
+            if not isinstance(response_data.get('content'), str) or not response_data['content']:
+                response_data['content'] = "**[保持沉默]**"
+            if not isinstance(response_data.get('query'), dict):
+                response_data['query'] = {}
+            
+            # 记录成功结果到日志
+            log_player_query_call(self.name, input_params, response_data)
+            
+            return response_data
+            
         except Exception as e:
             print(f"❌ {self.name}发言生成失败: {str(e)}")
             error_result = {
@@ -171,21 +188,22 @@ class PlayerAgent:
         else:
             return "- 暂时无法从剧本中识别出其他角色\n\n**注意**：在没有明确角色信息时，不要询问任何人！"
     
-    def _build_user_prompt(self, current_script: str, chat_history: str) -> str:
-        """构建用户提示词"""
+    def _build_context_prompt(self, current_script: str) -> str:
+        """构建稳定前缀：剧本和可询问角色列表（同一章节内不变）"""
         # 从剧本中提取角色列表
         character_list = self._extract_characters_from_script(current_script)
         
-        prompt = f"""作为玩家"{self.name}"，请根据以下信息决定你的下一步行动：
+        return f"""以下是玩家"{self.name}"目前掌握的信息：
 
 {current_script}
 
-## 当前交谈历史
-{chat_history if chat_history.strip() else "暂无交谈历史"}
-
 ## 【重要】可询问的角色列表
 根据剧本，你只能询问以下角色（绝对不能询问任何其他人）：
-{character_list}
+{character_list}"""
+    
+    def _build_user_prompt(self, current_script: str, chat_history: str) -> str:
+        """构建主动发言的任务提示词（固定的行动指南在前，交谈历史在末尾）"""
+        prompt = f"""作为玩家"{self.name}"，请根据上述信息和交谈历史决定你的下一步行动。
 
 ## 行动指南
 请根据你的剧本内容和当前交谈情况，决定你的下一步行动：
@@ -229,6 +247,9 @@ class PlayerAgent:
 }}
 ```
 
+## 当前交谈历史
+{chat_history if chat_history.strip() else "暂无交谈历史"}
+
 请直接输出JSON格式的响应，不要添加任何解释："""
 
         return prompt
@@ -262,11 +283,9 @@ class PlayerAgent:
             completion = self.client.chat.completions.create(
                 model=Config.MODEL,
                 temperature=0.7,  # 回应时温度稍低，更加谨慎
-                messages=[
-                    {"role": "system", "content": self._get_system_prompt()},
-                    {"role": "user", "content": response_prompt}
-                ]
+                messages=self._build_messages(current_script, response_prompt)
             )
+            self._record_usage('response', completion)
             
             response = completion.choices[0].message.content.strip()
             
@@ -291,7 +310,7 @@ class PlayerAgent:
             return error_result
     
     def _build_response_prompt(self, current_script: str, chat_history: str, query: str, query_player: str) -> str:
-        """构建回应提示词"""
+        """构建回应的任务提示词（固定的回应指南在前，交谈历史和问题在末尾）"""
         
         # 构建询问信息部分
         query_section = f"""
@@ -300,13 +319,8 @@ class PlayerAgent:
 **问题内容**: {query}
 """
         
-        prompt = f"""作为玩家"{self.name}"，你被其他玩家询问了问题，请根据以下信息给出回应：
-
-{current_script}
+        prompt = f"""作为玩家"{self.name}"，你被其他玩家询问了问题，请根据上述信息给出回应。
 
-## 当前交谈历史
-{chat_history if chat_history.strip() else "暂无交谈历史"}
-{query_section}
 ## 回应指南
 请针对具体问题给出回应，分析时考虑：
 
@@ -334,6 +348,141 @@ class PlayerAgent:
    - 使用markdown格式增强表达效果
    - 针对具体问题给出有针对性的回答
 
+## 当前交谈历史
+{chat_history if chat_history.strip() else "暂无交谈历史"}
+{query_section}
 请直接给出你的回应内容，如果选择不回答，请返回"**[选择不回答]**"："""
 
         return prompt
+
+
+class PlayerEnsemble:
+    """
+    合并模式：一次调用为多名AI玩家生成本轮发言
+    
+    系统提示词、规则和交谈历史只发送一次，各玩家的剧本分段给出，并要求模型
+    只用每名玩家自己的剧本决定其发言。所有剧本位于同一个上下文中，信息隔离依赖
+    提示词约束，不如逐个调用PlayerAgent严格，因此作为可选模式提供。
+    """
+    
+    sys_prompt = """
+        你将同时扮演多名剧本杀玩家，为每名玩家分别决定本轮的发言。
+        
+        【信息隔离】
+        - 每名玩家只知道"自己的剧本"和公开的交谈历史
+        - 为某名玩家决策时，绝对不能使用其他玩家剧本中的任何信息
+        - 各玩家的发言要保持各自的身份、立场和性格，不能互相串通
+        
+        【游戏规则】
+        1. 根据剧本内容，在交谈阶段完成各自的任务。如果是凶手，可能需要隐藏自己
+        2. 每次发言可以询问一个或多个其他玩家问题，也可以选择不发言，发言会被所有玩家听到
+        3. 只有在dm宣布开启下一阶段时，玩家才能接触后续章节内容
+        
+        【严格要求】
+        - 只能询问该玩家剧本中明确存在的其他角色，必须使用确切姓名，不可编造人名
+        """
+    
+    def __init__(self, agents: List[PlayerAgent]):
+        """
+        Args:
+            agents: 参与合并发言的PlayerAgent（复用其剧本整理和角色提取逻辑）
+        """
+        self.agents = {agent.name: agent for agent in agents}
+        self.client = create_openai_client()
+        self.last_usage = None
+    
+    def query(self, scripts: dict, chat_history: str) -> dict:
+        '''
+        合并发言方法
+        scripts: 玩家名 -> 该玩家的剧本内容列表
+        chat_history: 交谈历史，markdown
+        return: 玩家名 -> {"content": "发言内容", "query": {"人名": "问题"}}
+        '''
+        names = [name for name in scripts if name in self.agents]
+        if not names:
+            return {}
+        input_params = {
+            'players': names,
+            'chat_history': chat_history,
+            'method': 'ensemble_query'
+        }
+        
+        try:
+            completion = json_completion(
+                self.client,
+                model=Config.MODEL,
+                temperature=0.8,
+                messages=[
+                    {"role": "system", "content": self.sys_prompt},
+                    {"role": "user", "content": self._build_scripts_prompt(names, scripts)},
+                    {"role": "user", "content": self._build_task_prompt(names, chat_history)}
+                ]
+            )
+            self.last_usage = record_prompt_usage('player.ensemble', getattr(completion, 'usage', None))
+            response = completion.choices[0].message.content.strip()
+            results = self._parse_response(response, names)
+        except Exception as e:
+            print(f"❌ 合并发言生成失败: {str(e)}")
+            for name in names:
+                log_player_query_call(name, input_params, None, str(e))
+            raise
+        
+        for name in names:
+            log_player_query_call(name, input_params, results[name])
+        return results
+    
+    def _build_scripts_prompt(self, names: List[str], scripts: dict) -> str:
+        """各玩家的剧本和可询问角色（同一章节内不变，作为稳定前缀）"""
+        sections = []
+        for name in names:
+            agent = self.agents[name]
+            current_script = agent._build_current_script(scripts[name])
+            character_list = agent._extract_characters_from_script(current_script)
+            sections.append(f"""# 玩家"{name}"自己的剧本（只有{name}知道）
+
+{current_script}
+
+## {name}可询问的角色
+{character_list}""")
+        return "\n\n".join(sections)
+    
+    def _build_task_prompt(self, names: List[str], chat_history: str) -> str:
+        """输出要求和交谈历史（交谈历史放在末尾）"""
+        example = {name: {"content": "发言内容", "query": {"角色名": "问题内容"}} for name in names[:2]}
+        return f"""请为以下每名玩家分别决定本轮的发言：{'、'.join(names)}
+
+## 输出要求
+- 返回一个JSON对象，键为玩家名，值包含：
+  - `content`: 该玩家的发言内容（markdown格式），不发言时为"**[保持沉默]**"
+  - `query`: 该玩家要询问的问题（字典格式：{{"人名": "问题内容"}}），不询问时为{{}}
+- 必须包含上述每一名玩家
+- 每名玩家只能基于自己的剧本和交谈历史发言，询问对象只能是其可询问角色列表中的角色
+
+## 输出格式示例
+```json
+{json.dumps(example, ensure_ascii=False, indent=2)}
+```
+
+## 当前交谈历史
+{chat_history if chat_history.strip() else "暂无交谈历史"}
+
+请直接输出JSON格式的响应，不要添加任何解释："""
+    
+    def _parse_response(self, response: str, names: List[str]) -> dict:
+        """解析合并发言的JSON，缺失或格式错误的玩家按沉默处理"""
+        schema = {'type': 'object', 'required': names, 'additionalProperties': PLAYER_QUERY_SCHEMA}
+        data = parse_json_output(response, schema, 'player.ensemble').data
+        if not isinstance(data, dict):
+            data = {}
+        
+        results = {}
+        for name in names:
+            item = data.get(name)
+            if not isinstance(item, dict):
+                item = {}
+            query = item.get('query') if isinstance(item.get('query'), dict) else {}
+            results[name] = {
+                'content': item.get('content') or "**[保持沉默]**",
+                'query': {target: question for target, question in query.items() if target != name}
+            }
+        return results
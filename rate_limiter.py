@@ -0,0 +1,226 @@
+"""
+进程内全局调用限流
+对话补全(chat)和文生图(t2i)各有独立的预算：每秒请求数、并发请求数和每分钟token数。
+调用方按到达顺序排队，轮到时等待预算恢复，不再盲目sleep；收到429时整体暂停一段时间
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from config import Config
+
+_LIMITERS = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+class RateLimiter:
+    """先到先得的令牌桶限流器"""
+
+    def __init__(self, name: str, requests_per_second: float = 0, max_concurrent: int = 0, tokens_per_minute: int = 0):
+        """
+        Args:
+            name: 限流器名称
+            requests_per_second: 每秒请求数，0表示不限制
+            max_concurrent: 同时进行的请求数，0表示不限制
+            tokens_per_minute: 每分钟token数，0表示不限制
+        """
+        self.name = name
+        self.requests_per_second = requests_per_second
+        self.max_concurrent = max_concurrent
+        self.tokens_per_minute = tokens_per_minute
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._in_flight = 0
+        self._request_allowance = max(1.0, requests_per_second)
+        self._token_allowance = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+        self._stats = {'requests': 0, 'waited': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0,
+                       'tokens': 0, 'throttled': 0, 'timeouts': 0}
+
+    def acquire(self, tokens: int = 0, timeout: float = None) -> float:
+        """
+        排队等待一次调用的预算
+
+        Args:
+            tokens: 预计消耗的token数
+            timeout: 最长等待时间(秒)，None表示一直等待
+
+        Returns:
+            float: 实际等待的时间(秒)
+
+        Raises:
+            TimeoutError: 超过等待时间仍未轮到
+        """
+        ticket = object()
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = self._delay_for(tokens, now) if self._queue[0] is ticket else None
+                    if delay == 0:
+                        self._take(tokens)
+                        self._queue.popleft()
+                        self._cond.notify_all()
+                        break
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            self._stats['timeouts'] += 1
+                            raise TimeoutError(f"等待{self.name}调用额度超时")
+                        delay = remaining if delay is None else min(delay, remaining)
+                    self._cond.wait(delay)
+            except BaseException:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    self._cond.notify_all()
+                raise
+
+            waited = time.monotonic() - start
+            self._stats['requests'] += 1
+            self._stats['tokens'] += tokens
+            if waited > 0.01:
+                self._stats['waited'] += 1
+                self._stats['wait_seconds'] += waited
+                self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], waited)
+        return waited
+
+    def release(self, tokens: int = 0, actual_tokens: int = None):
+        """
+        调用结束，归还并发额度
+
+        Args:
+            tokens: acquire时预计的token数
+            actual_tokens: 实际消耗的token数，与预计不同时补扣或退还差额
+        """
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            if actual_tokens is not None and self.tokens_per_minute:
+                self._refill(time.monotonic())
+                self._token_allowance = min(
+                    float(self.tokens_per_minute), self._token_allowance - (actual_tokens - tokens)
+                )
+                self._stats['tokens'] += actual_tokens - tokens
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, tokens: int = 0, timeout: float = None):
+        """在with块内占用一次调用额度"""
+        self.acquire(tokens, timeout)
+        try:
+            yield
+        finally:
+            self.release(tokens)
+
+    def penalize(self, seconds: float):
+        """
+        服务端返回429时暂停发放额度
+
+        Args:
+            seconds: 暂停时间(秒)，通常取Retry-After
+        """
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._stats['throttled'] += 1
+            self._cond.notify_all()
+        print(f"🚦 {self.name}调用被限流，暂停{seconds:.1f}秒")
+
+    def stats(self) -> dict:
+        """限流统计"""
+        with self._cond:
+            self._refill(time.monotonic())
+            stats = dict(self._stats)
+            stats.update({
+                'name': self.name,
+                'requests_per_second': self.requests_per_second,
+                'max_concurrent': self.max_concurrent,
+                'tokens_per_minute': self.tokens_per_minute,
+                'in_flight': self._in_flight,
+                'queued': len(self._queue),
+                'paused_seconds': max(0.0, self._paused_until - time.monotonic())
+            })
+        return stats
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_second:
+            self._request_allowance = min(
+                max(1.0, self.requests_per_second), self._request_allowance + elapsed * self.requests_per_second
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                float(self.tokens_per_minute), self._token_allowance + elapsed * self.tokens_per_minute / 60
+            )
+
+    def _delay_for(self, tokens: int, now: float):
+        """
+        队首请求还需等待的时间
+
+        Returns:
+            0表示可以立即发出，None表示需要等其他请求结束
+        """
+        self._refill(now)
+        if self.max_concurrent and self._in_flight >= self.max_concurrent:
+            return None
+        delays = [self._paused_until - now]
+        if self.requests_per_second and self._request_allowance < 1:
+            delays.append((1 - self._request_allowance) / self.requests_per_second)
+        if self.tokens_per_minute:
+            # 超过整桶容量的请求等桶满后放行
+            needed = min(tokens, self.tokens_per_minute)
+            if self._token_allowance < needed:
+                delays.append((needed - self._token_allowance) * 60 / self.tokens_per_minute)
+        delay = max(delays)
+        return delay if delay > 0 else 0
+
+    def _take(self, tokens: int):
+        self._in_flight += 1
+        if self.requests_per_second:
+            self._request_allowance -= 1
+        if self.tokens_per_minute:
+            self._token_allowance -= tokens
+
+
+def get_limiter(kind: str) -> RateLimiter:
+    """
+    获取进程内共享的限流器
+
+    Args:
+        kind: chat（对话补全）或 t2i（文生图）
+    """
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(kind)
+        if limiter is None:
+            if kind == 'chat':
+                limiter = RateLimiter('chat', Config.CHAT_RATE_LIMIT_RPS, Config.CHAT_MAX_CONCURRENT,
+                                      Config.CHAT_TOKENS_PER_MINUTE)
+            elif kind == 't2i':
+                limiter = RateLimiter('t2i', Config.T2I_RATE_LIMIT_RPS, Config.T2I_MAX_CONCURRENT)
+            else:
+                raise ValueError(f"未知的限流类型: {kind}")
+            _LIMITERS[kind] = limiter
+        return limiter
+
+
+def retry_after_seconds(headers) -> float:
+    """从429响应的Retry-After头读取暂停时间，没有时使用默认值"""
+    try:
+        return max(0.0, float(headers.get('retry-after')))
+    except (TypeError, ValueError):
+        return Config.RATE_LIMIT_429_BACKOFF
+
+
+def get_rate_limit_stats() -> dict:
+    """获取所有限流器的统计"""
+    with _LIMITERS_LOCK:
+        limiters = list(_LIMITERS.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
@@ -0,0 +1,263 @@
+"""
+剧本校验与局部修复
+找出剧本中缺失或格式错误的部分（角色分章节剧本、DM指引、线索、图像提示词），
+只让DM补写这些片段并合并回原剧本，避免整本重新生成
+"""
+
+import json
+import os
+
+from config import Config
+
+# 剧本的固定字段，其余列表字段视为角色的分章节剧本
+SCRIPT_META_KEYS = ('title', 'theme', 'characters', 'dm', 'clues', 'clue_image_prompts', 'character_image_prompts')
+
+
+def _is_text(value) -> bool:
+    return isinstance(value, str) and bool(value.strip())
+
+
+def _is_text_list(value) -> bool:
+    return isinstance(value, list) and bool(value) and all(_is_text(item) for item in value)
+
+
+def expected_chapter_count(script: dict) -> int:
+    """
+    推断剧本的章节数
+
+    优先取角色分章节剧本的最大章节数，其次为线索的章节数，最后为DM指引数减去真相揭露
+    """
+    counts = [
+        len(script[name]) for name in script.get('characters', [])
+        if isinstance(script.get(name), list)
+    ]
+    if counts:
+        return max(counts)
+    if isinstance(script.get('clues'), list) and script['clues']:
+        return len(script['clues'])
+    if isinstance(script.get('dm'), list):
+        return max(len(script['dm']) - 1, 1)
+    return 0
+
+
+def find_script_problems(script: dict) -> list:
+    """
+    校验剧本，找出需要补写的片段
+
+    Args:
+        script: 剧本数据（可能是修复过的不完整JSON）
+
+    Returns:
+        list: 每个需要补写的片段一项 {'key': 剧本字段, 'reason': 原因, 'request': 补写要求}，
+              为空表示剧本完整
+    """
+    characters = script.get('characters')
+    if not _is_text_list(characters):
+        return [{'key': 'characters', 'reason': '角色列表缺失或格式错误', 'request': '"characters": ["角色1姓名", ...]'}]
+
+    problems = []
+    chapters = expected_chapter_count(script)
+
+    dm_script = script.get('dm')
+    if not isinstance(dm_script, list) or len(dm_script) < chapters or not all(_is_text(item) for item in dm_script):
+        problems.append({
+            'key': 'dm',
+            'reason': 'DM指引缺失或不完整',
+            'request': f'"dm": ["DM第1章指引", ..., "DM第{chapters}章指引", "真相揭露"]（共{chapters + 1}项）'
+        })
+
+    for name in characters:
+        chapter_list = script.get(name)
+        if isinstance(chapter_list, list) and len(chapter_list) >= chapters and all(_is_text(item) for item in chapter_list):
+            continue
+        problems.append({
+            'key': name,
+            'reason': f"角色「{name}」的分章节剧本缺失或不完整",
+            'request': f'"{name}": ["第1章剧本内容", ..., "第{chapters}章剧本内容"]（共{chapters}章，每章不少于500字）'
+        })
+
+    clues = script.get('clues')
+    if not isinstance(clues, list) or len(clues) < chapters or not all(_is_text_list(item) for item in clues):
+        problems.append({
+            'key': 'clues',
+            'reason': '线索缺失或不完整',
+            'request': f'"clues": [["第1章线索1", "第1章线索2"], ...]（共{chapters}章）'
+        })
+        clues = None
+
+    if clues is not None and not _clue_prompts_complete(script.get('clue_image_prompts'), clues):
+        counts = '、'.join(f"第{i + 1}章{len(chapter_clues)}条" for i, chapter_clues in enumerate(clues))
+        problems.append({
+            'key': 'clue_image_prompts',
+            'reason': '线索图像提示词缺失或与线索数量不一致',
+            'request': f'"clue_image_prompts": [["第1章线索1图像提示", ...], ...]（与clues逐条对应: {counts}）'
+        })
+
+    image_prompts = script.get('character_image_prompts')
+    image_prompts = image_prompts if isinstance(image_prompts, dict) else {}
+    missing_prompts = [name for name in characters if not _is_text(image_prompts.get(name))]
+    if missing_prompts:
+        problems.append({
+            'key': 'character_image_prompts',
+            'reason': f"缺少角色图像提示词: {missing_prompts}",
+            'request': '"character_image_prompts": {' + ', '.join(f'"{name}": "AI绘图提示词"' for name in missing_prompts) + '}',
+            'characters': missing_prompts
+        })
+
+    return problems
+
+
+def merge_script_fragments(script: dict, fragments: dict, problems: list) -> dict:
+    """
+    把补写的片段合并回剧本，原剧本中完好的条目保持不变
+
+    Args:
+        script: 原剧本（会被原地修改）
+        fragments: DM补写的片段 {剧本字段: 内容}
+        problems: find_script_problems的结果，只合并其中列出的字段
+
+    Returns:
+        dict: 合并后的剧本
+    """
+    for problem in problems:
+        key = problem['key']
+        fragment = fragments.get(key)
+        if fragment is None:
+            continue
+
+        existing = script.get(key)
+        if key == 'character_image_prompts' and isinstance(fragment, dict):
+            merged = dict(existing) if isinstance(existing, dict) else {}
+            for name in problem.get('characters', fragment.keys()):
+                if _is_text(fragment.get(name)):
+                    merged[name] = fragment[name]
+            script[key] = merged
+        elif key == 'clue_image_prompts' and isinstance(fragment, list):
+            clues = script.get('clues', [])
+            script[key] = _merge_list(
+                existing, fragment,
+                lambda i, item: _is_text_list(item) and i < len(clues) and len(item) >= len(clues[i])
+            )
+        elif key == 'clues' and isinstance(fragment, list):
+            script[key] = _merge_list(existing, fragment, lambda i, item: _is_text_list(item))
+        elif key == 'characters' and _is_text_list(fragment):
+            script[key] = fragment
+        elif isinstance(fragment, list):
+            # DM指引和角色分章节剧本
+            script[key] = _merge_list(existing, fragment, lambda i, item: _is_text(item))
+    return script
+
+
+def repair_script(script: dict, dm_agent, max_rounds: int = None):
+    """
+    校验剧本并只补写缺失的片段
+
+    Args:
+        script: 剧本数据
+        dm_agent: 用于补写片段的DMAgent
+        max_rounds: 最多补写几轮，默认Config.SCRIPT_REPAIR_MAX_ROUNDS
+
+    Returns:
+        tuple: (剧本, 剩余问题列表)。角色列表无法确定时剧本为None，需要整本重新生成
+    """
+    if not isinstance(script, dict):
+        return None, []
+    if max_rounds is None:
+        max_rounds = Config.SCRIPT_REPAIR_MAX_ROUNDS
+
+    if not _is_text_list(script.get('characters')):
+        inferred = _infer_characters(script)
+        if inferred:
+            print(f"🔧 根据剧本内容推断角色列表: {inferred}")
+            script['characters'] = inferred
+
+    problems = find_script_problems(script)
+    for round_num in range(1, max_rounds + 1):
+        if not problems:
+            break
+        print(f"🔧 剧本第{round_num}轮局部修复: {[problem['reason'] for problem in problems]}")
+        fragments = dm_agent.gen_script_fragments(script, problems)
+        if not fragments:
+            break
+        merge_script_fragments(script, fragments, problems)
+        problems = find_script_problems(script)
+
+    if problems and problems[0]['key'] == 'characters':
+        print("❌ 无法确定剧本角色，剧本不可用")
+        return None, problems
+    if problems:
+        print(f"⚠️ 剧本仍有未修复的部分: {[problem['reason'] for problem in problems]}")
+    return script, problems
+
+
+def repair_script_file(script_file: str, dm_agent) -> bool:
+    """
+    补写已有游戏的script.json中缺失的片段并写回
+
+    会调用模型，只在创建游戏的后台任务中使用，加载游戏时不会执行。
+
+    Args:
+        script_file: script.json路径
+        dm_agent: 用于补写片段的DMAgent
+
+    Returns:
+        bool: 是否有修复并写回
+    """
+    if not os.path.exists(script_file):
+        return False
+    try:
+        with open(script_file, 'r', encoding='utf-8') as f:
+            script = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ 读取剧本失败，跳过修复: {e}")
+        return False
+
+    problems = find_script_problems(script)
+    if not problems:
+        return False
+    repaired, remaining = repair_script(script, dm_agent)
+    if not repaired or len(remaining) >= len(problems):
+        return False
+
+    tmp_file = script_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(repaired, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, script_file)
+    print(f"💾 已补写剧本缺失部分: {script_file}")
+    return True
+
+
+def _clue_prompts_complete(prompts, clues: list) -> bool:
+    """线索图像提示词是否与线索逐章对应"""
+    if not isinstance(prompts, list) or len(prompts) < len(clues):
+        return False
+    return all(
+        _is_text_list(prompts[i]) and len(prompts[i]) >= len(chapter_clues)
+        for i, chapter_clues in enumerate(clues)
+    )
+
+
+def _merge_list(existing, fragment: list, is_valid) -> list:
+    """逐项合并列表：原有的有效条目优先，其余取补写的内容"""
+    if not isinstance(existing, list):
+        return fragment
+    merged = []
+    for i in range(max(len(existing), len(fragment))):
+        if i < len(existing) and is_valid(i, existing[i]):
+            merged.append(existing[i])
+        elif i < len(fragment):
+            merged.append(fragment[i])
+        else:
+            merged.append(existing[i])
+    return merged
+
+
+def _infer_characters(script: dict) -> list:
+    """角色列表缺失时，从角色图像提示词或分章节剧本字段推断"""
+    image_prompts = script.get('character_image_prompts')
+    if isinstance(image_prompts, dict) and image_prompts:
+        return list(image_prompts.keys())
+    return [
+        key for key, value in script.items()
+        if key not in SCRIPT_META_KEYS and _is_text_list(value)
+    ]
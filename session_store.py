@@ -0,0 +1,721 @@
+"""
+游戏会话持久化存储
+提供内存、SQLite和Redis三种后端，会话状态以压缩JSON保存，
+多个工作进程可以通过共享的SQLite/Redis后端服务同一局游戏
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+
+def encode_state(state: dict) -> bytes:
+    """将会话状态编码为紧凑的压缩JSON"""
+    raw = json.dumps(state, ensure_ascii=False, separators=(',', ':'), default=str)
+    return zlib.compress(raw.encode('utf-8'))
+
+
+def decode_state(data: bytes) -> dict:
+    """解码压缩JSON会话状态"""
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+
+def estimate_size(obj, _seen=None) -> int:
+    """
+    估算对象占用的内存（字节）
+
+    递归统计dict/list/tuple/set及其元素，共享对象只计算一次。
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in obj)
+    return size
+
+
+class SessionConflictError(RuntimeError):
+    """会话已被其他进程修改（版本号不一致），本次写入被拒绝"""
+
+
+# 合并时单独处理的字段
+_MERGE_SPECIAL_KEYS = ('version', 'action_history', 'players', 'chat_history', 'chat_summary')
+
+
+def merge_session_states(base: dict, ours: dict, theirs: dict) -> dict:
+    """
+    保存冲突时把本进程的修改合并到其他进程保存的最新状态上
+
+    - 行动记录只追加：本地新增的记录接在最新记录之后（恢复时重新编号）
+    - 玩家按用户合并，本地新加入的玩家保留
+    - 旧版聊天记录文本只追加：本地新增的部分接在最新文本之后
+    - 聊天摘要使用最新状态，之后从行动记录增量同步
+    - 其余字段只有本地修改过时才覆盖最新状态
+
+    Args:
+        base: 本地修改前的状态
+        ours: 本地状态
+        theirs: 存储中的最新状态
+
+    Returns:
+        dict: 合并后的状态（版本号由调用方设置）
+    """
+    merged = dict(theirs)
+
+    base_actions = base.get('action_history') or []
+    new_actions = (ours.get('action_history') or [])[len(base_actions):]
+    merged['action_history'] = list(theirs.get('action_history') or []) + [dict(action) for action in new_actions]
+
+    players = {user_id: character for user_id, character in theirs.get('players') or []}
+    base_players = {user_id: character for user_id, character in base.get('players') or []}
+    for user_id, character in ours.get('players') or []:
+        if base_players.get(user_id) != character:
+            players[user_id] = character
+    merged['players'] = [[user_id, character] for user_id, character in players.items()]
+
+    base_history = base.get('chat_history') or ''
+    ours_history = ours.get('chat_history') or ''
+    if ours_history != base_history:
+        if ours_history.startswith(base_history):
+            merged['chat_history'] = (theirs.get('chat_history') or '') + ours_history[len(base_history):]
+        else:
+            merged['chat_history'] = ours_history
+
+    for key, value in ours.items():
+        if key not in _MERGE_SPECIAL_KEYS and value != base.get(key):
+            merged[key] = value
+    return merged
+
+
+class SessionStore:
+    """
+    会话存储基类，键为字符串，值为可JSON序列化的字典
+
+    每个键附带版本号（状态中的version字段），put_raw_if_version按版本号条件写入，
+    用于多个进程同时修改同一局游戏时检测冲突。
+    """
+
+    name = 'base'
+
+    def get(self, key: str):
+        """读取状态，不存在返回None"""
+        data = self.get_raw(key)
+        return decode_state(data) if data is not None else None
+
+    def put(self, key: str, state: dict):
+        """写入状态（不检查版本号）"""
+        self.put_raw(key, encode_state(state), state.get('version', 0))
+
+    def get_raw(self, key: str):
+        raise NotImplementedError
+
+    def put_raw(self, key: str, data: bytes, version: int = 0):
+        raise NotImplementedError
+
+    def put_raw_if_version(self, key: str, data: bytes, version: int, expected_version: int) -> bool:
+        """
+        存储中的版本号等于expected_version（不存在视为0）时写入
+
+        Args:
+            key: 键
+            data: 编码后的状态
+            version: 写入后的版本号
+            expected_version: 写入前应有的版本号
+
+        Returns:
+            bool: 是否写入成功，False表示已被其他进程修改或删除
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def keys(self, prefix: str = '') -> list:
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """进程内存储（单进程部署，重启后丢失）"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._data = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get_raw(self, key: str):
+        with self._lock:
+            return self._data.get(key)
+
+    def put_raw(self, key: str, data: bytes, version: int = 0):
+        with self._lock:
+            self._data[key] = data
+            self._versions[key] = version
+
+    def put_raw_if_version(self, key: str, data: bytes, version: int, expected_version: int) -> bool:
+        with self._lock:
+            if self._versions.get(key, 0) != expected_version:
+                return False
+            self._data[key] = data
+            self._versions[key] = version
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+            self._versions.pop(key, None)
+
+    def keys(self, prefix: str = '') -> list:
+        with self._lock:
+            return [key for key in self._data if key.startswith(prefix)]
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite存储（同一台机器上的多个工作进程共享，重启后可恢复）"""
+
+    name = 'sqlite'
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS game_sessions ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, updated_at REAL NOT NULL, '
+            'version INTEGER NOT NULL DEFAULT 0)'
+        )
+        self._migrate(conn)
+        conn.commit()
+
+    @staticmethod
+    def _migrate(conn):
+        """旧数据库补充版本号列，并从已保存的状态中回填"""
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(game_sessions)')]
+        if 'version' in columns:
+            return
+        conn.execute('ALTER TABLE game_sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+        for key, value in conn.execute('SELECT key, value FROM game_sessions').fetchall():
+            try:
+                version = decode_state(value).get('version', 0)
+            except Exception:
+                continue
+            conn.execute('UPDATE game_sessions SET version = ? WHERE key = ?', (version, key))
+
+    def _connect(self):
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get_raw(self, key: str):
+        row = self._connect().execute(
+            'SELECT value FROM game_sessions WHERE key = ?', (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_raw(self, key: str, data: bytes, version: int = 0):
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO game_sessions (key, value, updated_at, version) VALUES (?, ?, ?, ?)',
+            (key, sqlite3.Binary(data), time.time(), version)
+        )
+        conn.commit()
+
+    def put_raw_if_version(self, key: str, data: bytes, version: int, expected_version: int) -> bool:
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                'UPDATE game_sessions SET value = ?, updated_at = ?, version = ? WHERE key = ? AND version = ?',
+                (sqlite3.Binary(data), time.time(), version, key, expected_version)
+            )
+            if cursor.rowcount == 0 and expected_version == 0:
+                # 首次保存：只有其他进程没有抢先创建时才插入
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO game_sessions (key, value, updated_at, version) VALUES (?, ?, ?, ?)',
+                    (key, sqlite3.Binary(data), time.time(), version)
+                )
+        return cursor.rowcount == 1
+
+    def delete(self, key: str):
+        conn = self._connect()
+        conn.execute('DELETE FROM game_sessions WHERE key = ?', (key,))
+        conn.commit()
+
+    def keys(self, prefix: str = '') -> list:
+        rows = self._connect().execute(
+            'SELECT key FROM game_sessions WHERE key LIKE ?', (prefix + '%',)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+
+class RedisSessionStore(SessionStore):
+    """Redis存储（多台机器共享，需要安装redis包）"""
+
+    name = 'redis'
+
+    def __init__(self, url: str, prefix: str = 'murdergame:'):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("使用Redis会话存储需要安装redis包: pip install redis")
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._watch_error = redis.WatchError
+
+    def get_raw(self, key: str):
+        return self._redis.get(self._prefix + key)
+
+    def put_raw(self, key: str, data: bytes, version: int = 0):
+        self._redis.set(self._prefix + key, data)
+
+    def put_raw_if_version(self, key: str, data: bytes, version: int, expected_version: int) -> bool:
+        full_key = self._prefix + key
+        with self._redis.pipeline() as pipe:
+            try:
+                # WATCH之后键被其他客户端修改时EXEC失败
+                pipe.watch(full_key)
+                current = pipe.get(full_key)
+                current_version = decode_state(current).get('version', 0) if current is not None else 0
+                if current_version != expected_version:
+                    pipe.unwatch()
+                    return False
+                pipe.multi()
+                pipe.set(full_key, data)
+                pipe.execute()
+                return True
+            except self._watch_error:
+                return False
+
+    def delete(self, key: str):
+        self._redis.delete(self._prefix + key)
+
+    def keys(self, prefix: str = '') -> list:
+        offset = len(self._prefix)
+        return [
+            key.decode('utf-8')[offset:]
+            for key in self._redis.scan_iter(match=self._prefix + prefix + '*')
+        ]
+
+
+def create_session_store(backend: str = 'memory', db_path: str = None, redis_url: str = None) -> SessionStore:
+    """
+    根据配置创建会话存储
+
+    Args:
+        backend: memory / sqlite / redis
+        db_path: SQLite数据库文件路径
+        redis_url: Redis连接地址
+
+    Returns:
+        SessionStore: 会话存储实例
+    """
+    backend = (backend or 'memory').lower()
+    if backend == 'sqlite':
+        return SQLiteSessionStore(db_path or 'game_sessions.db')
+    if backend == 'redis':
+        return RedisSessionStore(redis_url or 'redis://localhost:6379/0')
+    if backend != 'memory':
+        print(f"⚠️ 未知的会话存储后端: {backend}，使用内存存储")
+    return MemorySessionStore()
+
+
+class SessionRegistry:
+    """
+    活跃游戏会话表（兼容dict的用法）
+
+    本地缓存GameSession对象，状态写入SessionStore。本地没有的会话从存储中恢复；
+    共享后端下如果存储中的版本比本地新（其他进程修改过），则刷新本地状态。
+
+    本地缓存按空闲时间(TTL)和数量上限(LRU)淘汰。内存后端的淘汰会话快照写入磁盘，
+    再次访问时从快照恢复；SQLite/Redis后端已经保存了状态，直接从存储恢复。
+    """
+
+    # 保存冲突时合并后重试的次数
+    MAX_MERGE_RETRIES = 3
+
+    def __init__(self, store: SessionStore, restore_fn, merge_fn=None):
+        """
+        Args:
+            store: 会话存储
+            restore_fn: 根据状态字典恢复会话对象的函数，可以接收已有会话对象进行原地刷新
+            merge_fn: 保存冲突时合并状态的函数 merge_fn(base, ours, theirs) -> 合并后的状态，
+                      base为本地修改前的状态，ours为本地状态，theirs为存储中的最新状态；
+                      为None时冲突直接抛出SessionConflictError
+        """
+        self.store = store
+        self._restore = restore_fn
+        self._merge = merge_fn
+        self.conflict_count = 0
+        self._sessions = {}
+        self._raw = {}  # session_id -> 本地会话对应的已编码状态（判断存储中的状态是否变化）
+        self._last_activity = {}  # session_id -> 最近访问时间
+        self._lock = threading.RLock()
+
+        # 淘汰配置
+        self.ttl = None
+        self.max_sessions = None
+        self.snapshot_dir = None
+        self._can_evict = None
+        self._on_evict = None
+        self._sweeper = None
+        self.evicted_count = 0
+        self.restored_count = 0
+
+    def configure_eviction(self, ttl: float = None, max_sessions: int = None,
+                           snapshot_dir: str = None, can_evict=None, on_evict=None):
+        """
+        配置会话淘汰策略
+
+        Args:
+            ttl: 空闲超过该秒数的会话被淘汰，None或0表示不按时间淘汰
+            max_sessions: 本地缓存的会话数上限，超出时淘汰最久未访问的会话
+            snapshot_dir: 淘汰会话的快照目录，None表示不写快照
+            can_evict: 判断会话是否允许淘汰的函数（例如仍在创建中的会话不能淘汰）
+            on_evict: 会话淘汰后的回调，接收会话ID（清理其他按会话保存的内存状态）
+        """
+        self.ttl = ttl or None
+        self.max_sessions = max_sessions or None
+        self.snapshot_dir = snapshot_dir
+        self._can_evict = can_evict
+        self._on_evict = on_evict
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+
+    def start_sweeper(self, interval: float):
+        """启动后台线程定期淘汰空闲会话"""
+        if self._sweeper is not None or not interval or interval <= 0:
+            return
+
+        def sweep():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.evict()
+                except Exception as e:
+                    print(f"⚠️ 会话淘汰失败: {e}")
+
+        self._sweeper = threading.Thread(target=sweep, name='session-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def _touch(self, session_id: str):
+        self._last_activity[session_id] = time.time()
+
+    def last_activity(self, session_id: str):
+        """获取会话最近访问时间，不在本地缓存返回None"""
+        return self._last_activity.get(session_id)
+
+    def local_sessions(self) -> list:
+        """本地缓存中的会话对象"""
+        with self._lock:
+            return list(self._sessions.values())
+
+    def _snapshot_path(self, session_id: str) -> str:
+        return os.path.join(self.snapshot_dir, f"{session_id}.session")
+
+    def snapshot_ids(self) -> list:
+        """磁盘上已淘汰会话的ID列表"""
+        if not self.snapshot_dir or not os.path.exists(self.snapshot_dir):
+            return []
+        return [name[:-len('.session')] for name in os.listdir(self.snapshot_dir) if name.endswith('.session')]
+
+    def _write_snapshot(self, session):
+        """原子写入会话快照"""
+        path = self._snapshot_path(session.session_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(encode_state(session.to_state()))
+        os.replace(tmp_path, path)
+
+    def _read_snapshot(self, session_id: str):
+        """读取并移除会话快照，不存在返回None"""
+        if not self.snapshot_dir:
+            return None
+        path = self._snapshot_path(session_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                state = decode_state(f.read())
+        except Exception as e:
+            print(f"⚠️ 读取会话快照失败: {session_id} - {e}")
+            return None
+        self.store.put(self._key(session_id), state)
+        os.remove(path)
+        self.restored_count += 1
+        print(f"♻️ 从快照恢复会话: {session_id}")
+        return state
+
+    def _needs_snapshot(self, session) -> bool:
+        """只有状态不在持久化存储中时才写快照（内存后端，或从未保存过的会话）"""
+        return bool(self.snapshot_dir) and (self.store.name == 'memory' or session.version == 0)
+
+    def _evict_one(self, session_id: str, reason: str):
+        """淘汰一个本地会话：必要时写快照，然后释放内存"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return
+        if self._needs_snapshot(session):
+            try:
+                self._write_snapshot(session)
+            except Exception as e:
+                print(f"⚠️ 写入会话快照失败，保留会话: {session_id} - {e}")
+                return
+        del self._sessions[session_id]
+        self._raw.pop(session_id, None)
+        self._last_activity.pop(session_id, None)
+        # 内存后端的状态也在进程内，快照写入后一并释放
+        if self.store.name == 'memory' and self.snapshot_dir:
+            self.store.delete(self._key(session_id))
+        self.evicted_count += 1
+        if self._on_evict:
+            try:
+                self._on_evict(session_id)
+            except Exception as e:
+                print(f"⚠️ 会话淘汰回调失败: {session_id} - {e}")
+        print(f"🧹 淘汰游戏会话: {session_id} ({reason})")
+
+    def evict(self, now: float = None) -> list:
+        """
+        按TTL和数量上限淘汰本地会话
+
+        Returns:
+            list: 被淘汰的会话ID
+        """
+        now = now or time.time()
+        evicted = []
+        with self._lock:
+            candidates = [
+                sid for sid, session in self._sessions.items()
+                if not self._can_evict or self._can_evict(session)
+            ]
+            candidates.sort(key=lambda sid: self._last_activity.get(sid, 0))
+
+            if self.ttl:
+                for sid in list(candidates):
+                    if now - self._last_activity.get(sid, 0) > self.ttl:
+                        self._evict_one(sid, '空闲超时')
+                        candidates.remove(sid)
+                        evicted.append(sid)
+
+            if self.max_sessions:
+                while len(self._sessions) > self.max_sessions and candidates:
+                    sid = candidates.pop(0)
+                    self._evict_one(sid, '超出数量上限')
+                    evicted.append(sid)
+        return evicted
+
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return f"session:{session_id}"
+
+    def _load(self, session_id: str, touch: bool = True, restore: bool = True):
+        """
+        获取最新的会话对象，不存在返回None
+
+        存储中的状态与本地上次读写的字节相同时不再解码；解码和恢复会话
+        （从磁盘加载游戏实例）在锁外进行，不阻塞其他会话的访问。
+
+        Args:
+            session_id: 会话ID
+            touch: 是否更新最近访问时间
+            restore: 本地没有时是否从存储或快照恢复
+        """
+        key = self._key(session_id)
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None and not restore:
+                return None
+            if session is not None and self.store.name == 'memory':
+                if touch:
+                    self._touch(session_id)
+                return session
+            seen = self._raw.get(session_id)
+
+        data = self.store.get_raw(key)
+        if session is not None and data is not None and data == seen:
+            if touch:
+                with self._lock:
+                    self._touch(session_id)
+            return session
+
+        state = decode_state(data) if data is not None else None
+        if state is None and session is None:
+            with self._lock:
+                state = self._read_snapshot(session_id)
+        if state is None:
+            with self._lock:
+                if session is not None and session.version > 0:
+                    # 已持久化过的会话被其他进程删除
+                    if self._sessions.get(session_id) is session:
+                        del self._sessions[session_id]
+                        self._raw.pop(session_id, None)
+                    return None
+                # 仍在创建中的会话尚未写入存储
+                return session
+
+        if session is None:
+            session = self._restore(state, None)
+        elif state.get('version', 0) > session.version:
+            self._restore(state, session)
+
+        with self._lock:
+            current = self._sessions.get(session_id)
+            if current is not None and current is not session and current.version >= session.version:
+                # 其他线程已经恢复或保存了同样新的会话
+                session = current
+            else:
+                self._sessions[session_id] = session
+                if data is not None:
+                    self._raw[session_id] = data
+            if touch:
+                self._touch(session_id)
+            return session
+
+    def peek(self, session_id: str):
+        """
+        只读获取本地缓存中的会话（共享后端下刷新为最新状态）
+
+        不更新访问时间，也不从存储或快照恢复已淘汰的会话，
+        供事件流等长连接轮询使用，不会让会话一直保持活跃。
+
+        Returns:
+            GameSession: 会话对象，不在本地缓存或已被删除时返回None
+        """
+        return self._load(session_id, touch=False, restore=False)
+
+    def save(self, session):
+        """
+        将会话状态写入存储
+
+        存储中的版本号与本地不一致时（其他进程已修改）不覆盖：用merge_fn把本地修改
+        合并到存储中的最新状态上，原地刷新会话后重试，最多MAX_MERGE_RETRIES次。
+
+        Raises:
+            SessionConflictError: 无法合并（会话已被删除、没有merge_fn或重试次数用完），
+                                  本地修改未保存，下次读取时刷新为存储中的状态
+        """
+        session_id = session.session_id
+        key = self._key(session_id)
+        with self._lock:
+            for attempt in range(self.MAX_MERGE_RETRIES + 1):
+                expected_version = session.version
+                session.version += 1
+                state = session.to_state()
+                data = encode_state(state)
+                if self.store.put_raw_if_version(key, data, session.version, expected_version):
+                    self._sessions[session_id] = session
+                    self._raw[session_id] = data
+                    self._touch(session_id)
+                    return
+                session.version = expected_version
+                self.conflict_count += 1
+
+                latest = self.store.get_raw(key)
+                base = self._raw.get(session_id)
+                if self._merge is None or latest is None or base is None or attempt == self.MAX_MERGE_RETRIES:
+                    break
+                # 以存储中的最新状态为基础重新应用本地修改
+                theirs = decode_state(latest)
+                merged = self._merge(decode_state(base), dict(state, version=expected_version), theirs)
+                merged['version'] = theirs.get('version', 0)
+                self._restore(merged, session)
+                self._raw[session_id] = latest
+                print(f"🔀 会话保存冲突，已合并其他进程的修改后重试: {session_id}")
+
+            self._raw.pop(session_id, None)
+            raise SessionConflictError(f"会话已被其他进程修改: {session_id}")
+
+    def __contains__(self, session_id) -> bool:
+        return self._load(session_id) is not None
+
+    def __getitem__(self, session_id):
+        session = self._load(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+
+    def __setitem__(self, session_id, session):
+        with self._lock:
+            self._sessions[session_id] = session
+            self._touch(session_id)
+            if self.max_sessions and len(self._sessions) > self.max_sessions:
+                self.evict()
+
+    def __delitem__(self, session_id):
+        if self.pop(session_id, None) is None:
+            raise KeyError(session_id)
+
+    def get(self, session_id, default=None):
+        session = self._load(session_id)
+        return session if session is not None else default
+
+    def pop(self, session_id, default=None):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            self._raw.pop(session_id, None)
+            self._last_activity.pop(session_id, None)
+            self.store.delete(self._key(session_id))
+            if self.snapshot_dir and os.path.exists(self._snapshot_path(session_id)):
+                os.remove(self._snapshot_path(session_id))
+            return session if session is not None else default
+
+    def keys(self) -> list:
+        with self._lock:
+            stored = [key[len('session:'):] for key in self.store.keys('session:')]
+            return list(dict.fromkeys(list(self._sessions) + stored))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def values(self) -> list:
+        return [session for session in (self.get(sid) for sid in self.keys()) if session is not None]
+
+    def items(self) -> list:
+        return [(session.session_id, session) for session in self.values()]
+
+
+class PlayerSessionMap:
+    """用户ID -> 游戏会话ID的映射（兼容dict的用法）"""
+
+    def __init__(self, store: SessionStore):
+        self.store = store
+
+    @staticmethod
+    def _key(user_id) -> str:
+        return f"player:{user_id}"
+
+    def __contains__(self, user_id) -> bool:
+        return self.store.get_raw(self._key(user_id)) is not None
+
+    def __getitem__(self, user_id):
+        state = self.store.get(self._key(user_id))
+        if state is None:
+            raise KeyError(user_id)
+        return state['session_id']
+
+    def __setitem__(self, user_id, session_id):
+        self.store.put(self._key(user_id), {'session_id': session_id})
+
+    def __delitem__(self, user_id):
+        self.store.delete(self._key(user_id))
+
+    def get(self, user_id, default=None):
+        state = self.store.get(self._key(user_id))
+        return state['session_id'] if state else default
@@ -0,0 +1,141 @@
+"""
+相同请求合并（single-flight）
+同一个key的并发请求只执行一次，其余请求等待并共享结果；
+成功的结果在短时间内保留，稍晚到达的重复请求直接从内存返回
+"""
+
+import threading
+import time
+
+
+class FlightCall:
+    """一次正在执行或已完成的调用"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        self.waiters = 0
+
+    def wait(self, timeout: float = None):
+        """
+        等待调用完成并返回结果
+
+        Args:
+            timeout: 最长等待时间(秒)，None表示一直等待
+
+        Returns:
+            调用结果，执行方抛出的异常会在这里重新抛出
+        """
+        if not self.event.wait(timeout):
+            raise TimeoutError("等待相同请求的结果超时")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """按key合并并发的相同请求"""
+
+    def __init__(self, ttl: float = 30):
+        """
+        Args:
+            ttl: 成功结果的保留时间(秒)，0表示只合并同时进行的请求
+        """
+        self.ttl = ttl
+        self._calls = {}  # key -> FlightCall
+        self._lock = threading.Lock()
+        self.executed_count = 0
+        self.shared_count = 0
+
+    def begin(self, key):
+        """
+        登记一次请求
+
+        Returns:
+            tuple: (FlightCall, 是否由本请求执行)。不是执行方时调用call.wait()获取结果
+        """
+        with self._lock:
+            self._purge(time.time())
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared_count += 1
+                return call, False
+            call = FlightCall()
+            self._calls[key] = call
+            self.executed_count += 1
+            return call, True
+
+    def finish(self, key, call: FlightCall, result=None, error: Exception = None, keep: bool = True):
+        """
+        执行方完成调用，唤醒所有等待者
+
+        Args:
+            key: 请求key
+            call: begin返回的FlightCall
+            result: 调用结果
+            error: 调用失败时的异常
+            keep: 是否在ttl内保留结果（失败的结果不应保留）
+        """
+        call.result = result
+        call.error = error
+        call.finished_at = time.time()
+        call.event.set()
+        if error is not None or not keep or self.ttl <= 0:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+    def do(self, key, fn, keep_if=None, timeout: float = None):
+        """
+        执行fn，相同key的并发请求共享同一次执行
+
+        Args:
+            key: 请求key
+            fn: 无参数的执行函数
+            keep_if: 判断结果是否保留的函数，默认保留所有成功返回的结果
+            timeout: 等待方的最长等待时间(秒)
+
+        Returns:
+            tuple: (结果, 是否为共享结果)
+        """
+        call, leader = self.begin(key)
+        if not leader:
+            return call.wait(timeout), True
+
+        try:
+            result = fn()
+        except Exception as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result, keep=keep_if(result) if keep_if else True)
+        return result, False
+
+    def forget(self, key):
+        """丢弃已保留的结果（正在执行的调用不受影响）"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.event.is_set():
+                del self._calls[key]
+
+    def stats(self) -> dict:
+        """合并统计"""
+        with self._lock:
+            in_flight = sum(1 for call in self._calls.values() if not call.event.is_set())
+            return {
+                'executed': self.executed_count,
+                'shared': self.shared_count,
+                'in_flight': in_flight,
+                'cached': len(self._calls) - in_flight
+            }
+
+    def _purge(self, now: float):
+        """清理超过保留时间的结果"""
+        expired = [
+            key for key, call in self._calls.items()
+            if call.finished_at is not None and now - call.finished_at >= self.ttl
+        ]
+        for key in expired:
+            del self._calls[key]
@@ -0,0 +1,257 @@
+"""
+结构化输出解析
+统一处理Agent的JSON输出：端点支持时启用JSON输出模式，按声明的结构校验，
+本地修复不完整的JSON（未闭合的字符串/括号、多余的逗号等），并统计解析失败率
+"""
+
+import json
+import threading
+
+from openai import BadRequestError
+
+from config import Config
+
+# 解析统计: 调用来源 -> 各结果的次数
+_PARSE_STATS = {}
+_PARSE_STATS_LOCK = threading.Lock()
+
+# 不支持response_format的端点（base_url）
+_JSON_MODE_UNSUPPORTED = set()
+
+_TYPE_CHECKS = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, list),
+    'string': lambda value: isinstance(value, str),
+    'integer': lambda value: isinstance(value, int) and not isinstance(value, bool),
+    'number': lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    'boolean': lambda value: isinstance(value, bool),
+}
+
+
+class ParsedOutput:
+    """一次解析的结果"""
+
+    def __init__(self, data=None, status: str = 'failed', errors: list = None, raw: str = ""):
+        """
+        Args:
+            data: 解析出的数据，无法解析时为None
+            status: parsed（直接解析）、repaired（修复后解析）、invalid（不符合结构）、failed（无法解析）
+            errors: 解析或结构校验的错误信息
+            raw: 原始文本
+        """
+        self.data = data
+        self.status = status
+        self.errors = errors or []
+        self.raw = raw
+
+    @property
+    def ok(self) -> bool:
+        """是否解析成功且符合结构"""
+        return self.status in ('parsed', 'repaired')
+
+
+def json_completion(client, **kwargs):
+    """
+    调用chat.completions.create，端点支持时要求返回JSON对象
+
+    端点不接受response_format时记住该端点，之后直接以普通模式调用。
+    提示词中需要包含"JSON"字样（部分端点的要求）。
+    """
+    base_url = str(getattr(client, 'base_url', ''))
+    if Config.LLM_JSON_MODE and base_url not in _JSON_MODE_UNSUPPORTED:
+        try:
+            return client.chat.completions.create(response_format={'type': 'json_object'}, **kwargs)
+        except BadRequestError as e:
+            if 'response_format' not in str(e) and 'json' not in str(e).lower():
+                raise
+            print(f"⚠️ 端点不支持JSON输出模式，改用普通模式: {e}")
+            _JSON_MODE_UNSUPPORTED.add(base_url)
+    return client.chat.completions.create(**kwargs)
+
+
+def parse_json_output(text: str, schema: dict = None, source: str = 'default') -> ParsedOutput:
+    """
+    解析模型输出的JSON
+
+    Args:
+        text: 模型输出（可能带markdown代码块、前后说明文字或被截断）
+        schema: 期望的结构（见validate_schema），为空时不校验
+        source: 调用来源，用于统计
+
+    Returns:
+        ParsedOutput: 解析结果
+    """
+    raw = text or ""
+    candidate = extract_json_text(raw)
+    status = 'parsed'
+    errors = []
+
+    try:
+        data = json.loads(candidate, strict=False)
+    except json.JSONDecodeError as e:
+        errors.append(f"JSON解析失败: {e}")
+        data = _loads_repaired(candidate)
+        status = 'repaired' if data is not None else 'failed'
+
+    if data is not None and schema:
+        schema_errors = validate_schema(data, schema)
+        if schema_errors:
+            errors.extend(schema_errors)
+            status = 'invalid'
+
+    _record_parse(source, status)
+    if status != 'parsed':
+        print(f"⚠️ {source} 输出解析结果: {status} {errors[-1] if errors else ''}")
+    return ParsedOutput(data, status, errors, raw)
+
+
+def extract_json_text(text: str) -> str:
+    """去掉markdown代码块和前后的说明文字，保留JSON部分"""
+    text = (text or "").strip()
+    if text.startswith("```"):
+        first_line_end = text.find("\n")
+        text = text[first_line_end + 1:] if first_line_end != -1 else text[3:]
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+        text = text.strip()
+
+    starts = [index for index in (text.find('{'), text.find('[')) if index != -1]
+    if not starts:
+        return text
+    start = min(starts)
+    closer = '}' if text[start] == '{' else ']'
+    end = text.rfind(closer)
+    # 结尾之后只有说明文字时去掉；被截断的输出保留全部内容交给修复
+    if end > start and '"' not in text[end + 1:]:
+        return text[start:end + 1]
+    return text[start:]
+
+
+def repair_json(text: str) -> str:
+    """
+    修复不完整的JSON文本
+
+    处理多余的逗号、未闭合的字符串和括号，以及截断在键或冒号处的结尾。
+    """
+    out = []
+    stack = []
+    in_string = False
+    escaped = False
+
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+            out.append(ch)
+        elif ch in '}]':
+            if not stack:
+                continue
+            _strip_trailing(out, ',')
+            stack.pop()
+            out.append(ch)
+        else:
+            out.append(ch)
+
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+
+    _strip_trailing(out, ',')
+    if out and out[-1] == ':':
+        out.append('null')
+    for closer in reversed(stack):
+        _strip_trailing(out, ',')
+        out.append(closer)
+    return ''.join(out)
+
+
+def validate_schema(data, schema: dict, path: str = '$') -> list:
+    """
+    按声明的结构校验数据
+
+    支持的字段: type、properties、required、items、additionalProperties（字典值的结构）。
+
+    Returns:
+        list: 错误信息，为空表示符合结构
+    """
+    errors = []
+    expected = schema.get('type')
+    if expected and not _TYPE_CHECKS[expected](data):
+        return [f"{path} 应为{expected}，实际为{type(data).__name__}"]
+
+    if isinstance(data, dict):
+        for key in schema.get('required', []):
+            if key not in data:
+                errors.append(f"{path} 缺少字段 {key}")
+        properties = schema.get('properties', {})
+        extra_schema = schema.get('additionalProperties')
+        for key, value in data.items():
+            if key in properties:
+                errors.extend(validate_schema(value, properties[key], f"{path}.{key}"))
+            elif isinstance(extra_schema, dict):
+                errors.extend(validate_schema(value, extra_schema, f"{path}.{key}"))
+    elif isinstance(data, list) and 'items' in schema:
+        for index, item in enumerate(data):
+            errors.extend(validate_schema(item, schema['items'], f"{path}[{index}]"))
+    return errors
+
+
+def get_parse_stats() -> dict:
+    """
+    获取各调用来源的解析统计
+
+    Returns:
+        dict: 调用来源 -> 各结果次数、修复率和失败率
+    """
+    with _PARSE_STATS_LOCK:
+        snapshot = {source: dict(stats) for source, stats in _PARSE_STATS.items()}
+    for stats in snapshot.values():
+        total = stats['total']
+        stats['repair_rate'] = stats['repaired'] / total if total else 0
+        stats['failure_rate'] = (stats['failed'] + stats['invalid']) / total if total else 0
+    return snapshot
+
+
+def _record_parse(source: str, status: str):
+    with _PARSE_STATS_LOCK:
+        stats = _PARSE_STATS.setdefault(
+            source, {'total': 0, 'parsed': 0, 'repaired': 0, 'invalid': 0, 'failed': 0}
+        )
+        stats['total'] += 1
+        stats[status] += 1
+
+
+def _strip_trailing(out: list, char: str):
+    """去掉末尾的空白和指定字符（如多余的逗号）"""
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == char:
+        out.pop()
+        while out and out[-1].isspace():
+            out.pop()
+
+
+def _loads_repaired(text: str):
+    """修复后解析；截断在键的中间时逐步回退到上一个逗号"""
+    candidate = text
+    for _ in range(20):
+        try:
+            return json.loads(repair_json(candidate), strict=False)
+        except json.JSONDecodeError:
+            cut = candidate.rfind(',')
+            if cut <= 0:
+                return None
+            candidate = candidate[:cut]
+    return None
@@ -12,6 +12,16 @@ class GameFlowController {
         this.currentScript = null;
         this.progressChecker = null;
         
+        // 会话事件流（SSE），连接可用时暂停轮询
+        this.eventSource = null;
+        this.eventSourceSession = null;
+        this.eventStreamActive = false;
+        this.eventCursor = 0;
+        
+        // 同一条行动可能由本地请求结果和事件流各送达一次，先到的一方负责显示
+        this.actionRenderClaims = new Map();
+        this.localDMSpeechPending = 0;
+        
         // 游戏配置 (从config.py加载)
         this.config = {
             playerSpeakTime: 180,    // 玩家发言阶段时间(秒)
@@ -200,7 +210,7 @@ class GameFlowController {
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
                     generate_images: generateImages,
-                    wait_for_completion: true,
+                    async: true,
                     user_id: this.gameState.user.id
                 })
             });
@@ -209,15 +219,12 @@ class GameFlowController {
                 this.gameState.gameSession = data.data.game_session;
                 localStorage.setItem('currentGameSession', this.gameState.gameSession);
                 
-                this.updateStoryTitle(data.data.story_title);
-                
-                if (generateImages) {
-                    this.startProgressMonitoring(data.data.game_session);
-                } else {
-                    // 隐藏加载动画，显示角色选择
-                    document.getElementById('characterLoadingSpinner').style.display = 'none';
-                    this.showCharacterSelection(data.data.characters);
+                if (data.data.story_title) {
+                    this.updateStoryTitle(data.data.story_title);
                 }
+                
+                // 游戏在后台创建，轮询进度直到完成
+                this.startProgressMonitoring(data.data.game_session);
             } else {
                 // 加载失败，返回欢迎界面
                 document.getElementById('characterSelection').style.display = 'none';
@@ -401,7 +408,8 @@ class GameFlowController {
              if (char.image) {
                  // 确保图片路径正确
                  const imagePath = char.image.startsWith('/') ? char.image : `/${char.image}`;
-                 avatarHtml = `<img src="${imagePath}" class="character-avatar-small" alt="${char.name}" 
+                 // 小头像使用预先生成的缩略图（未生成时服务端返回原图）
+                 avatarHtml = `<img src="${imagePath}?variant=thumb" class="character-avatar-small" alt="${char.name}" 
                               onerror="this.style.display='none'; this.nextElementSibling.style.display='flex';">
                               <div class="character-avatar-placeholder" style="display:none;">${this.getCharacterEmoji(char.name)}</div>`;
              } else {
@@ -695,11 +703,13 @@ class GameFlowController {
                          
                          const data = await response.json();
                          if (data.status === 'success') {
-                             this.addPlayerMessage(
-                                 questionData.targetPlayer, 
-                                 `回答 ${questionData.asker} 的问题：${data.data.answer}`, 
-                                 'response'
-                             );
+                             if (this.claimActionRender(this.actionRenderKey('answer', questionData.targetPlayer, data.data.answer))) {
+                                 this.addPlayerMessage(
+                                     questionData.targetPlayer, 
+                                     `回答 ${questionData.asker} 的问题：${data.data.answer}`, 
+                                     'response'
+                                 );
+                             }
                              console.log(`✅ 【AI回复】${questionData.targetPlayer} 回复完成`);
                          } else {
                              this.addPlayerMessage(
@@ -855,6 +865,10 @@ class GameFlowController {
                  this.stopAnswerStatusMonitor();
                  return;
              }
+             // 事件流连接时由推送的回答触发检查
+             if (this.eventStreamActive) {
+                 return;
+             }
              
              await this.checkAnswerCompletion();
          }, 2000); // 每2秒检查一次
@@ -887,7 +901,7 @@ class GameFlowController {
              const currentChapter = this.gameState.currentChapter;
              
              for (const action of this.gameState.action_history) {
-                 if (action.type === 'answer' && 
+                 if ((action.type === 'answer' || action.action_type === 'answer') && 
                      action.cycle === currentCycle && 
                      action.chapter === currentChapter &&
                      action.character) {
@@ -1033,7 +1047,18 @@ class GameFlowController {
     
     async generateChapterSummary() {
         // 生成章节总结
+        this.localDMSpeechPending++;
         try {
+            const streamedSpeech = await this.streamDMSpeech({
+                game_session: this.gameState.gameSession,
+                chapter: this.gameState.currentChapter,
+                speak_type: 'chapter_end',
+                chat_history: this.getRecentChatHistory()
+            });
+            if (streamedSpeech) {
+                return;
+            }
+            
             const response = await fetch('/api/game/dm_speak', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
@@ -1047,6 +1072,7 @@ class GameFlowController {
             
             const data = await response.json();
             if (data.status === 'success') {
+                this.claimActionRender(this.actionRenderKey('dm_speak', '', data.data.speech));
                 this.addDMMessage('游戏主持', data.data.speech);
             } else {
                 // 回退方案
@@ -1062,12 +1088,27 @@ class GameFlowController {
             let summaryContent = `第${this.gameState.currentChapter}章总结：根据大家的讨论，现在公布新的线索：\n\n`;
             summaryContent += cluesContent;
             this.addDMMessage('游戏主持', summaryContent);
+        } finally {
+            this.localDMSpeechPending--;
         }
     }
     
     async generateGameEndSummary() {
         // 生成游戏结束总结
+        this.localDMSpeechPending++;
         try {
+            const streamedSpeech = await this.streamDMSpeech({
+                game_session: this.gameState.gameSession,
+                chapter: this.gameState.currentChapter,
+                speak_type: 'game_end',
+                chat_history: this.getAllChatHistory(),
+                killer: '凶手身份待确认',
+                truth_info: '最终真相待揭示'
+            });
+            if (streamedSpeech) {
+                return;
+            }
+            
             const response = await fetch('/api/game/dm_speak', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
@@ -1083,6 +1124,7 @@ class GameFlowController {
             
             const data = await response.json();
             if (data.status === 'success') {
+                this.claimActionRender(this.actionRenderKey('dm_speak', '', data.data.speech));
                 this.addDMMessage('游戏主持', data.data.speech);
             } else {
                 // 回退方案
@@ -1094,6 +1136,106 @@ class GameFlowController {
             // 回退方案
             const finalSummary = `🎉 游戏结束！\n\n感谢各位玩家的精彩表现！让我们回顾这场惊心动魄的推理之旅...\n\n经过三章的激烈讨论和缜密推理，真相已经浮出水面。每位玩家都展现了出色的观察力和逻辑思维能力。\n\n这个剧本杀游戏到此圆满结束，希望大家都享受了这次推理的乐趣！`;
             this.addDMMessage('游戏主持', finalSummary);
+        } finally {
+            this.localDMSpeechPending--;
+        }
+    }
+    
+    // 流式获取DM发言（SSE），边生成边显示；不支持或失败时返回null，由调用方回退到普通接口
+    async streamDMSpeech(payload) {
+        if (!window.ReadableStream || !window.TextDecoder) {
+            return null;
+        }
+        
+        let messageElement = null;
+        let historyEntry = null;
+        let speech = '';
+        
+        try {
+            const response = await fetch('/api/game/dm_speak/stream', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(payload)
+            });
+            if (!response.ok || !response.body) {
+                return null;
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let result = null;
+            
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const rawEvent = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    
+                    let eventType = 'message';
+                    let eventData = '';
+                    rawEvent.split('\n').forEach(line => {
+                        if (line.startsWith('event: ')) eventType = line.slice(7);
+                        else if (line.startsWith('data: ')) eventData += line.slice(6);
+                    });
+                    const data = eventData ? JSON.parse(eventData) : {};
+                    
+                    if (eventType === 'token') {
+                        if (!messageElement) {
+                            this.addDMMessage('游戏主持', '');
+                            const container = document.getElementById('messagesContainer');
+                            messageElement = container ? container.lastElementChild : null;
+                            historyEntry = this.messageHistory[this.messageHistory.length - 1];
+                        }
+                        speech += data.text;
+                        if (messageElement) {
+                            messageElement.querySelector('.message-content').innerHTML = this.renderMarkdown(speech);
+                            this.scrollToBottom();
+                        }
+                    } else if (eventType === 'tool') {
+                        this.showDMTool(data);
+                    } else if (eventType === 'done') {
+                        result = data;
+                    }
+                }
+            }
+            
+            if (!result || !result.success) {
+                return messageElement ? speech : null;
+            }
+            
+            speech = result.speech;
+            this.claimActionRender(this.actionRenderKey('dm_speak', '', speech));
+            if (messageElement) {
+                messageElement.querySelector('.message-content').innerHTML = this.renderMarkdown(speech);
+            } else {
+                this.addDMMessage('游戏主持', speech);
+            }
+            if (historyEntry) {
+                historyEntry.content = speech;
+            }
+            console.log(`⚡ 【DM流式发言】首字延迟: ${result.ttft_ms}ms, 总耗时: ${result.total_ms}ms`);
+            return speech;
+        } catch (error) {
+            console.error('流式DM发言失败:', error);
+            if (historyEntry) {
+                historyEntry.content = speech;
+            }
+            return messageElement ? speech : null;
+        }
+    }
+    
+    showDMTool(tool) {
+        // 展示DM在发言中调用的工具
+        if (!tool || !tool.success) return;
+        if (tool.tool_type === 'show_clue') {
+            this.addSystemMessage(`🔍 线索 ${tool.chapter}-${tool.clue_index}：${tool.description}`);
+        } else if (tool.tool_type === 'show_character') {
+            console.log(`🎭 【DM工具】展示角色: ${tool.character_name}`);
         }
     }
     
@@ -1315,21 +1457,10 @@ class GameFlowController {
         document.getElementById('sendConfirmModal').style.display = 'none';
         
         try {
-            // 立即显示用户消息
-            this.addPlayerMessage(
-                this.gameState.currentCharacter, 
-                this.gameState.pendingContent,
-                'speak'
-            );
-            
-            // 显示询问
-            Object.entries(this.gameState.pendingQueries).forEach(([character, question]) => {
-                this.addPlayerMessage(
-                    this.gameState.currentCharacter,
-                    `询问 ${character}: ${question}`,
-                    'query'
-                );
-            });
+            // 立即显示用户消息和询问
+            if (this.claimActionRender(this.actionRenderKey('speak', this.gameState.currentCharacter, this.gameState.pendingContent))) {
+                this.renderSpeakAction(this.gameState.currentCharacter, this.gameState.pendingContent, this.gameState.pendingQueries);
+            }
             
             // 清空输入
             this.clearInputs();
@@ -1631,43 +1762,23 @@ class GameFlowController {
     }
 
     startProgressMonitoring(gameSession) {
-        let progress = 10;
-        this.updateProgress(progress, '正在生成剧本内容...');
+        this.progressPercent = 10;
+        this.progressCompleted = false;
+        this.updateProgress(this.progressPercent, '正在生成剧本内容...');
+        
+        // 优先通过事件流接收进度，事件流不可用时轮询
+        this.connectEventStream(gameSession);
 
         this.progressChecker = setInterval(async () => {
+            if (this.eventStreamActive) {
+                return;
+            }
             try {
                 const response = await fetch(`/api/game/progress/${gameSession}`);
                 const data = await response.json();
                 
                 if (data.status === 'success') {
-                    const gameData = data.data;
-                    
-                    if (gameData.script_ready) {
-                        this.updateProgressStatus('scriptStatus', 'completed', '已完成');
-                        progress = Math.max(progress, 40);
-                        this.updateProgress(progress, '正在生成角色图片...');
-                    }
-                    
-                    if (gameData.images_ready) {
-                        this.updateProgressStatus('imageStatus', 'completed', '已完成');
-                        progress = Math.max(progress, 80);
-                        this.updateProgress(progress, '正在准备游戏...');
-                    }
-                    
-                    if (gameData.game_ready) {
-                        this.updateProgressStatus('gameStatus', 'completed', '已完成');
-                        progress = 100;
-                        this.updateProgress(progress, '游戏准备完成！');
-                        
-                                                 setTimeout(() => {
-                             this.hideProgressModal();
-                             this.showCharacterSelection(gameData.characters);
-                             this.addSystemMessage('✅ 生成完成，请选择角色');
-                         }, 1000);
-                        
-                        clearInterval(this.progressChecker);
-                        this.progressChecker = null;
-                    }
+                    this.handleProgressUpdate(data.data);
                 }
             } catch (error) {
                 console.error('监控进度失败:', error);
@@ -1675,6 +1786,196 @@ class GameFlowController {
         }, 2000);
     }
     
+    handleProgressUpdate(gameData) {
+        if (this.progressCompleted) {
+            return;
+        }
+        
+        if (gameData.game_state === 'failed') {
+            this.progressCompleted = true;
+            clearInterval(this.progressChecker);
+            this.progressChecker = null;
+            this.hideProgressModal();
+            document.getElementById('characterSelection').style.display = 'none';
+            document.getElementById('gameWelcome').style.display = 'flex';
+            const error = gameData.job ? gameData.job.error : '';
+            this.showToast('❌ 生成剧本失败：' + (error || '未知错误'), 'error');
+            return;
+        }
+        
+        if (gameData.script_ready) {
+            this.updateProgressStatus('scriptStatus', 'completed', '已完成');
+            if (gameData.story_title) {
+                this.updateStoryTitle(gameData.story_title);
+            }
+            this.progressPercent = Math.max(this.progressPercent, 40);
+            
+            // 按已完成的图片数量推进进度
+            const images = gameData.job ? gameData.job.images : null;
+            if (images && images.total > 0) {
+                const finished = images.counts.done + images.counts.failed;
+                this.progressPercent = Math.max(this.progressPercent, 40 + Math.floor(40 * finished / images.total));
+                this.updateProgress(this.progressPercent, `正在生成图片 (${finished}/${images.total})...`);
+            } else {
+                this.updateProgress(this.progressPercent, '正在生成角色图片...');
+            }
+        }
+        
+        if (gameData.images_ready) {
+            this.updateProgressStatus('imageStatus', 'completed', '已完成');
+            this.progressPercent = Math.max(this.progressPercent, 80);
+            this.updateProgress(this.progressPercent, '正在准备游戏...');
+        }
+        
+        if (gameData.game_ready) {
+            this.progressCompleted = true;
+            this.updateProgressStatus('gameStatus', 'completed', '已完成');
+            this.progressPercent = 100;
+            this.updateProgress(this.progressPercent, '游戏准备完成！');
+            
+            setTimeout(() => {
+                this.hideProgressModal();
+                this.showCharacterSelection(gameData.characters);
+                this.addSystemMessage('✅ 生成完成，请选择角色');
+            }, 1000);
+            
+            clearInterval(this.progressChecker);
+            this.progressChecker = null;
+        }
+    }
+    
+    // ================== 会话事件流 ==================
+    
+    connectEventStream(gameSession) {
+        if (!window.EventSource || !gameSession) {
+            return false;
+        }
+        if (this.eventSource && this.eventSourceSession === gameSession) {
+            return true;
+        }
+        
+        this.disconnectEventStream();
+        if (this.eventSourceSession !== gameSession) {
+            this.eventCursor = 0;
+            this.gameState.action_history = [];
+        }
+        
+        console.log(`📡 【事件流】连接会话 ${gameSession}`);
+        const source = new EventSource(`/api/game/stream/${gameSession}?since=${this.eventCursor}`);
+        this.eventSource = source;
+        this.eventSourceSession = gameSession;
+        
+        source.onopen = () => {
+            console.log('📡 【事件流】已连接，暂停轮询');
+            this.eventStreamActive = true;
+        };
+        
+        source.onerror = () => {
+            // 浏览器会自动重连，断开期间由轮询接管
+            this.eventStreamActive = false;
+            if (source.readyState === EventSource.CLOSED) {
+                console.warn('📡 【事件流】连接已关闭，回退到轮询');
+                this.eventSource = null;
+            }
+        };
+        
+        source.addEventListener('progress', (event) => {
+            this.handleProgressUpdate(JSON.parse(event.data));
+        });
+        
+        source.addEventListener('action', (event) => {
+            this.handleStreamAction(JSON.parse(event.data));
+        });
+        
+        source.addEventListener('speaking_status', (event) => {
+            this.handleSpeakingStatus(JSON.parse(event.data));
+        });
+        
+        source.addEventListener('end', () => {
+            console.log('📡 【事件流】会话已结束');
+            this.disconnectEventStream();
+        });
+        
+        return true;
+    }
+    
+    disconnectEventStream() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+        this.eventStreamActive = false;
+    }
+    
+    handleStreamAction(action) {
+        if (action.seq <= this.eventCursor) {
+            return;
+        }
+        this.eventCursor = action.seq;
+        
+        if (!this.gameState.action_history) {
+            this.gameState.action_history = [];
+        }
+        this.gameState.action_history.push(action);
+        this.renderStreamAction(action);
+        
+        // 回答阶段收到回复时立即检查是否所有人都已回复
+        if ((action.type === 'answer' || action.action_type === 'answer') && this.answerStatusChecker) {
+            this.checkAnswerCompletion();
+        }
+    }
+    
+    renderStreamAction(action) {
+        // 显示其他客户端触发的DM发言、玩家发言和回答；本地已显示过的跳过
+        if (action.type === 'dm_speak') {
+            const claimed = this.claimActionRender(this.actionRenderKey('dm_speak', '', action.content));
+            // 本地正在生成DM发言时由本地请求负责显示
+            if (claimed && this.localDMSpeechPending === 0) {
+                this.addDMMessage('游戏主持', action.content);
+                (action.tools || []).forEach(tool => this.showDMTool(tool));
+            }
+            return;
+        }
+        
+        const kind = action.action_type === 'answer' || action.type === 'answer' ? 'answer' : 'speak';
+        if (!action.character || !this.claimActionRender(this.actionRenderKey(kind, action.character, action.content))) {
+            return;
+        }
+        
+        if (kind === 'answer') {
+            const content = action.asker ? `回答 ${action.asker} 的问题：${action.content}` : action.content;
+            this.addPlayerMessage(action.character, content, 'response');
+        } else {
+            this.renderSpeakAction(action.character, action.content, action.queries);
+        }
+    }
+    
+    renderSpeakAction(character, content, queries) {
+        this.addPlayerMessage(character, content, 'speak');
+        Object.entries(queries || {}).forEach(([target, question]) => {
+            this.addPlayerMessage(character, `询问 ${target}: ${question}`, 'query');
+        });
+    }
+    
+    actionRenderKey(kind, character, content) {
+        return `${kind}|${character}|${content}`;
+    }
+    
+    claimActionRender(key) {
+        // 返回true表示由调用方显示；另一方稍后送达同一条行动时返回false
+        const waiting = this.actionRenderClaims.get(key) || 0;
+        if (waiting > 0) {
+            if (waiting === 1) {
+                this.actionRenderClaims.delete(key);
+            } else {
+                this.actionRenderClaims.set(key, waiting - 1);
+            }
+            return false;
+        }
+        this.actionRenderClaims.set(key, 1);
+        return true;
+    }
+    
     // ================== 剧本显示管理 ==================
     
     showScriptChapter(chapter) {
@@ -1804,19 +2105,11 @@ class GameFlowController {
                      setTimeout(() => {
                          console.log(`💬 AI玩家 ${action.character_name} 开始发言:`, action);
                                                  if (action.success) {
-                            // 显示AI发言
-                            this.addPlayerMessage(action.character_name, action.content, 'speak');
-                            console.log(`✅ 显示AI发言: ${action.character_name} - ${action.content}`);
-                            
-                            // 显示AI询问
-                            Object.entries(action.queries).forEach(([target, question]) => {
-                                this.addPlayerMessage(
-                                    action.character_name,
-                                    `询问 ${target}: ${question}`,
-                                    'query'
-                                );
-                                console.log(`❓ 显示AI询问: ${action.character_name} -> ${target}: ${question}`);
-                            });
+                            // 显示AI发言和询问（事件流已推送时不重复显示）
+                            if (this.claimActionRender(this.actionRenderKey('speak', action.character_name, action.content))) {
+                                this.renderSpeakAction(action.character_name, action.content, action.queries);
+                                console.log(`✅ 显示AI发言: ${action.character_name} - ${action.content}`);
+                            }
                             
                             // 重要：将AI发言记录添加到前端action_history
                             const aiActionLog = {
@@ -1859,33 +2152,21 @@ class GameFlowController {
          startSpeakingStatusMonitor() {
         console.log(`📊 【发言监控】开始监控第${this.gameState.currentChapter}章第${this.gameState.currentCycle}轮发言状态`);
         
+        // 优先通过事件流接收发言状态，事件流不可用时轮询
+        this.connectEventStream(this.gameState.gameSession);
+        
         // 监控发言状态
         this.speakingStatusChecker = setInterval(async () => {
+            if (this.eventStreamActive) {
+                return;
+            }
             try {
                 console.log(`🔍 【发言监控】检查第${this.gameState.currentChapter}章第${this.gameState.currentCycle}轮发言状态`);
                 const response = await fetch(`/api/game/speaking_status/${this.gameState.gameSession}`);
                 const data = await response.json();
                 
                 if (data.status === 'success') {
-                    const status = data.data;
-                    console.log(`📈 【发言监控】后端返回状态:`, status);
-                    console.log(`📊 【发言监控】已发言: ${status.spoken_count}/${status.total_players}, 完成状态: ${status.all_completed}`);
-                    console.log(`👥 【发言监控】已发言玩家:`, status.spoken_players);
-                    console.log(`⏳ 【发言监控】未发言玩家:`, status.remaining_players);
-                    
-                    // 更新进度显示
-                    this.updateSpeakingProgress(status);
-                    
-                    // 检查是否所有玩家都发言完毕
-                    if (status.all_completed && !this.gameState.speakingStatus.allCompleted) {
-                        console.log('🎉 【发言监控】后端确认所有玩家发言完成，触发阶段切换');
-                        this.gameState.speakingStatus.allCompleted = true;
-                        this.handleAllPlayersSpokeComplete();
-                    } else if (status.all_completed) {
-                        console.log('⚠️ 【发言监控】后端显示完成，但前端已标记完成，跳过');
-                    } else {
-                        console.log(`⏳ 【发言监控】等待发言完成 (${status.spoken_count}/${status.total_players})`);
-                    }
+                    this.handleSpeakingStatus(data.data);
                 } else {
                     console.error('❌ 【发言监控】后端返回错误:', data);
                 }
@@ -1894,6 +2175,36 @@ class GameFlowController {
             }
         }, 3000); // 每3秒检查一次
     }
+    
+    handleSpeakingStatus(status) {
+        // 只在发言阶段处理，事件流推送的状态需与当前轮次一致
+        if (!this.speakingStatusChecker) {
+            return;
+        }
+        if (status.chapter !== undefined &&
+            (status.chapter !== this.gameState.currentChapter || status.cycle !== this.gameState.currentCycle)) {
+            return;
+        }
+        
+        console.log(`📈 【发言监控】后端返回状态:`, status);
+        console.log(`📊 【发言监控】已发言: ${status.spoken_count}/${status.total_players}, 完成状态: ${status.all_completed}`);
+        console.log(`👥 【发言监控】已发言玩家:`, status.spoken_players);
+        console.log(`⏳ 【发言监控】未发言玩家:`, status.remaining_players);
+        
+        // 更新进度显示
+        this.updateSpeakingProgress(status);
+        
+        // 检查是否所有玩家都发言完毕
+        if (status.all_completed && !this.gameState.speakingStatus.allCompleted) {
+            console.log('🎉 【发言监控】后端确认所有玩家发言完成，触发阶段切换');
+            this.gameState.speakingStatus.allCompleted = true;
+            this.handleAllPlayersSpokeComplete();
+        } else if (status.all_completed) {
+            console.log('⚠️ 【发言监控】后端显示完成，但前端已标记完成，跳过');
+        } else {
+            console.log(`⏳ 【发言监控】等待发言完成 (${status.spoken_count}/${status.total_players})`);
+        }
+    }
      
      stopSpeakingStatusMonitor() {
          if (this.speakingStatusChecker) {
@@ -2088,11 +2399,13 @@ class GameFlowController {
          
          try {
              // 立即显示用户回答
-             this.addPlayerMessage(
-                 this.gameState.currentCharacter, 
-                 content,
-                 'response'
-             );
+             if (this.claimActionRender(this.actionRenderKey('answer', this.gameState.currentCharacter, content))) {
+                 this.addPlayerMessage(
+                     this.gameState.currentCharacter, 
+                     content,
+                     'response'
+                 );
+             }
              
              // 清空输入
              document.getElementById('contentInput').value = '';
@@ -104,6 +104,7 @@ class MurderMysteryGame {
                 },
                 body: JSON.stringify({
                     generate_images: false,
+                    async: false,
                     user_id: this.gameState.user.id
                 })
             });
@@ -215,6 +215,7 @@ class MurderMysteryGameV2 {
                 body: JSON.stringify({
                     generate_images: generateImages,
                     wait_for_completion: waitForCompletion,
+                    async: waitForCompletion && generateImages,
                     user_id: this.gameState.user.id
                 })
             });
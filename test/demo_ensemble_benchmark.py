@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+AI发言合并模式对比演示
+对比一轮所有AI玩家发言时，逐个调用PlayerAgent（顺序/并发）与一次合并调用(PlayerEnsemble)
+的提示词token、输出token和总耗时
+"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 导入测试工具
+from test_utils import setup_project_path, get_latest_game, validate_game_path
+
+# 设置项目路径
+setup_project_path()
+
+from game import Game
+from player_agent import PlayerAgent, PlayerEnsemble
+from openai_utils import get_prompt_cache_stats
+
+SAMPLE_CHAT_HISTORY = """**游戏主持**: 各位，第一章开始。请大家先介绍自己昨晚的行程。
+**{first}**: 我昨晚一直在自己的房间里，大概十点就睡了。
+**{second}**: 我在客厅看书，中途听到楼上有动静。
+**{second}** 询问 **{first}**: 你十点之后真的没出过房间吗？"""
+
+def usage_snapshot(source):
+    """读取某个调用来源的累计token数"""
+    stats = get_prompt_cache_stats().get(source, {})
+    return stats.get('prompt_tokens', 0), stats.get('completion_tokens', 0)
+
+def run_per_agent(agents, scripts, chat_history, parallel):
+    """逐个调用PlayerAgent.query"""
+    before = usage_snapshot('player.query')
+    start = time.time()
+    if parallel:
+        with ThreadPoolExecutor(max_workers=len(agents)) as executor:
+            futures = {agent.name: executor.submit(agent.query, scripts[agent.name], chat_history) for agent in agents}
+            results = {name: future.result() for name, future in futures.items()}
+    else:
+        results = {agent.name: agent.query(scripts[agent.name], chat_history) for agent in agents}
+    elapsed = time.time() - start
+    after = usage_snapshot('player.query')
+    return results, elapsed, after[0] - before[0], after[1] - before[1]
+
+def run_ensemble(agents, scripts, chat_history):
+    """一次合并调用生成所有AI的发言"""
+    before = usage_snapshot('player.ensemble')
+    start = time.time()
+    results = PlayerEnsemble(agents).query(scripts, chat_history)
+    elapsed = time.time() - start
+    after = usage_snapshot('player.ensemble')
+    return results, elapsed, after[0] - before[0], after[1] - before[1]
+
+def main():
+    """运行对比"""
+    print("🤖 AI发言合并模式对比")
+    print("=" * 60)
+
+    game_path = sys.argv[1] if len(sys.argv) > 1 else get_latest_game()
+    if not game_path or not validate_game_path(game_path)['is_valid']:
+        print("❌ 没有可用的游戏会话，请先生成一个游戏或传入游戏目录")
+        return
+
+    game = Game(script_path=game_path, generate_images=False)
+    characters = game.script.get('characters', [])
+    if len(characters) < 2:
+        print("❌ 剧本角色不足2个，无法对比")
+        return
+
+    agents = [PlayerAgent(name) for name in characters]
+    scripts = {name: game.script.get(name, [])[:1] for name in characters}
+    chat_history = SAMPLE_CHAT_HISTORY.format(first=characters[0], second=characters[1])
+    print(f"🎯 剧本: {game.script.get('title', '未命名剧本')}，AI玩家: {len(agents)}个")
+
+    rows = []
+    for label, runner in [
+        ('逐个调用(顺序)', lambda: run_per_agent(agents, scripts, chat_history, parallel=False)),
+        ('逐个调用(并发)', lambda: run_per_agent(agents, scripts, chat_history, parallel=True)),
+        ('合并调用', lambda: run_ensemble(agents, scripts, chat_history)),
+    ]:
+        print(f"\n⏱️ 运行: {label}...")
+        results, elapsed, prompt_tokens, completion_tokens = runner()
+        rows.append((label, elapsed, prompt_tokens, completion_tokens))
+        for name, result in results.items():
+            print(f"   💬 {name}: {result.get('content', '')[:60]}")
+
+    print("\n" + "=" * 60)
+    print(f"{'模式':<12}{'耗时(s)':>10}{'提示词token':>14}{'输出token':>12}")
+    for label, elapsed, prompt_tokens, completion_tokens in rows:
+        print(f"{label:<12}{elapsed:>10.2f}{prompt_tokens:>14}{completion_tokens:>12}")
+
+    baseline = rows[0][2]
+    if baseline:
+        print(f"\n📉 合并调用的提示词token为逐个调用的 {rows[2][2] / baseline:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+测试游戏行动记录
+验证轮次索引、发言计数和游标读取
+"""
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+from action_log import ActionLog
+
+def make_action(character, chapter, cycle, action_type='speak', action='player_action'):
+    """构造一条行动记录"""
+    return {
+        'type': action,
+        'character': character,
+        'content': f"{character}的发言",
+        'chapter': chapter,
+        'cycle': cycle,
+        'action_type': action_type
+    }
+
+def test_speaking_status():
+    """测试按轮次统计发言状态"""
+    print("🧪 测试发言状态统计...")
+    log = ActionLog()
+    characters = ['张三', '李四', '王五']
+
+    log.append(make_action('张三', 1, 1))
+    log.append(make_action('李四', 1, 1, action_type='answer'))  # 回复不计入发言
+    log.append(make_action('王五', 1, 2))
+    log.append({'type': 'dm_speak', 'content': '开场', 'chapter': 1})
+
+    status = log.speaking_status(1, 1, characters)
+    assert status['spoken_players'] == ['张三']
+    assert status['remaining_players'] == ['李四', '王五']
+    assert status['all_completed'] is False
+
+    log.append(make_action('李四', 1, 1))
+    log.append(make_action('王五', 1, 1))
+    status = log.speaking_status(1, 1, characters)
+    assert status['spoken_count'] == 3
+    assert status['all_completed'] is True
+
+    assert [a['character'] for a in log.in_round(1, 2)] == ['王五']
+    assert log.count('player_action') == 5
+    assert log.count('player_action', 'dm_speak') == 6
+    print("✅ 发言状态统计测试通过")
+
+def test_cursor_read():
+    """测试游标读取和序号"""
+    print("🧪 测试游标读取...")
+    log = ActionLog()
+    for i in range(5):
+        assert log.append(make_action(f"角色{i}", 1, 1)) == i + 1
+
+    assert log.last_seq == 5
+    assert [a['seq'] for a in log.since(3)] == [4, 5]
+    assert [a['seq'] for a in log.since(0, limit=2)] == [1, 2]
+    assert log.since(5) == []
+    assert [a['seq'] for a in log.tail(2)] == [4, 5]
+
+    # 从导出的记录恢复后索引保持一致
+    restored = ActionLog(log.to_list())
+    assert restored.last_seq == 5
+    assert restored.spoken_players(1, 1) == [f"角色{i}" for i in range(5)]
+    print("✅ 游标读取测试通过")
+
+if __name__ == "__main__":
+    test_speaking_status()
+    test_cursor_read()
+    print("\n🎉 行动记录测试完成!")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+测试AI玩家调用调度
+验证并发结果按座位顺序返回、超时从开始执行时计算、超时和排队过久时回退
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+from ai_dispatch import submit_ai_query, collect_ai_query, run_ai_queries, parse_query_timeout
+
+def speak(name, delay):
+    """模拟一次耗时的AI发言"""
+    time.sleep(delay)
+    return {'content': f"{name}的发言"}
+
+def test_parallel_order_and_timeout_fallback():
+    """测试后完成的角色仍按座位顺序返回，超时的角色回退为失败"""
+    print("🧪 测试并发顺序和超时回退...")
+    executor = ThreadPoolExecutor(max_workers=3)
+    release = threading.Event()
+    try:
+        calls = [
+            ('甲', speak, ('甲', 0.3)),
+            ('乙', speak, ('乙', 0.05)),
+            ('丙', release.wait, (5,)),
+        ]
+        results = run_ai_queries(executor, calls, timeout=1, queue_timeout=5)
+
+        assert [r[0] for r in results] == ['甲', '乙', '丙']
+        assert results[0][1] == {'content': '甲的发言'} and results[0][3] is None
+        assert results[1][1] == {'content': '乙的发言'} and results[1][3] is None
+        assert results[2][1] is None
+        assert '超时' in results[2][3]
+        assert results[2][2] >= 0.9
+    finally:
+        release.set()
+        executor.shutdown(wait=True)
+    print("✅ 并发顺序和超时回退测试通过")
+
+def test_timeout_starts_when_call_runs():
+    """测试排队时间不计入调用超时"""
+    print("🧪 测试超时从开始执行时计算...")
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        first = submit_ai_query(executor, '甲', speak, '甲', 0.6)
+        second = submit_ai_query(executor, '乙', speak, '乙', 0.1)
+
+        assert collect_ai_query(first, timeout=1, queue_timeout=5)[0] == {'content': '甲的发言'}
+        # 乙排队0.6秒，从提交算已超过0.5秒，但执行本身只要0.1秒
+        result, latency, error = collect_ai_query(second, timeout=0.5, queue_timeout=5)
+        assert result == {'content': '乙的发言'} and error is None
+        assert latency < 0.5
+        assert second.started_at - second.submitted_at >= 0.5
+    finally:
+        executor.shutdown(wait=True)
+    print("✅ 超时从开始执行时计算测试通过")
+
+def test_queue_timeout_cancels():
+    """测试排队过久的调用被取消，不再占用线程"""
+    print("🧪 测试排队超时...")
+    executor = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    ran = []
+    try:
+        submit_ai_query(executor, '甲', release.wait, 5)
+        queued = submit_ai_query(executor, '乙', ran.append, '乙')
+
+        result, _, error = collect_ai_query(queued, timeout=5, queue_timeout=0.2)
+        assert result is None and '排队超时' in error
+        assert queued.future.cancelled()
+    finally:
+        release.set()
+        executor.shutdown(wait=True)
+    assert ran == []
+    print("✅ 排队超时测试通过")
+
+def test_parse_query_timeout():
+    """测试请求中的timeout校验和范围限制"""
+    print("🧪 测试timeout参数校验...")
+    assert parse_query_timeout(None, 60, 60) == 60
+    assert parse_query_timeout(10, 60, 60) == 10
+    assert parse_query_timeout("15", 60, 60) == 15
+    assert parse_query_timeout(0, 60, 60) == 1
+    assert parse_query_timeout(-5, 60, 60) == 1
+    assert parse_query_timeout(600, 60, 60) == 60
+
+    for bad in ("abc", True, [1], {'s': 1}, float('nan'), "inf"):
+        try:
+            parse_query_timeout(bad, 60, 60)
+        except ValueError:
+            continue
+        raise AssertionError(f"应拒绝timeout={bad!r}")
+    print("✅ timeout参数校验测试通过")
+
+if __name__ == "__main__":
+    test_parallel_order_and_timeout_fallback()
+    test_timeout_starts_when_call_runs()
+    test_queue_timeout_cancels()
+    test_parse_query_timeout()
+    print("\n🎉 AI调用调度测试完成!")
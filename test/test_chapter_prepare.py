@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+测试下一章DM开场预生成
+验证新增发言过多时取消过时的预生成、仍在生成时不重复提交
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+from config import Config
+from game import Game
+
+def make_game(opening_fn):
+    """构造只包含预生成相关状态的游戏"""
+    game = Game.__new__(Game)
+    game.prepared_chapters = {}
+    game._prepare_lock = threading.Lock()
+    game.speculation_stats = {'prepared': 0, 'hits': 0, 'discarded': 0}
+    game.get_total_chapters = lambda: 3
+    game._generate_chapter_opening = opening_fn
+    return game
+
+def test_skip_while_running_and_cancel_stale():
+    """测试仍在生成时不重复提交，过时的排队任务被取消"""
+    print("🧪 测试预生成去重...")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def opening(chapter_num, chat_history):
+        calls.append(chat_history)
+        started.set()
+        release.wait(5)
+        return {'success': True, 'speech': f"第{chapter_num}章开场({chat_history})"}
+
+    limit = Config.DM_SPECULATIVE_MAX_NEW_TURNS
+    executor = ThreadPoolExecutor(max_workers=1)
+    blocker = threading.Event()
+    try:
+        game = make_game(opening)
+        assert game.prepare_chapter(2, "历史0", 0, executor)
+        assert started.wait(5)
+
+        # 正在生成：即使新增发言超过上限也不重复提交
+        assert not game.prepare_chapter(2, "历史1", limit + 1, executor)
+        assert game.speculation_stats['prepared'] == 1
+
+        release.set()
+        game.prepared_chapters[2]['future'].result(5)
+
+        # 生成完成后过时：重新提交，旧结果计为丢弃
+        executor.submit(blocker.wait, 5)  # 占住线程，新任务保持排队
+        assert game.prepare_chapter(2, "历史2", limit + 1, executor)
+        queued = game.prepared_chapters[2]['future']
+
+        # 排队中的过时任务被取消后替换
+        assert game.prepare_chapter(2, "历史3", 2 * limit + 2, executor)
+        assert queued.cancelled()
+        assert game.speculation_stats == {'prepared': 3, 'hits': 0, 'discarded': 2}
+
+        blocker.set()
+        game.prepared_chapters[2]['future'].result(5)
+        assert calls == ["历史0", "历史3"]
+    finally:
+        release.set()
+        blocker.set()
+        executor.shutdown(wait=True)
+    print("✅ 预生成去重测试通过")
+
+if __name__ == "__main__":
+    test_skip_while_running_and_cancel_stale()
+    print("\n🎉 章节开场预生成测试完成!")
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+测试聊天历史滚动摘要
+验证阈值触发、后台摘要、按章节摘要、增量同步和模型失败时的回退
+"""
+
+import threading
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+from action_log import ActionLog
+from chat_summarizer import ChatSummarizer, estimate_tokens
+
+def fake_summarize(chapter, previous_summary, turns, max_tokens):
+    """用条数代替模型摘要"""
+    count = int(previous_summary.split('条')[0]) if previous_summary else 0
+    return f"{count + len(turns)}条发言"
+
+def make_speech(character, chapter, content):
+    """构造一条玩家发言记录"""
+    return {
+        'type': 'player_action',
+        'character': character,
+        'content': content,
+        'queries': {},
+        'chapter': chapter,
+        'cycle': 1,
+        'action_type': 'speak'
+    }
+
+def test_threshold_compaction():
+    """测试超过阈值才重新摘要，并只保留最近K条原文"""
+    print("🧪 测试阈值触发摘要...")
+    summarizer = ChatSummarizer(keep_turns=3, token_threshold=20, summarize_fn=fake_summarize)
+
+    for i in range(4):
+        summarizer.add_turn(1, f"**张三**: 第{i}句")
+    summarizer.wait()
+    # 较早的发言不足阈值，不摘要
+    assert summarizer.summarize_count == 0
+    assert len(summarizer.turns) == 4
+
+    for i in range(4, 12):
+        summarizer.add_turn(2 if i >= 8 else 1, f"**李四**: 这是一段比较长的发言内容{i}")
+    summarizer.wait()
+    assert summarizer.summarize_count >= 1
+    assert len(summarizer.turns) <= 3 + 4
+
+    context = summarizer.render()
+    assert "### 前情摘要" in context
+    assert "**第1章**" in context
+    assert context.endswith("这是一段比较长的发言内容11")
+    print(f"✅ 摘要后约{summarizer.token_count()}个token")
+
+def test_sync_from_action_log():
+    """测试从行动记录增量同步"""
+    print("🧪 测试增量同步...")
+    log = ActionLog()
+    summarizer = ChatSummarizer(keep_turns=10, token_threshold=1000, summarize_fn=fake_summarize)
+
+    log.append(make_speech('张三', 1, '我昨晚在书房'))
+    log.append({'type': 'state', 'event': 'cycle_changed', 'chapter': 1})
+    log.append({'type': 'dm_speak', 'content': '第二章开始', 'chapter': 2})
+    summarizer.sync(log)
+    summarizer.sync(log)  # 重复同步不会重复添加
+    assert [text for _, text, _ in summarizer.turns] == ["**张三**: 我昨晚在书房", "**游戏主持**: 第二章开始"]
+    assert summarizer.cursor == 3
+
+    # 持久化后恢复
+    restored = ChatSummarizer(summarize_fn=fake_summarize).load_state(summarizer.to_state())
+    assert restored.render() == summarizer.render()
+    print("✅ 增量同步测试通过")
+
+def test_summarize_failure_fallback():
+    """测试模型失败时使用截断摘要"""
+    print("🧪 测试摘要失败回退...")
+
+    def broken_summarize(chapter, previous_summary, turns, max_tokens):
+        raise RuntimeError("network down")
+
+    summarizer = ChatSummarizer(keep_turns=1, token_threshold=5, summary_max_tokens=20,
+                                summarize_fn=broken_summarize)
+    for i in range(10):
+        summarizer.add_turn(1, f"**王五**: {'很长的发言' * 10}{i}")
+    summarizer.wait()
+    assert len(summarizer.turns) == 1
+    assert estimate_tokens(summarizer.summaries[1]) <= 40
+    print("✅ 摘要失败回退测试通过")
+
+def test_background_compaction():
+    """测试摘要在后台进行，完成前继续使用原有内容"""
+    print("🧪 测试后台摘要...")
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_summarize(chapter, previous_summary, turns, max_tokens):
+        started.set()
+        release.wait(5)
+        return fake_summarize(chapter, previous_summary, turns, max_tokens)
+
+    summarizer = ChatSummarizer(keep_turns=2, token_threshold=5, summarize_fn=slow_summarize)
+    for i in range(4):
+        summarizer.add_turn(1, f"**张三**: 这是第{i}段发言")
+    assert started.wait(5)
+
+    # 摘要进行中：不阻塞，render返回全部原文
+    summarizer.add_turn(1, "**李四**: 摘要期间的新发言")
+    context = summarizer.render()
+    assert "### 前情摘要" not in context
+    assert "这是第0段发言" in context and context.endswith("摘要期间的新发言")
+
+    release.set()
+    summarizer.wait()
+    assert summarizer.summaries[1].endswith("条发言")
+    assert len(summarizer.turns) <= 2
+    assert summarizer.render().endswith("摘要期间的新发言")
+
+    # 恢复状态后丢弃进行中的摘要结果
+    started.clear()
+    release.clear()
+    for i in range(4):
+        summarizer.add_turn(2, f"**王五**: 第二章第{i}段发言")
+    assert started.wait(5)
+    snapshot = ChatSummarizer().load_state({'turns': [[2, "**王五**: 恢复的发言"]], 'cursor': 7})
+    summarizer.load_state(snapshot.to_state())
+    release.set()
+    summarizer.wait()
+    assert [text for _, text, _ in summarizer.turns] == ["**王五**: 恢复的发言"]
+    assert summarizer.summaries == {}
+    print("✅ 后台摘要测试通过")
+
+def test_failed_compaction_clears_pending():
+    """测试摘要任务异常退出后不再卡住，wait超时后抛出异常"""
+    print("🧪 测试摘要异常和等待超时...")
+
+    def broken_summarize(chapter, previous_summary, turns, max_tokens):
+        raise RuntimeError("network down")
+
+    def broken_truncate(previous, texts):
+        raise ValueError("回退摘要也失败")
+
+    summarizer = ChatSummarizer(keep_turns=1, token_threshold=5, summarize_fn=broken_summarize)
+    summarizer._truncate_summary = broken_truncate
+    for i in range(3):
+        summarizer.add_turn(1, f"**张三**: 这是第{i}段发言")
+    summarizer.wait(5)
+    assert summarizer._pending is None
+    assert summarizer.summarize_count == 0
+
+    # 之后的发言仍能触发新的摘要
+    summarizer.summarize_fn = fake_summarize
+    summarizer.add_turn(1, "**李四**: 新的发言")
+    summarizer.wait(5)
+    assert summarizer.summarize_count == 1 and len(summarizer.turns) == 1
+
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_summarize(chapter, previous_summary, turns, max_tokens):
+        started.set()
+        release.wait(5)
+        return fake_summarize(chapter, previous_summary, turns, max_tokens)
+
+    summarizer = ChatSummarizer(keep_turns=1, token_threshold=5, summarize_fn=slow_summarize)
+    for i in range(3):
+        summarizer.add_turn(1, f"**王五**: 这是第{i}段发言")
+    assert started.wait(5)
+    try:
+        summarizer.wait(0.2)
+        raise AssertionError("摘要未完成时wait应超时")
+    except TimeoutError:
+        pass
+    release.set()
+    summarizer.wait(5)
+    assert summarizer.summarize_count >= 1 and len(summarizer.turns) == 1
+    print("✅ 摘要异常和等待超时测试通过")
+
+if __name__ == "__main__":
+    test_threshold_compaction()
+    test_sync_from_action_log()
+    test_summarize_failure_fallback()
+    test_background_compaction()
+    test_failed_compaction_clears_pending()
+    print("\n🎉 聊天摘要测试完成!")
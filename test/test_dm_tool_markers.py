@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+测试DM流式发言的工具标记解析
+验证跨片段的标记、未闭合的标记以及普通文本的增量解析
+"""
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+from dm_agent import DMToolMarkerParser
+
+def parse_chunks(chunks):
+    """逐段输入并在结束时flush，合并相邻文本后返回全部片段"""
+    parser = DMToolMarkerParser()
+    segments = []
+    for chunk in chunks:
+        segments.extend(parser.feed(chunk))
+    segments.extend(parser.flush())
+
+    merged = []
+    for kind, value in segments:
+        if kind == 'text' and merged and merged[-1][0] == 'text':
+            merged[-1] = ('text', merged[-1][1] + value)
+        else:
+            merged.append((kind, value))
+    return merged
+
+def test_plain_text():
+    """测试普通文本（包括非标记的方括号）直接输出，不暂存"""
+    print("🧪 测试普通文本...")
+    parser = DMToolMarkerParser()
+    assert parser.feed("欢迎来到张家别墅。") == [('text', "欢迎来到张家别墅。")]
+    assert parser.feed("[注意]请听好") == [('text', "[注意]请听好")]
+    assert parser.feed("数组[0") == [('text', "数组[0")]
+    assert parser.flush() == []
+    print("✅ 普通文本测试通过")
+
+def test_marker_in_one_chunk():
+    """测试完整标记被解析为工具调用"""
+    print("🧪 测试完整标记...")
+    segments = parse_chunks(["请看线索[SHOW_CLUE:1-2]，以及[SHOW_CHARACTER:李四]。"])
+    assert segments == [
+        ('text', "请看线索"),
+        ('tool', {'type': 'show_clue', 'chapter': 1, 'clue_index': 2}),
+        ('text', "，以及"),
+        ('tool', {'type': 'show_character', 'character_name': '李四'}),
+        ('text', "。")
+    ]
+    print("✅ 完整标记测试通过")
+
+def test_marker_split_across_chunks():
+    """测试标记被拆到多个片段时暂存并在闭合后解析"""
+    print("🧪 测试跨片段标记...")
+    parser = DMToolMarkerParser()
+    assert parser.feed("线索如下[SHOW_") == [('text', "线索如下")]
+    assert parser.feed("CLUE:2-") == []
+    assert parser.feed("3]继续") == [
+        ('tool', {'type': 'show_clue', 'chapter': 2, 'clue_index': 3}),
+        ('text', "继续")
+    ]
+    assert parser.flush() == []
+
+    # 逐字输入与一次性输入的结果一致
+    text = "开场[SHOW_CHARACTER:王五]然后[SHOW_CLUE:1-1]结束"
+    assert parse_chunks(list(text)) == parse_chunks([text])
+    print("✅ 跨片段标记测试通过")
+
+def test_unterminated_marker():
+    """测试未闭合的标记在结束时作为文本输出，过长时不再等待"""
+    print("🧪 测试未闭合标记...")
+    parser = DMToolMarkerParser()
+    assert parser.feed("最后[SHOW_CLUE:1-") == [('text', "最后")]
+    assert parser.flush() == [('text', "[SHOW_CLUE:1-")]
+    assert parser.flush() == []
+
+    long_tail = "[SHOW_CHARACTER:" + "很" * DMToolMarkerParser.MAX_MARKER_LENGTH
+    assert parse_chunks([long_tail[:20], long_tail[20:]]) == [('text', long_tail)]
+
+    # 闭合了但内容不符合格式的标记按文本输出
+    assert parse_chunks(["[SHOW_CLUE:一-二]"]) == [('text', "[SHOW_CLUE:一-二]")]
+    print("✅ 未闭合标记测试通过")
+
+if __name__ == "__main__":
+    test_plain_text()
+    test_marker_in_one_chunk()
+    test_marker_split_across_chunks()
+    test_unterminated_marker()
+    print("\n🎉 DM工具标记解析测试完成!")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+测试游戏目录索引
+验证游戏列表、关键词过滤、分页、章节数统计以及剧本变化后的索引重建
+"""
+
+import json
+import os
+import tempfile
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+from game_catalog import GameCatalog
+
+def write_game(log_dir, name, title, characters, chapters, mtime=None):
+    """在log目录下创建一个只包含script.json的游戏目录"""
+    game_dir = os.path.join(log_dir, name)
+    os.makedirs(game_dir, exist_ok=True)
+    script = {
+        'title': title,
+        'characters': characters,
+        'dm': [f"第{i + 1}章DM剧本" for i in range(chapters)],
+        # 角色剧本按章节排列，章节数不能从这里统计
+        characters[0]: [f"第{i + 1}章" for i in range(chapters + 2)]
+    }
+    script_file = os.path.join(game_dir, 'script.json')
+    with open(script_file, 'w', encoding='utf-8') as f:
+        json.dump(script, f, ensure_ascii=False)
+    if mtime is not None:
+        os.utime(script_file, (mtime, mtime))
+    return game_dir
+
+def make_log_dir(tmp_dir):
+    """创建两个游戏目录和一个没有剧本的目录"""
+    log_dir = os.path.join(tmp_dir, 'log')
+    write_game(log_dir, 'game_a', '雨夜山庄', ['张三', 'Alice'], 3)
+    write_game(log_dir, 'game_b', '海上列车', ['李四', '王五'], 2)
+    os.makedirs(os.path.join(log_dir, 'session_snapshots'))
+    return log_dir
+
+def test_list_and_filter():
+    """测试列出游戏、章节数统计和关键词过滤"""
+    print("🧪 测试游戏列表和过滤...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        catalog = GameCatalog(make_log_dir(tmp_dir))
+
+        result = catalog.query()
+        assert result['total'] == 2 and result['pages'] == 1
+        games = {game['title']: game for game in result['games']}
+        assert set(games) == {'雨夜山庄', '海上列车'}
+        assert games['雨夜山庄']['chapters'] == 3
+        assert games['海上列车']['chapters'] == 2
+        assert games['海上列车']['characters'] == ['李四', '王五']
+        assert 'mtime' not in games['雨夜山庄']
+
+        assert [g['title'] for g in catalog.query(keyword='山庄')['games']] == ['雨夜山庄']
+        assert [g['title'] for g in catalog.query(keyword='王五')['games']] == ['海上列车']
+        assert [g['title'] for g in catalog.query(keyword='alice')['games']] == ['雨夜山庄']
+        assert catalog.query(keyword='不存在')['total'] == 0
+    print("✅ 游戏列表和过滤测试通过")
+
+def test_pagination():
+    """测试分页"""
+    print("🧪 测试分页...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        catalog = GameCatalog(make_log_dir(tmp_dir))
+
+        first = catalog.query(page=1, page_size=1)
+        second = catalog.query(page=2, page_size=1)
+        assert first['total'] == 2 and first['pages'] == 2 and first['page_size'] == 1
+        assert len(first['games']) == 1 and len(second['games']) == 1
+        assert {first['games'][0]['title'], second['games'][0]['title']} == {'雨夜山庄', '海上列车'}
+
+        assert catalog.query(page=3, page_size=1)['games'] == []
+        assert catalog.query(page=0, page_size=1)['page'] == 1
+    print("✅ 分页测试通过")
+
+def test_rebuild_on_mtime_change():
+    """测试只重新解析mtime变化的剧本，删除的游戏从索引移除"""
+    print("🧪 测试索引重建...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_dir = make_log_dir(tmp_dir)
+        catalog = GameCatalog(log_dir)
+        catalog.refresh()
+        assert os.path.exists(os.path.join(log_dir, 'catalog.json'))
+
+        parsed = []
+        original_build = catalog._build_entry
+
+        def counting_build(item_path, script_file, mtime):
+            parsed.append(os.path.basename(item_path))
+            return original_build(item_path, script_file, mtime)
+
+        catalog._build_entry = counting_build
+        catalog.refresh()
+        assert parsed == []
+
+        # 修改剧本内容并更新mtime
+        old_mtime = os.path.getmtime(os.path.join(log_dir, 'game_b', 'script.json'))
+        write_game(log_dir, 'game_b', '海上列车（修订）', ['李四', '王五', '赵六'], 4, mtime=old_mtime + 10)
+        games = {game['path']: game for game in catalog.refresh()}
+        assert parsed == ['game_b']
+        game_b = games[os.path.join(log_dir, 'game_b')]
+        assert game_b['title'] == '海上列车（修订）' and game_b['chapters'] == 4
+
+        # 新实例从索引文件加载，不需要重新解析
+        reloaded = GameCatalog(log_dir)
+        reloaded._build_entry = None
+        assert {game['title'] for game in reloaded.refresh()} == {'雨夜山庄', '海上列车（修订）'}
+
+        os.remove(os.path.join(log_dir, 'game_a', 'script.json'))
+        assert [game['title'] for game in catalog.query()['games']] == ['海上列车（修订）']
+    print("✅ 索引重建测试通过")
+
+if __name__ == "__main__":
+    test_list_and_filter()
+    test_pagination()
+    test_rebuild_on_mtime_change()
+    print("\n🎉 游戏目录索引测试完成!")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+测试游戏创建后台任务
+验证进度阶段切换、失败上报、状态字典以及任务记录的移除
+"""
+
+import threading
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+from game_jobs import GameCreationJob, GameJobManager
+
+def test_phase_transitions():
+    """测试进度回调驱动的阶段切换和图片状态"""
+    print("🧪 测试阶段切换...")
+    job = GameCreationJob('job-1')
+    assert job.phase == 'queued' and job.script_status == 'pending'
+
+    job.on_progress('phase', {'phase': 'script'})
+    assert job.phase == 'script' and job.script_status == 'running'
+    assert not job.script_ready and not job.images_ready
+
+    job.on_progress('script_ready', {'title': '雨夜山庄', 'characters': ['张三', '李四'], 'game_dir': 'log/g1'})
+    job.on_progress('phase', {'phase': 'images'})
+    job.on_progress('image', {'filename': 'c1.png', 'kind': 'character', 'name': '张三', 'status': 'submitted'})
+    job.on_progress('image', {'filename': 'clue.png', 'kind': 'clue', 'name': '匕首', 'status': 'failed'})
+    assert job.script_ready and job.title == '雨夜山庄'
+    assert not job.images_ready
+    assert job.character_image('张三') is None
+
+    job.on_progress('image', {'filename': 'c1.png', 'status': 'done', 'local_path': 'log/g1/c1.png'})
+    assert job.images_ready
+    assert job.character_image('张三') == 'log/g1/c1.png'
+
+    state = job.to_dict()
+    assert state['phase'] == 'images'
+    assert state['script'] == {'status': 'done', 'title': '雨夜山庄', 'characters': ['张三', '李四']}
+    assert state['images']['total'] == 2
+    assert state['images']['counts'] == {'pending': 0, 'submitted': 0, 'done': 1, 'failed': 1}
+    assert state['images']['items']['c1.png'] == {'kind': 'character', 'name': '张三', 'status': 'done'}
+
+    job.finish('game')
+    assert job.done and job.game == 'game' and job.to_dict()['phase'] == 'done'
+    print("✅ 阶段切换测试通过")
+
+def test_manager_success_and_failure():
+    """测试后台执行成功、失败时的回调和状态"""
+    print("🧪 测试任务成功和失败...")
+    manager = GameJobManager(max_workers=2)
+    completed, failed = [], []
+
+    def good_factory(progress):
+        progress('phase', {'phase': 'script'})
+        progress('script_ready', {'title': '标题', 'characters': ['甲']})
+        return 'game'
+
+    def bad_factory(progress):
+        progress('phase', {'phase': 'script'})
+        raise RuntimeError("剧本生成失败")
+
+    good = manager.submit('good', good_factory, on_complete=completed.append, on_failure=failed.append)
+    bad = manager.submit('bad', bad_factory, on_complete=completed.append, on_failure=failed.append)
+    good.future.result(5)
+    bad.future.result(5)
+
+    assert completed == [good] and failed == [bad]
+    assert good.done and good.game == 'game'
+    assert bad.failed and bad.script_status == 'failed'
+    assert bad.to_dict()['error'] == "剧本生成失败"
+    assert manager.get('good') is good and manager.get('bad') is bad
+
+    # 剧本已生成后图片阶段失败时，剧本状态保持完成
+    late = GameCreationJob('late')
+    late.on_progress('script_ready', {'title': '标题'})
+    late.fail("图片生成失败")
+    assert late.failed and late.script_status == 'done'
+    print("✅ 任务成功和失败测试通过")
+
+def test_remove():
+    """测试移除任务记录，不影响仍在执行的任务"""
+    print("🧪 测试移除任务记录...")
+    manager = GameJobManager(max_workers=1)
+    release = threading.Event()
+    job = manager.submit('running', lambda progress: release.wait(5) and 'game')
+
+    manager.remove('running')
+    manager.remove('missing')
+    assert manager.get('running') is None
+
+    release.set()
+    job.future.result(5)
+    assert job.done and manager.get('running') is None
+    print("✅ 移除任务记录测试通过")
+
+if __name__ == "__main__":
+    test_phase_transitions()
+    test_manager_success_and_failure()
+    test_remove()
+    print("\n🎉 游戏创建任务测试完成!")
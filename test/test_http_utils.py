@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+测试共享HTTP会话
+用本地HTTP服务验证流式原子下载、5xx重试和按主机的连接复用统计
+"""
+
+import os
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+from http_utils import download_to_file, get_http_session_stats
+
+IMAGE_BYTES = b'\x89PNG' + b'0' * 200000
+
+class ImageHandler(BaseHTTPRequestHandler):
+    """返回图片，/flaky 第一次返回503，/missing 返回404"""
+    protocol_version = 'HTTP/1.1'
+    flaky_failures = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/flaky' and ImageHandler.flaky_failures == 0:
+            ImageHandler.flaky_failures += 1
+            return self._reply(503, b'')
+        if self.path == '/missing':
+            return self._reply(404, b'')
+        self._reply(200, IMAGE_BYTES)
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_server():
+    # 保活连接会一直占用处理线程，需要多线程服务才能正常关闭
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+def test_download_and_reuse():
+    """测试流式下载、原子替换和连接复用"""
+    print("🧪 测试流式下载...")
+    server, base_url = start_server()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # 目标文件是另一个文件的硬链接时，替换后原文件不变
+            cached = os.path.join(tmp, 'cached.png')
+            with open(cached, 'wb') as f:
+                f.write(b'cached')
+            dest = os.path.join(tmp, 'clue.png')
+            os.link(cached, dest)
+
+            download_to_file(f"{base_url}/image.png", dest)
+            download_to_file(f"{base_url}/image.png", os.path.join(tmp, 'other.png'))
+            with open(dest, 'rb') as f:
+                assert f.read() == IMAGE_BYTES
+            with open(cached, 'rb') as f:
+                assert f.read() == b'cached'
+
+            host = [s for s in get_http_session_stats() if s['host'].endswith(f":{server.server_port}")][0]
+            assert host['requests'] == 2
+            assert host['new_connections'] == 1 and host['reused'] == 1
+    finally:
+        server.shutdown()
+    print("✅ 流式下载测试通过")
+
+def test_retry_and_failure():
+    """测试5xx自动重试以及失败时不留下临时文件"""
+    print("🧪 测试重试和下载失败...")
+    server, base_url = start_server()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            download_to_file(f"{base_url}/flaky", os.path.join(tmp, 'flaky.png'))
+            assert ImageHandler.flaky_failures == 1
+
+            try:
+                download_to_file(f"{base_url}/missing", os.path.join(tmp, 'missing.png'))
+                assert False, "应该抛出异常"
+            except Exception:
+                pass
+            assert sorted(os.listdir(tmp)) == ['flaky.png']
+    finally:
+        server.shutdown()
+    print("✅ 重试和下载失败测试通过")
+
+if __name__ == "__main__":
+    test_download_and_reuse()
+    test_retry_and_failure()
+    print("\n🎉 共享HTTP会话测试完成!")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+测试图片缓存
+验证按(模型, 提示词, 尺寸)命中、放置到游戏目录、索引持久化以及按磁盘预算淘汰
+"""
+
+import os
+import tempfile
+import time
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+from image_cache import ImageCache
+
+def write_image(directory, name, size):
+    """写入一个指定大小的假图片"""
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG' + b'0' * (size - 4))
+    return path
+
+def test_hit_and_materialize():
+    """测试缓存命中并放置到游戏目录"""
+    print("🧪 测试缓存命中...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ImageCache(os.path.join(tmp, 'cache'), max_bytes=0)
+        key = cache.make_key('wan2.2-t2i-flash', '一把古典的银色匕首', '512*512')
+        assert key == cache.make_key('wan2.2-t2i-flash', '一把古典的银色匕首 ', '512*512')
+        assert key != cache.make_key('wan2.2-t2i-plus', '一把古典的银色匕首', '512*512')
+        assert cache.materialize(key, os.path.join(tmp, 'a.png')) is None
+
+        source = write_image(tmp, 'downloaded.png', 100)
+        cache.put(key, source, {'actual_prompt': '匕首特写'})
+
+        dest = os.path.join(tmp, 'game_imgs.png')
+        entry = cache.materialize(key, dest)
+        assert entry['actual_prompt'] == '匕首特写'
+        assert os.path.getsize(dest) == 100
+
+        # 重新加载索引后仍能命中
+        reloaded = ImageCache(os.path.join(tmp, 'cache'), max_bytes=0)
+        assert reloaded.get(key)['hits'] == 2
+
+        stats = cache.stats()
+        assert stats['hits'] == 1 and stats['misses'] == 1 and stats['entries'] == 1
+    print("✅ 缓存命中测试通过")
+
+def test_lru_eviction():
+    """测试超过磁盘预算时淘汰最久未使用的图片"""
+    print("🧪 测试LRU淘汰...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ImageCache(os.path.join(tmp, 'cache'), max_bytes=250)
+        keys = [cache.make_key('m', f'prompt {i}', '512*512') for i in range(3)]
+
+        cache.put(keys[0], write_image(tmp, '0.png', 100))
+        time.sleep(0.01)
+        cache.put(keys[1], write_image(tmp, '1.png', 100))
+        time.sleep(0.01)
+        # 使用第一张，第二张变为最久未使用
+        cache.get(keys[0])
+        time.sleep(0.01)
+        cache.put(keys[2], write_image(tmp, '2.png', 100))
+
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+        assert cache.stats()['evicted'] == 1
+        assert cache.stats()['bytes'] == 200
+        # 游戏目录中的文件不受淘汰影响
+        assert os.path.exists(os.path.join(tmp, '1.png'))
+    print("✅ LRU淘汰测试通过")
+
+def test_missing_file():
+    """测试缓存文件被删除后视为未命中"""
+    print("🧪 测试缓存文件丢失...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ImageCache(os.path.join(tmp, 'cache'), max_bytes=0)
+        key = cache.make_key('m', 'p', '512*512')
+        cache.put(key, write_image(tmp, 'p.png', 10))
+        os.remove(os.path.join(cache.cache_dir, cache._index[key]['file']))
+        assert cache.get(key) is None
+        assert cache.stats()['entries'] == 0
+    print("✅ 缓存文件丢失测试通过")
+
+if __name__ == "__main__":
+    test_hit_and_materialize()
+    test_lru_eviction()
+    test_missing_file()
+    print("\n🎉 图片缓存测试完成!")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+测试图片任务共享轮询器
+验证多个任务的统一查询、间隔指数增长、按历史完成时间安排首次查询以及超时
+"""
+
+import time
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+from image_poller import ImageTaskPoller
+
+class FakeTaskService:
+    """按预设耗时完成任务的文生图服务"""
+
+    def __init__(self, durations):
+        self.durations = durations
+        self.started = {}
+        self.checks = {}
+
+    def submit(self, task_id):
+        self.started[task_id] = time.time()
+        return task_id
+
+    def check(self, task_id):
+        self.checks[task_id] = self.checks.get(task_id, 0) + 1
+        duration = self.durations[task_id]
+        if duration is not None and time.time() - self.started[task_id] >= duration:
+            return {
+                'task_status': 'SUCCEEDED',
+                'submit_time': '2025-01-08 16:03:59.000',
+                'scheduled_time': '2025-01-08 16:04:00.500',
+                'end_time': '2025-01-08 16:04:03.000'
+            }
+        return {'task_status': 'RUNNING'}
+
+def test_poll_outstanding_tasks():
+    """测试统一查询多个任务并记录排队和生成时间"""
+    print("🧪 测试统一查询...")
+    service = FakeTaskService({'fast': 0.1, 'slow': 0.6})
+    poller = ImageTaskPoller(service.check, min_interval=0.05, max_interval=0.2, backoff=2)
+
+    futures = {task_id: poller.track(service.submit(task_id), timeout=5) for task_id in ('fast', 'slow')}
+    fast = futures['fast'].result(timeout=5)
+    slow = futures['slow'].result(timeout=5)
+
+    assert fast['status'] == 'SUCCEEDED' and slow['status'] == 'SUCCEEDED'
+    assert fast['elapsed'] < slow['elapsed']
+    assert fast['queue_time'] == 1.5 and fast['run_time'] == 2.5
+    # 间隔指数增长，慢任务的查询次数远少于按最短间隔查询的次数
+    assert slow['polls'] < 0.6 / 0.05
+
+    stats = poller.stats()
+    assert stats['outstanding'] == 0 and stats['completed'] == 2
+    assert stats['avg_queue_time'] == 1.5
+    print("✅ 统一查询测试通过")
+
+def test_first_delay_learns_history():
+    """测试首次查询时间根据历史完成时间调整"""
+    print("🧪 测试首次查询时间...")
+    poller = ImageTaskPoller(lambda task_id: None, min_interval=0.5, max_interval=10)
+    assert poller._first_delay() == 0.5
+
+    poller._durations.extend([3.0, 3.5, 4.0, 4.0, 12.0])
+    assert poller._first_delay() == 3.5
+
+    poller._durations.clear()
+    poller._durations.extend([30.0] * 5)
+    assert poller._first_delay() == 10
+    print("✅ 首次查询时间测试通过")
+
+def test_timeout():
+    """测试任务超时"""
+    print("🧪 测试任务超时...")
+    service = FakeTaskService({'stuck': None})
+    poller = ImageTaskPoller(service.check, min_interval=0.05, max_interval=0.1)
+
+    result = poller.track(service.submit('stuck'), timeout=0.3).result(timeout=5)
+    assert result['status'] == 'TIMEOUT'
+    assert poller.stats()['timeouts'] == 1
+    print("✅ 任务超时测试通过")
+
+if __name__ == "__main__":
+    test_poll_outstanding_tasks()
+    test_first_delay_learns_history()
+    test_timeout()
+    print("\n🎉 图片任务轮询测试完成!")
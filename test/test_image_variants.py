@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+测试图片衍生版本
+验证缩略图和WebP的生成、按版本名查找已有文件以及图片落盘时（含缓存命中）自动生成
+"""
+
+import os
+import tempfile
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+import pytest
+
+from image_variants import PIL_AVAILABLE, generate_variants, existing_variant, variant_path
+
+pytestmark = pytest.mark.skipif(not PIL_AVAILABLE, reason="未安装Pillow")
+
+def write_png(directory, name, size=512):
+    """写入一张指定尺寸的PNG"""
+    from PIL import Image
+    path = os.path.join(directory, name)
+    Image.new('RGB', (size, size), (120, 30, 30)).save(path, format='PNG')
+    return path
+
+def test_generate_variants():
+    """测试生成缩略图和WebP版本"""
+    print("🧪 测试衍生版本生成...")
+    from PIL import Image
+    with tempfile.TemporaryDirectory() as tmp:
+        source = write_png(tmp, '张三.png')
+        variants = generate_variants(source)
+        assert set(variants) == {'thumb', 'webp'}
+        assert variants['thumb'] == os.path.join(tmp, 'variants', '张三.thumb.webp')
+
+        with Image.open(variants['thumb']) as thumb:
+            assert thumb.format == 'WEBP' and max(thumb.size) == 128
+        with Image.open(variants['webp']) as webp:
+            assert webp.format == 'WEBP' and webp.size == (512, 512)
+        assert os.path.getsize(variants['thumb']) < os.path.getsize(source)
+        # 不留下临时文件
+        assert sorted(os.listdir(os.path.join(tmp, 'variants'))) == ['张三.thumb.webp', '张三.webp.webp']
+    print("✅ 衍生版本生成测试通过")
+
+def test_existing_variant_never_generates():
+    """测试查找只返回已有文件，不会触发生成"""
+    print("🧪 测试衍生版本查找...")
+    with tempfile.TemporaryDirectory() as tmp:
+        source = write_png(tmp, 'clue-ch1-1.png')
+        assert existing_variant(source, 'thumb') is None
+        assert not os.path.exists(variant_path(source, 'thumb'))
+
+        generate_variants(source)
+        assert existing_variant(source, 'thumb') == variant_path(source, 'thumb')
+        assert existing_variant(source, 'huge') is None
+
+        # 无法读取的图片不生成
+        broken = os.path.join(tmp, 'broken.png')
+        with open(broken, 'wb') as f:
+            f.write(b'not an image')
+        assert generate_variants(broken) == {}
+    print("✅ 衍生版本查找测试通过")
+
+def test_finish_image_job_writes_variants():
+    """测试图片落盘和缓存命中时都会生成衍生版本"""
+    print("🧪 测试图片落盘时生成...")
+    from game import Game
+
+    with tempfile.TemporaryDirectory() as tmp:
+        game = Game.__new__(Game)
+        game.game_dir = tmp
+        game.imgs_dir = os.path.join(tmp, 'imgs')
+        os.makedirs(game.imgs_dir)
+        game.character_images = {}
+        game.asset_manifest = {'characters': {}, 'clues': {}}
+        game._persist_asset_manifest = lambda: None
+        game._notify_image_status = lambda *args, **kwargs: None
+
+        # 缓存命中：图片已放到imgs/
+        local_path = write_png(game.imgs_dir, '张三.png')
+        job = {'kind': 'character', 'name': '张三', 'filename': '张三.png'}
+        game._finish_image_job(job, {'success': True, 'cached': True, 'local_path': local_path, 'filename': '张三.png'})
+        assert game.character_images['张三']['variants'] == {
+            'thumb': 'imgs/variants/张三.thumb.webp',
+            'webp': 'imgs/variants/张三.webp.webp'
+        }
+
+        # 新下载的图片
+        game._download_image = lambda url, filename: write_png(game.imgs_dir, filename)
+        job = {'kind': 'character', 'name': '李四', 'filename': '李四.png'}
+        game._finish_image_job(job, {'success': True, 'url': 'http://example.com/a.png'})
+        assert existing_variant(os.path.join(game.imgs_dir, '李四.png'), 'thumb')
+    print("✅ 图片落盘时生成测试通过")
+
+if __name__ == "__main__":
+    test_generate_variants()
+    test_existing_variant_never_generates()
+    test_finish_image_job_writes_variants()
+    print("\n🎉 图片衍生版本测试完成!")
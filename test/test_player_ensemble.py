@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+测试合并发言（PlayerEnsemble）
+验证模型输出的解析：缺失或格式错误的玩家按沉默处理、不能询问自己、没有玩家时不调用模型
+"""
+
+import json
+from types import SimpleNamespace
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+from player_agent import PlayerAgent, PlayerEnsemble
+
+class FakeCompletions:
+    """返回固定内容的chat.completions"""
+
+    def __init__(self, content):
+        self.content = content
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+def make_ensemble(content, names=('张三', '李四', '王五')):
+    """构造使用固定模型输出的合并发言"""
+    ensemble = PlayerEnsemble([PlayerAgent(name) for name in names])
+    completions = FakeCompletions(content)
+    ensemble.client = SimpleNamespace(chat=SimpleNamespace(completions=completions), base_url='fake://')
+    return ensemble, completions
+
+def test_parse_fallback_and_self_query():
+    """测试缺失玩家回退为沉默，询问自己的问题被过滤"""
+    print("🧪 测试合并发言解析...")
+    canned = '```json\n' + json.dumps({
+        '张三': {'content': '我昨晚在书房', 'query': {'张三': '我在哪？', '李四': '你几点回来的？'}},
+        '李四': {'content': '', 'query': '不是字典'},
+        '外人': {'content': '不该出现'}
+    }, ensure_ascii=False) + '\n```'
+    ensemble, completions = make_ensemble(canned)
+    scripts = {'张三': ['张三的剧本'], '李四': ['李四的剧本'], '王五': ['王五的剧本']}
+
+    results = ensemble.query(scripts, "")
+
+    assert len(completions.calls) == 1
+    assert list(results) == ['张三', '李四', '王五']
+    assert results['张三'] == {'content': '我昨晚在书房', 'query': {'李四': '你几点回来的？'}}
+    assert results['李四'] == {'content': '**[保持沉默]**', 'query': {}}
+    assert results['王五'] == {'content': '**[保持沉默]**', 'query': {}}
+    print("✅ 合并发言解析测试通过")
+
+def test_parse_invalid_json():
+    """测试无法解析的输出时所有玩家按沉默处理"""
+    print("🧪 测试无效输出回退...")
+    ensemble, _ = make_ensemble('')
+    results = ensemble._parse_response('["不是对象"]', ['张三', '李四'])
+    assert results == {
+        '张三': {'content': '**[保持沉默]**', 'query': {}},
+        '李四': {'content': '**[保持沉默]**', 'query': {}}
+    }
+    print("✅ 无效输出回退测试通过")
+
+def test_no_players_skips_call():
+    """测试没有AI玩家时不调用模型"""
+    print("🧪 测试空玩家列表...")
+    ensemble, completions = make_ensemble('{}')
+    assert ensemble.query({}, "历史") == {}
+    assert ensemble.query({'不存在': []}, "历史") == {}
+    assert completions.calls == []
+    print("✅ 空玩家列表测试通过")
+
+if __name__ == "__main__":
+    test_parse_fallback_and_self_query()
+    test_parse_invalid_json()
+    test_no_players_skips_call()
+    print("\n🎉 合并发言测试完成!")
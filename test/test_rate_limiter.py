@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+测试调用限流器
+验证每秒请求数、并发数、每分钟token数的限制，先到先得的排队顺序以及429暂停
+"""
+
+import gc
+import threading
+import time
+
+import httpx
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+from rate_limiter import RateLimiter
+
+def test_requests_per_second():
+    """测试每秒请求数限制"""
+    print("🧪 测试每秒请求数...")
+    limiter = RateLimiter('test', requests_per_second=20)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+        limiter.release()
+    elapsed = time.monotonic() - start
+    # 桶内初始有20个额度，6次请求不需要等待
+    assert elapsed < 0.1
+
+    limiter = RateLimiter('test', requests_per_second=2)
+    start = time.monotonic()
+    for _ in range(4):
+        with limiter.slot():
+            pass
+    # 前2次用掉桶内额度，之后每0.5秒恢复1次
+    assert 0.8 < time.monotonic() - start < 1.5
+    print("✅ 每秒请求数测试通过")
+
+def test_max_concurrent_and_fifo():
+    """测试并发上限和排队顺序"""
+    print("🧪 测试并发上限和排队顺序...")
+    limiter = RateLimiter('test', max_concurrent=1)
+    order = []
+    peak = []
+
+    limiter.acquire()
+
+    def worker(index):
+        with limiter.slot():
+            peak.append(limiter.stats()['in_flight'])
+            order.append(index)
+
+    threads = []
+    for index in range(4):
+        thread = threading.Thread(target=worker, args=(index,))
+        thread.start()
+        threads.append(thread)
+        # 保证按顺序进入队列
+        while limiter.stats()['queued'] < index + 1:
+            time.sleep(0.01)
+
+    limiter.release()
+    for thread in threads:
+        thread.join()
+
+    assert order == [0, 1, 2, 3]
+    assert max(peak) == 1
+    print("✅ 并发上限和排队顺序测试通过")
+
+def test_tokens_per_minute():
+    """测试每分钟token数限制和实际用量修正"""
+    print("🧪 测试token限制...")
+    limiter = RateLimiter('test', tokens_per_minute=600)
+    limiter.acquire(tokens=500)
+    # 实际只用了100，退还400
+    limiter.release(tokens=500, actual_tokens=100)
+
+    start = time.monotonic()
+    limiter.acquire(tokens=500)
+    assert time.monotonic() - start < 0.1
+    limiter.release(tokens=500)
+
+    # 剩余约0额度，需要等约10个token的恢复时间(1秒)
+    start = time.monotonic()
+    limiter.acquire(tokens=10, timeout=3)
+    assert 0.5 < time.monotonic() - start < 2
+    limiter.release(tokens=10)
+    assert limiter.stats()['tokens'] == 610
+    print("✅ token限制测试通过")
+
+def test_timeout_and_penalize():
+    """测试等待超时和429暂停"""
+    print("🧪 测试超时和429暂停...")
+    limiter = RateLimiter('test', max_concurrent=1)
+    limiter.acquire()
+    try:
+        limiter.acquire(timeout=0.1)
+        assert False, "应该超时"
+    except TimeoutError:
+        pass
+    limiter.release()
+    assert limiter.stats()['queued'] == 0
+    assert limiter.stats()['timeouts'] == 1
+
+    limiter.penalize(0.3)
+    start = time.monotonic()
+    with limiter.slot():
+        pass
+    assert time.monotonic() - start >= 0.25
+    assert limiter.stats()['throttled'] == 1
+    print("✅ 超时和429暂停测试通过")
+
+def test_abandoned_stream_releases_slot():
+    """测试未关闭就丢弃的流式响应在回收时归还并发额度"""
+    print("🧪 测试丢弃的流式响应...")
+    from openai_utils import RateLimitedTransport
+
+    class OpenStream(httpx.SyncByteStream):
+        def __iter__(self):
+            yield b'data: {}\n\n'
+
+    limiter = RateLimiter('test', max_concurrent=1)
+    transport = RateLimitedTransport(httpx.MockTransport(lambda request: httpx.Response(200, stream=OpenStream())), limiter)
+    client = httpx.Client(transport=transport)
+
+    request = client.build_request('POST', 'http://llm.test/chat/completions', json={'stream': True})
+    response = client.send(request, stream=True)
+    next(response.iter_bytes())
+    assert limiter.stats()['in_flight'] == 1
+
+    # 调用方中途放弃，没有关闭响应
+    del response
+    gc.collect()
+    assert limiter.stats()['in_flight'] == 0
+    limiter.acquire(timeout=1)
+    limiter.release()
+
+    # 正常关闭只归还一次
+    response = client.send(client.build_request('POST', 'http://llm.test/chat/completions', json={'stream': True}), stream=True)
+    response.read()
+    response.close()
+    assert limiter.stats()['in_flight'] == 0
+    limiter.acquire(timeout=1)
+    del response
+    gc.collect()
+    assert limiter.stats()['in_flight'] == 1
+    limiter.release()
+    print("✅ 丢弃的流式响应测试通过")
+
+if __name__ == "__main__":
+    test_requests_per_second()
+    test_max_concurrent_and_fifo()
+    test_tokens_per_minute()
+    test_timeout_and_penalize()
+    test_abandoned_stream_releases_slot()
+    print("\n🎉 限流器测试完成!")
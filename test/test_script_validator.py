@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+测试剧本校验与局部修复
+验证缺失片段的识别、只补写缺失部分以及合并时保留原有内容
+"""
+
+import json
+import os
+import tempfile
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+from script_validator import find_script_problems, merge_script_fragments, repair_script, repair_script_file
+
+def build_script():
+    """构建一个完整的两章剧本"""
+    return {
+        'title': '豪门疑案',
+        'theme': '豪门谋杀案',
+        'characters': ['张三', '李四'],
+        '张三': ['张三第一章', '张三第二章'],
+        '李四': ['李四第一章', '李四第二章'],
+        'dm': ['DM第一章', 'DM第二章', '真相揭露'],
+        'clues': [['线索1', '线索2'], ['线索3']],
+        'clue_image_prompts': [['提示1', '提示2'], ['提示3']],
+        'character_image_prompts': {'张三': '张三画像', '李四': '李四画像'}
+    }
+
+class FakeDMAgent:
+    """记录补写请求的DM"""
+
+    def __init__(self, fragments):
+        self.fragments = fragments
+        self.requests = []
+
+    def gen_script_fragments(self, script, problems):
+        self.requests.append([problem['key'] for problem in problems])
+        return self.fragments
+
+def test_complete_script():
+    """测试完整剧本没有问题"""
+    print("🧪 测试完整剧本...")
+    assert find_script_problems(build_script()) == []
+    print("✅ 完整剧本测试通过")
+
+def test_find_truncated_parts():
+    """测试识别被截断的部分"""
+    print("🧪 测试识别缺失片段...")
+    script = build_script()
+    script['李四'] = ['李四第一章']
+    script['clue_image_prompts'] = [['提示1', '提示2']]
+    del script['character_image_prompts']['李四']
+
+    problems = {problem['key']: problem for problem in find_script_problems(script)}
+    assert set(problems) == {'李四', 'clue_image_prompts', 'character_image_prompts'}
+    assert problems['character_image_prompts']['characters'] == ['李四']
+
+    script = build_script()
+    del script['characters']
+    assert [problem['key'] for problem in find_script_problems(script)] == ['characters']
+    print("✅ 缺失片段识别测试通过")
+
+def test_merge_keeps_existing():
+    """测试合并时保留原有内容"""
+    print("🧪 测试片段合并...")
+    script = build_script()
+    script['李四'] = ['李四第一章']
+    script['character_image_prompts'] = {'张三': '张三画像'}
+    problems = find_script_problems(script)
+
+    merge_script_fragments(script, {
+        '李四': ['重写的第一章', '李四第二章'],
+        'character_image_prompts': {'张三': '不应覆盖', '李四': '李四画像'}
+    }, problems)
+
+    assert script['李四'] == ['李四第一章', '李四第二章']
+    assert script['character_image_prompts'] == {'张三': '张三画像', '李四': '李四画像'}
+    assert find_script_problems(script) == []
+    print("✅ 片段合并测试通过")
+
+def test_repair_script():
+    """测试只补写缺失的片段"""
+    print("🧪 测试局部修复...")
+    script = build_script()
+    del script['clue_image_prompts']
+    del script['character_image_prompts']
+    # 角色列表缺失时从角色剧本字段推断
+    del script['characters']
+
+    agent = FakeDMAgent({
+        'clue_image_prompts': [['提示1', '提示2'], ['提示3']],
+        'character_image_prompts': {'张三': '张三画像', '李四': '李四画像'}
+    })
+    repaired, remaining = repair_script(script, agent, max_rounds=2)
+    assert remaining == []
+    assert repaired['characters'] == ['张三', '李四']
+    assert agent.requests == [['clue_image_prompts', 'character_image_prompts']]
+
+    # 补写失败时保留原剧本并报告剩余问题
+    script = build_script()
+    script['dm'] = []
+    repaired, remaining = repair_script(script, FakeDMAgent({}), max_rounds=2)
+    assert repaired is script and [problem['key'] for problem in remaining] == ['dm']
+
+    assert repair_script({'title': '只有标题'}, FakeDMAgent({}))[0] is None
+    print("✅ 局部修复测试通过")
+
+def test_repair_script_file():
+    """测试补写已有游戏的script.json"""
+    print("🧪 测试修复剧本文件...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        script_file = os.path.join(tmp_dir, 'script.json')
+        script = build_script()
+        del script['character_image_prompts']
+        with open(script_file, 'w', encoding='utf-8') as f:
+            json.dump(script, f, ensure_ascii=False)
+
+        agent = FakeDMAgent({'character_image_prompts': {'张三': '张三画像', '李四': '李四画像'}})
+        assert repair_script_file(script_file, agent)
+        with open(script_file, 'r', encoding='utf-8') as f:
+            assert find_script_problems(json.load(f)) == []
+
+        # 完整的剧本不调用模型
+        assert not repair_script_file(script_file, agent)
+        assert len(agent.requests) == 1
+        assert os.listdir(tmp_dir) == ['script.json']
+    print("✅ 修复剧本文件测试通过")
+
+if __name__ == "__main__":
+    test_complete_script()
+    test_find_truncated_parts()
+    test_merge_keeps_existing()
+    test_repair_script()
+    test_repair_script_file()
+    print("\n🎉 剧本校验测试完成!")
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+测试游戏会话存储
+验证内存和SQLite后端的读写，以及多个进程共享SQLite时的会话同步
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+import session_store
+from session_store import (
+    MemorySessionStore, SQLiteSessionStore, SessionRegistry, PlayerSessionMap,
+    SessionConflictError, encode_state, decode_state, merge_session_states
+)
+
+class FakeSession:
+    """只包含状态字段的简化会话"""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.version = 0
+        self.chat_history = ""
+        self.action_history = []
+
+    def to_state(self):
+        return {
+            'version': self.version,
+            'session_id': self.session_id,
+            'chat_history': self.chat_history,
+            'action_history': self.action_history
+        }
+
+def restore_session(state, session=None):
+    """从状态恢复简化会话"""
+    if session is None:
+        session = FakeSession(state['session_id'])
+    session.version = state['version']
+    session.chat_history = state['chat_history']
+    session.action_history = state['action_history']
+    return session
+
+def test_encode_roundtrip():
+    """测试状态压缩编码"""
+    print("🧪 测试状态压缩编码...")
+    state = {'chat_history': '### 张三\n我昨晚一直在书房。\n' * 50, 'players': [[1, '张三']]}
+    data = encode_state(state)
+    assert decode_state(data) == state
+    print(f"✅ 编码成功: 压缩后{len(data)}字节")
+
+def test_memory_registry():
+    """测试内存后端的会话表"""
+    print("🧪 测试内存会话表...")
+    registry = SessionRegistry(MemorySessionStore(), restore_session)
+    session = FakeSession('game_1')
+    registry['game_1'] = session
+    registry.save(session)
+
+    assert 'game_1' in registry
+    assert registry['game_1'] is session
+    assert registry.keys() == ['game_1']
+
+    del registry['game_1']
+    assert 'game_1' not in registry
+    assert registry.get('game_1') is None
+    print("✅ 内存会话表测试通过")
+
+def test_sqlite_shared_registry():
+    """测试两个会话表共享同一个SQLite数据库"""
+    print("🧪 测试SQLite共享会话...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sessions.db')
+        worker_a = SessionRegistry(SQLiteSessionStore(db_path), restore_session)
+        worker_b = SessionRegistry(SQLiteSessionStore(db_path), restore_session)
+
+        session = FakeSession('game_2')
+        session.action_history.append({'type': 'player_action', 'content': '你好'})
+        worker_a['game_2'] = session
+        worker_a.save(session)
+
+        # 另一个进程读取到相同状态
+        session_b = worker_b['game_2']
+        assert session_b.action_history == session.action_history
+
+        # 另一个进程修改后，本进程读取时刷新
+        session_b.chat_history += "新消息"
+        worker_b.save(session_b)
+        assert worker_a['game_2'].chat_history == "新消息"
+
+        # 另一个进程删除后，本进程不再返回缓存的会话
+        worker_b.pop('game_2')
+        assert 'game_2' not in worker_a
+
+        players = PlayerSessionMap(worker_a.store)
+        players[1] = 'game_3'
+        assert PlayerSessionMap(worker_b.store).get(1) == 'game_3'
+        del players[1]
+        assert 1 not in players
+    print("✅ SQLite共享会话测试通过")
+
+def test_version_conflict():
+    """测试两个进程同时修改同一会话时，后保存的一方被拒绝"""
+    print("🧪 测试版本冲突...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sessions.db')
+        worker_a = SessionRegistry(SQLiteSessionStore(db_path), restore_session)
+        worker_b = SessionRegistry(SQLiteSessionStore(db_path), restore_session)
+
+        session = FakeSession('game_4')
+        worker_a['game_4'] = session
+        worker_a.save(session)
+        session_b = worker_b['game_4']
+
+        # 两边基于同一版本修改，A先保存
+        session.chat_history = "A的修改"
+        session_b.chat_history = "B的修改"
+        worker_a.save(session)
+        try:
+            worker_b.save(session_b)
+            assert False, "应该检测到冲突"
+        except SessionConflictError:
+            pass
+        assert session_b.version == 1
+
+        # 冲突后再次读取时刷新为A保存的状态，之后可以正常保存
+        assert worker_b['game_4'].chat_history == "A的修改"
+        worker_b.save(session_b)
+        assert worker_a['game_4'].version == 3
+
+        # 同一局游戏在两个进程中同时首次创建
+        first = FakeSession('game_6')
+        second = FakeSession('game_6')
+        worker_a.save(first)
+        try:
+            worker_b.save(second)
+            assert False, "应该检测到冲突"
+        except SessionConflictError:
+            pass
+    print("✅ 版本冲突测试通过")
+
+def test_conflict_merge_keeps_both_writes():
+    """测试两个进程基于同一版本修改时合并后都能保存，任何一方的修改都不丢失"""
+    print("🧪 测试冲突合并...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sessions.db')
+        worker_a = SessionRegistry(SQLiteSessionStore(db_path), restore_session, merge_session_states)
+        worker_b = SessionRegistry(SQLiteSessionStore(db_path), restore_session, merge_session_states)
+
+        session_a = FakeSession('game_9')
+        session_a.action_history.append({'type': 'dm_speak', 'content': '开场'})
+        worker_a.save(session_a)
+        session_b = worker_b['game_9']
+
+        # 两个进程同时追加行动，B后保存
+        session_a.action_history.append({'type': 'player_action', 'character': '张三', 'content': 'A的发言'})
+        session_a.chat_history += "A"
+        session_b.action_history.append({'type': 'player_action', 'character': '李四', 'content': 'B的发言'})
+        session_b.chat_history += "B"
+        worker_a.save(session_a)
+        worker_b.save(session_b)
+        assert worker_b.conflict_count == 1
+
+        contents = [action['content'] for action in worker_a['game_9'].action_history]
+        assert contents == ['开场', 'A的发言', 'B的发言']
+        assert worker_a['game_9'].chat_history == "AB"
+        assert session_b.version == 3
+
+        # A基于旧版本继续修改，同样合并保存
+        session_a.action_history.append({'type': 'answer', 'character': '张三', 'content': 'A的回答'})
+        worker_a.save(session_a)
+        contents = [action['content'] for action in worker_b['game_9'].action_history]
+        assert contents == ['开场', 'A的发言', 'B的发言', 'A的回答']
+
+        # 会话已被删除时无法合并
+        worker_a.pop('game_9')
+        session_b.chat_history += "C"
+        try:
+            worker_b.save(session_b)
+            assert False, "应该检测到冲突"
+        except SessionConflictError:
+            pass
+    print("✅ 冲突合并测试通过")
+
+def test_load_decodes_once():
+    """测试存储中的状态未变化时不重复解码"""
+    print("🧪 测试重复读取...")
+    decoded = []
+    original = session_store.decode_state
+
+    def counting_decode(data):
+        decoded.append(len(data))
+        return original(data)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sessions.db')
+        writer = SessionRegistry(SQLiteSessionStore(db_path), restore_session)
+        reader = SessionRegistry(SQLiteSessionStore(db_path), restore_session)
+        session = FakeSession('game_7')
+        writer.save(session)
+
+        session_store.decode_state = counting_decode
+        try:
+            assert 'game_7' in reader
+            assert reader['game_7'].session_id == 'game_7'
+            assert len(decoded) == 1
+
+            session.chat_history = "新消息"
+            writer.save(session)
+            assert reader['game_7'].chat_history == "新消息"
+            assert len(decoded) == 2
+        finally:
+            session_store.decode_state = original
+    print("✅ 重复读取测试通过")
+
+def test_sqlite_migration():
+    """测试旧版数据库补充版本号列"""
+    print("🧪 测试旧数据库迁移...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sessions.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute('CREATE TABLE game_sessions (key TEXT PRIMARY KEY, value BLOB NOT NULL, updated_at REAL NOT NULL)')
+        state = FakeSession('game_8').to_state()
+        state['version'] = 5
+        conn.execute('INSERT INTO game_sessions VALUES (?, ?, ?)', ('session:game_8', encode_state(state), time.time()))
+        conn.commit()
+        conn.close()
+
+        registry = SessionRegistry(SQLiteSessionStore(db_path), restore_session)
+        session = registry['game_8']
+        assert session.version == 5
+        registry.save(session)
+        assert registry.store.get('session:game_8')['version'] == 6
+    print("✅ 旧数据库迁移测试通过")
+
+def test_eviction_snapshot():
+    """测试空闲会话淘汰和快照恢复"""
+    print("🧪 测试会话淘汰...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        registry = SessionRegistry(MemorySessionStore(), restore_session)
+        registry.configure_eviction(ttl=60, max_sessions=2, snapshot_dir=tmp_dir)
+
+        for i in range(3):
+            session = FakeSession(f'game_{i}')
+            session.chat_history = f"第{i}局"
+            registry[session.session_id] = session
+            registry.save(session)
+
+        # 超出数量上限时淘汰最久未访问的会话
+        assert len(registry.local_sessions()) == 2
+        assert registry.snapshot_ids() == ['game_0']
+
+        # 空闲超时的会话被淘汰
+        evicted = registry.evict(now=time.time() + 120)
+        assert sorted(evicted) == ['game_1', 'game_2']
+        assert registry.local_sessions() == []
+
+        # 再次访问时从快照恢复
+        assert registry['game_1'].chat_history == "第1局"
+        assert 'game_1' not in registry.snapshot_ids()
+        assert registry.restored_count == 1
+
+        # 只读查询不刷新访问时间，也不恢复已淘汰的会话
+        before = registry.last_activity('game_1')
+        time.sleep(0.01)
+        assert registry.peek('game_1').chat_history == "第1局"
+        assert registry.last_activity('game_1') == before
+        assert registry.peek('game_2') is None
+        assert 'game_2' in registry.snapshot_ids()
+    print("✅ 会话淘汰测试通过")
+
+def test_eviction_with_durable_store():
+    """测试SQLite后端淘汰时不写快照，并清理按会话保存的状态"""
+    print("🧪 测试SQLite后端淘汰...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        snapshot_dir = os.path.join(tmp_dir, 'snapshots')
+        released = []
+        registry = SessionRegistry(SQLiteSessionStore(os.path.join(tmp_dir, 'sessions.db')), restore_session)
+        registry.configure_eviction(ttl=60, snapshot_dir=snapshot_dir, on_evict=released.append)
+
+        session = FakeSession('game_5')
+        session.chat_history = "已保存的状态"
+        registry['game_5'] = session
+        registry.save(session)
+
+        assert registry.evict(now=time.time() + 120) == ['game_5']
+        assert registry.snapshot_ids() == []
+        assert released == ['game_5']
+
+        # 从存储恢复
+        restored = registry['game_5']
+        assert restored is not session
+        assert restored.chat_history == "已保存的状态"
+    print("✅ SQLite后端淘汰测试通过")
+
+if __name__ == "__main__":
+    test_encode_roundtrip()
+    test_memory_registry()
+    test_sqlite_shared_registry()
+    test_version_conflict()
+    test_conflict_merge_keeps_both_writes()
+    test_load_decodes_once()
+    test_sqlite_migration()
+    test_eviction_snapshot()
+    test_eviction_with_durable_store()
+    print("\n🎉 会话存储测试完成!")
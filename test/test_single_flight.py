@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+测试相同请求合并
+验证并发请求只执行一次、结果短时保留以及失败结果不保留
+"""
+
+import threading
+import time
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+from single_flight import SingleFlight
+
+def test_concurrent_requests_share_result():
+    """测试并发的相同请求共享一次执行"""
+    print("🧪 测试并发请求合并...")
+    flights = SingleFlight(ttl=5)
+    calls = []
+
+    def generate():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'success': True, 'speech': '第一章开始'}
+
+    results = []
+    def request():
+        results.append(flights.do(('game_1', 1, 'chapter_start'), generate))
+
+    threads = [threading.Thread(target=request) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [shared for _, shared in results].count(False) == 1
+    assert all(result['speech'] == '第一章开始' for result, _ in results)
+
+    # 稍晚到达的重复请求直接返回保留的结果
+    result, shared = flights.do(('game_1', 1, 'chapter_start'), generate)
+    assert shared and len(calls) == 1
+    assert flights.stats()['executed'] == 1
+    print("✅ 并发请求合并测试通过")
+
+def test_failed_result_not_kept():
+    """测试失败的结果不保留"""
+    print("🧪 测试失败结果...")
+    flights = SingleFlight(ttl=5)
+
+    result, _ = flights.do('key', lambda: {'success': False}, keep_if=lambda r: r['success'])
+    result, shared = flights.do('key', lambda: {'success': True}, keep_if=lambda r: r['success'])
+    assert result['success'] and not shared
+
+    def broken():
+        raise RuntimeError("network down")
+
+    try:
+        flights.do('broken', broken)
+        assert False, "应该抛出异常"
+    except RuntimeError:
+        pass
+    assert flights.do('broken', lambda: 'ok') == ('ok', False)
+    print("✅ 失败结果测试通过")
+
+def test_ttl_expiry():
+    """测试结果超过保留时间后重新执行"""
+    print("🧪 测试结果过期...")
+    flights = SingleFlight(ttl=0.1)
+    assert flights.do('key', lambda: 1) == (1, False)
+    assert flights.do('key', lambda: 2) == (1, True)
+    time.sleep(0.15)
+    assert flights.do('key', lambda: 3) == (3, False)
+    print("✅ 结果过期测试通过")
+
+if __name__ == "__main__":
+    test_concurrent_requests_share_result()
+    test_failed_result_not_kept()
+    test_ttl_expiry()
+    print("\n🎉 请求合并测试完成!")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+测试结构化输出解析
+验证markdown代码块提取、截断JSON的本地修复、结构校验以及解析统计
+"""
+
+# 导入测试工具
+from test_utils import setup_project_path
+
+# 设置项目路径
+setup_project_path()
+
+from structured_output import parse_json_output, repair_json, validate_schema, get_parse_stats
+
+QUERY_SCHEMA = {
+    'type': 'object',
+    'required': ['content', 'query'],
+    'properties': {
+        'content': {'type': 'string'},
+        'query': {'type': 'object', 'additionalProperties': {'type': 'string'}}
+    }
+}
+
+def test_parse_fenced_output():
+    """测试带代码块和说明文字的输出"""
+    print("🧪 测试代码块提取...")
+    text = '好的，以下是发言：\n```json\n{"content": "我昨晚在房间", "query": {"李四": "你去哪了？"},}\n```'
+    result = parse_json_output(text, QUERY_SCHEMA, source='test.fenced')
+    assert result.ok
+    assert result.status == 'repaired'
+    assert result.data['query'] == {'李四': '你去哪了？'}
+    print("✅ 代码块提取测试通过")
+
+def test_repair_truncated_output():
+    """测试截断输出的修复"""
+    print("🧪 测试截断修复...")
+    # 截断在字符串中间
+    result = parse_json_output('{"content": "我昨晚一直在', source='test.truncated')
+    assert result.status == 'repaired'
+    assert result.data == {'content': '我昨晚一直在'}
+
+    # 截断在键的中间时回退到上一个完整字段
+    result = parse_json_output('{"content": "我不在场", "que', source='test.truncated')
+    assert result.status == 'repaired'
+    assert result.data == {'content': '我不在场'}
+
+    # 截断在冒号之后
+    assert repair_json('{"a": [1, 2,') == '{"a": [1, 2]}'
+    assert repair_json('{"a":') == '{"a":null}'
+    print("✅ 截断修复测试通过")
+
+def test_schema_validation():
+    """测试结构校验"""
+    print("🧪 测试结构校验...")
+    assert validate_schema({'content': 'hi', 'query': {}}, QUERY_SCHEMA) == []
+
+    errors = validate_schema({'content': 1, 'query': {'李四': 2}}, QUERY_SCHEMA)
+    assert not any('缺少' in e for e in errors)
+    assert len(errors) == 2
+
+    result = parse_json_output('{"content": "hi"}', QUERY_SCHEMA, source='test.invalid')
+    assert result.status == 'invalid' and not result.ok
+    assert result.data == {'content': 'hi'}
+
+    result = parse_json_output('完全不是JSON', QUERY_SCHEMA, source='test.invalid')
+    assert result.status == 'failed' and result.data is None
+    print("✅ 结构校验测试通过")
+
+def test_parse_stats():
+    """测试解析统计"""
+    print("🧪 测试解析统计...")
+    parse_json_output('{"content": "a", "query": {}}', QUERY_SCHEMA, source='test.stats')
+    parse_json_output('{"content": "b", "query": {}', QUERY_SCHEMA, source='test.stats')
+    parse_json_output('???', QUERY_SCHEMA, source='test.stats')
+
+    stats = get_parse_stats()['test.stats']
+    assert stats['total'] == 3
+    assert stats['parsed'] == 1 and stats['repaired'] == 1 and stats['failed'] == 1
+    assert abs(stats['failure_rate'] - 1 / 3) < 1e-9
+    print("✅ 解析统计测试通过")
+
+if __name__ == "__main__":
+    test_parse_fenced_output()
+    test_repair_truncated_output()
+    test_schema_validation()
+    test_parse_stats()
+    print("\n🎉 结构化输出测试完成!")